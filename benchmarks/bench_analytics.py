@@ -0,0 +1,91 @@
+"""Benchmark lobby matchup summaries against a large matches.db.
+
+Fills a temporary database with stored hero stats, snapshot history and
+finished matches, then times the first summary (which loads the columnar
+arrays) and the per-capture summaries after it, broken down by part.
+
+Usage: python benchmarks/bench_analytics.py [--players 5000] [--matches 5000] [--captures 200]
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from analytics import MatchupAnalytics
+from database import Database
+
+ROLES = ['Vanguard', 'Duelist', 'Strategist']
+HEROES = [(str(1011 + i), f"Hero {i}", ROLES[i % 3]) for i in range(40)]
+
+def fill(database, rng, players, heroes_per_player, snapshots_per_hero, matches):
+    now = time.time()
+    hero_rows, snapshot_rows = [], []
+    for player in players:
+        for hero_id, name, role in rng.sample(HEROES, heroes_per_player):
+            games = rng.randint(1, 200)
+            won = rng.randint(0, games)
+            for age in sorted(rng.sample(range(1, 30), snapshots_per_hero), reverse=True):
+                snapshot_rows.append((player, hero_id, now - age * 86400, games - age, max(0, won - age // 2), 2.0))
+            snapshot_rows.append((player, hero_id, now, games, won, 2.0))
+            hero_rows.append((player, hero_id, name, role, games, won, 2.0, now))
+
+    match_rows = []
+    for _ in range(matches):
+        lobby = rng.sample(players, 12)
+        match_rows.append((json.dumps(lobby[:6]), json.dumps(lobby[6:]), rng.randint(0, 1)))
+
+    with sqlite3.connect(database.db_path) as conn:
+        conn.executemany('INSERT INTO player_heroes VALUES (?, ?, ?, ?, ?, ?, ?, ?)', hero_rows)
+        conn.executemany('INSERT INTO hero_snapshots VALUES (?, ?, ?, ?, ?, ?)', snapshot_rows)
+        conn.executemany('INSERT INTO matches (friendly_team, enemy_team, result) VALUES (?, ?, ?)', match_rows)
+    return len(hero_rows), len(snapshot_rows)
+
+def timed(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return (time.perf_counter() - start) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--players', type=int, default=5000)
+    parser.add_argument('--heroes', type=int, default=8, help="Heroes with stats per player")
+    parser.add_argument('--snapshots', type=int, default=3, help="Older snapshots per hero")
+    parser.add_argument('--matches', type=int, default=5000, help="Finished matches with a result")
+    parser.add_argument('--captures', type=int, default=200)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    rng = random.Random(42)
+    players = [f"player{i}" for i in range(args.players)]
+    with tempfile.TemporaryDirectory() as directory:
+        database = Database({'database_path': os.path.join(directory, 'matches.db')})
+        hero_rows, snapshot_rows = fill(database, rng, players, args.heroes, args.snapshots, args.matches)
+        print(f"{hero_rows} hero rows, {snapshot_rows} snapshots, {args.matches} finished matches")
+
+        analytics = MatchupAnalytics(database)
+        lobbies = [rng.sample(players, 12) for _ in range(args.captures)]
+        first = timed(analytics.summarize_lobby, lobbies[0][:6], lobbies[0][6:])
+        print(f"first summary (loads arrays): {first:8.1f} ms")
+
+        parts = {'team_summary': [], 'recurring_opponents': [], 'recent_form': [], 'summarize_lobby': []}
+        for lobby in lobbies:
+            friendly, enemy = lobby[:6], lobby[6:]
+            parts['team_summary'].append(timed(analytics.team_summary, friendly) + timed(analytics.team_summary, enemy))
+            parts['recurring_opponents'].append(timed(analytics.recurring_opponents, enemy))
+            parts['recent_form'].append(timed(analytics.recent_form, lobby))
+            parts['summarize_lobby'].append(timed(analytics.summarize_lobby, friendly, enemy))
+
+        for name, times in parts.items():
+            times.sort()
+            print(f"{name:20s} median {statistics.median(times):6.2f} ms  p95 {times[int(len(times) * 0.95)]:6.2f} ms")
+
+if __name__ == '__main__':
+    main()
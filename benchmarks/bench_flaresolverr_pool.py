@@ -0,0 +1,134 @@
+"""Benchmark request throughput across several stub FlareSolverr instances.
+
+Each stub answers request.get after a fixed delay and only serves a limited
+number of browser pages at once, like a real FlareSolverr container. Requests
+are sent through TrackerLookup.flaresolverr_request so routing, sessions,
+health checks and the throttle are exercised end to end. The throttle's rate
+cap is lifted and it starts at the pool's full concurrency, so throughput is
+bounded only by the pool: pages are slow, as real solves are, so each
+instance is limited by its pages and throughput should grow linearly with
+the number of instances.
+
+Usage: python benchmarks/bench_flaresolverr_pool.py [--requests 60] [--latency 2]
+"""
+import argparse
+import json
+import logging
+import os
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from tracker_lookup import TrackerLookup
+
+PAGES_PER_INSTANCE = 2
+
+class StubFlareSolverr(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        if body['cmd'] == 'sessions.list':
+            with server.lock:
+                data = {'status': 'ok', 'sessions': [{'id': session} for session in server.sessions]}
+        elif body['cmd'] == 'sessions.create':
+            with server.lock:
+                server.created += 1
+                session = f"bench{server.created}"
+                server.sessions.add(session)
+            data = {'status': 'ok', 'session': session}
+        elif body['cmd'] == 'sessions.destroy':
+            with server.lock:
+                server.sessions.discard(body['session'])
+            data = {'status': 'ok'}
+        else:
+            with self.server.pages:
+                time.sleep(self.server.latency)
+            data = {'status': 'ok', 'solution': {'status': 200, 'response': '{"data": {}}'}}
+
+        payload = json.dumps(data).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+def start_stub(latency):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubFlareSolverr)
+    server.daemon_threads = True
+    server.latency = latency
+    server.pages = threading.Semaphore(PAGES_PER_INSTANCE)
+    server.lock = threading.Lock()
+    server.sessions = set()
+    server.created = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+def unused_url():
+    """URL of a port nobody listens on, standing in for a crashed instance."""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return f"http://127.0.0.1:{sock.getsockname()[1]}/v1"
+
+def run(urls, requests_count):
+    config = {
+        'flaresolverr': {
+            'endpoints': [{'url': url, 'max_concurrency': PAGES_PER_INSTANCE} for url in urls],
+            # Lift the rate cap so only the pool's pages limit throughput
+            'min_request_delay': 1,
+            'throttle': {'max_rate': 1000},
+            'retry_delay': 10,
+            'eject_seconds': 60,
+        },
+        'renderer': {'live_table': False},
+    }
+    lookup = TrackerLookup(config)
+    # Skip the ramp-up so the pool, not the throttle, sets the pace
+    lookup.throttle.concurrency = float(lookup.throttle.max_concurrency)
+
+    workers = PAGES_PER_INSTANCE * len(urls)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(
+            lambda i: lookup.flaresolverr_request(f"https://example.com/{i}", affinity_key=f"player{i}"),
+            range(requests_count)
+        ))
+    elapsed = time.perf_counter() - start
+    throttle = lookup.throttle.metrics()
+    lookup.close()
+    return requests_count / elapsed, sum(1 for r in results if r), throttle
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=60)
+    parser.add_argument('--latency', type=float, default=2)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    stubs = [start_stub(args.latency) for _ in range(4)]
+    urls = [url for _, url in stubs]
+
+    print(f"{args.requests} requests, {args.latency * 1000:.0f} ms per page, {PAGES_PER_INSTANCE} pages per instance")
+    baseline = None
+    for count in (1, 2, 4):
+        throughput, ok, throttle = run(urls[:count], args.requests)
+        baseline = baseline or throughput
+        print(f"{count} instance(s): {throughput:5.2f} req/s ({throughput / baseline:.2f}x), {ok}/{args.requests} "
+              f"succeeded, throttle at {throttle['rate']} req/s, concurrency {throttle['concurrency']}")
+
+    throughput, ok, throttle = run(urls[:3] + [unused_url()], args.requests)
+    print(f"3 instances + 1 down: {throughput:5.2f} req/s ({throughput / baseline:.2f}x), {ok}/{args.requests} "
+          f"succeeded, throttle at {throttle['rate']} req/s, concurrency {throttle['concurrency']}")
+
+    for server, _ in stubs:
+        server.shutdown()
+
+if __name__ == '__main__':
+    main()
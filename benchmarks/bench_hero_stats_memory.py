@@ -0,0 +1,109 @@
+"""Benchmark memory per cached player for the lookup cache.
+
+Builds lookup results for many players from generated tracker.gg profile JSON
+and measures with tracemalloc what the cache holds per player, first as the
+result dicts lookups used to cache and then as compact HeroStats records in a
+HeroStatsCache. Also checks that a byte-bounded cache stays within its limit.
+
+Usage: python benchmarks/bench_hero_stats_memory.py [--players 5000] [--heroes 30]
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from hero_stats import HeroStats, HeroStatsCache
+
+ROLES = ['Vanguard', 'Duelist', 'Strategist']
+
+def profile_json(rng, hero_count, roster):
+    segments = []
+    for hero_id, name, role in rng.sample(roster, hero_count):
+        matches = rng.randint(1, 500)
+        segments.append({
+            'type': 'hero',
+            'metadata': {'name': name, 'roleName': role},
+            'attributes': {'heroId': hero_id},
+            'stats': {
+                'matchesPlayed': {'value': matches},
+                'matchesWon': {'value': rng.randint(0, matches)},
+                'kdaRatio': {'value': round(rng.uniform(0.5, 6), 2)},
+            },
+        })
+    return json.dumps({'data': {'segments': segments}})
+
+def parse_heroes(text):
+    """Turn a profile into the sorted hero dicts built by lookup_player."""
+    heroes = []
+    for segment in json.loads(text)['data']['segments']:
+        stats = segment['stats']
+        heroes.append({
+            'id': segment['attributes']['heroId'],
+            'name': segment['metadata']['name'],
+            'role': segment['metadata']['roleName'],
+            'matches': float(stats['matchesPlayed']['value']),
+            'wins': float(stats['matchesWon']['value']),
+            'kda': float(stats['kdaRatio']['value']),
+        })
+    return sorted(heroes, key=lambda x: x['matches'], reverse=True)
+
+def measure(build):
+    """Return (bytes still allocated after build(), the built object)."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    built = build()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return after - before, built
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--players', type=int, default=5000)
+    parser.add_argument('--heroes', type=int, default=30, help="Heroes with stats per player")
+    parser.add_argument('--max-bytes', type=int, default=1024 * 1024, help="Limit for the bounded cache run")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    roster = [(str(1011 + i), f"Hero {i}", ROLES[i % 3]) for i in range(max(40, args.heroes))]
+    profiles = [(f"player{i}", profile_json(rng, args.heroes, roster)) for i in range(args.players)]
+    print(f"{args.players} players with {args.heroes} heroes each")
+
+    def build_dicts():
+        return {player: {'player': player, 'heroes': parse_heroes(text), 'fetched_at': time.time()}
+                for player, text in profiles}
+
+    def build_records(max_bytes):
+        cache = HeroStatsCache(max_bytes)
+        for player, text in profiles:
+            cache.put(HeroStats.from_heroes(player, parse_heroes(text), time.time()))
+        return cache
+
+    dict_bytes, dicts = measure(build_dicts)
+    print(f"result dicts:     {dict_bytes / args.players:8.0f} bytes/player  {dict_bytes / 1e6:7.2f} MB")
+
+    record_bytes, cache = measure(lambda: build_records(float('inf')))
+    print(f"HeroStats cache:  {record_bytes / args.players:8.0f} bytes/player  {record_bytes / 1e6:7.2f} MB  "
+          f"({dict_bytes / record_bytes:.1f}x smaller, estimated {cache.nbytes / 1e6:.2f} MB)")
+
+    start = time.perf_counter()
+    for player, _ in profiles:
+        assert cache.get(player).to_result()['heroes'] == dicts[player]['heroes']
+    elapsed = time.perf_counter() - start
+    print(f"to_result:        {elapsed / args.players * 1e6:8.1f} us/player (including the check)")
+    del dicts, cache
+
+    bounded_bytes, bounded = measure(lambda: build_records(args.max_bytes))
+    metrics = bounded.metrics()
+    print(f"bounded to {args.max_bytes / 1e6:.2f} MB: {metrics['entries']} players kept, "
+          f"{metrics['evictions']} evicted, {bounded_bytes / 1e6:.2f} MB measured")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""Benchmark logging overhead per capture, synchronous f-strings vs queued lazy records.
+
+Replays the log calls one capture makes (window checks, capture details and a
+lobby of six profile lookups) and reports the time spent in the calling thread.
+
+Usage: python benchmarks/bench_logging.py [--captures 200] [--level INFO]
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from log_utils import LazyJSON, StructuredFormatter, start_async_logging, stop_async_logging
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+PLAYERS_PER_CAPTURE = 6
+
+def fake_stats_data():
+    """A profile response roughly the size of a real tracker.gg payload."""
+    segments = []
+    for hero_id in range(40):
+        segments.append({
+            'type': 'hero',
+            'attributes': {'heroId': str(hero_id), 'mode': 'competitive'},
+            'metadata': {'name': f"Hero {hero_id}", 'roleName': 'Duelist', 'imageUrl': 'https://x/y.png'},
+            'stats': {
+                name: {'value': hero_id * 3.5, 'displayValue': str(hero_id * 3.5), 'percentile': 50.0}
+                for name in ('matchesPlayed', 'matchesWon', 'kdaRatio', 'kills', 'deaths', 'assists', 'damage')
+            },
+        })
+    return {'data': {'platformInfo': {'platformUserHandle': 'player'}, 'segments': segments}}
+
+class FakeResponse:
+    status_code = 200
+    headers = {'content-type': 'application/json', 'date': 'Mon, 19 Oct 2026 12:00:00 GMT', 'server': 'nginx'}
+
+    def __init__(self, text):
+        self.text = text
+
+def eager_capture(logger, stats_data, response):
+    """The log calls of one capture before the logging rework."""
+    for _ in range(2):
+        logger.debug(f"Window style: {123}")
+        logger.debug(f"Is popup: {True}")
+        logger.debug(f"Is maximized: {False}")
+        logger.debug(f"Has border: {False}")
+        logger.debug(f"Has caption: {False}")
+        logger.debug(f"Monitor size: {(2560, 1440)}")
+        logger.debug(f"Window size: {(2560, 1440)}")
+    logger.info(f"Searching for window with title: {'Marvel Rivals'}")
+    logger.info(f"Found window handle: {1234}")
+    logger.info("Window is in fullscreen mode")
+    logger.info("Capturing with ImageGrab")
+    logger.info(f"New capture - Hash: {'abcdef12'}")
+    logger.info(f"Window dimensions: {2560}x{1440}")
+    logger.info(f"Image dimensions: {(2560, 1440)}")
+    logger.info(f"Saving to: {'temp/capture.png'}")
+    logger.info(f"Saved successfully. File size: {123456} bytes")
+    for _ in range(PLAYERS_PER_CAPTURE):
+        for _ in range(2):
+            logger.debug(f"Raw FlareSolverr response status: {response.status_code}")
+            logger.debug(f"Raw FlareSolverr response headers: {dict(response.headers)}")
+            logger.debug(f"Raw FlareSolverr response content: {response.text[:1000]}")
+        logger.debug(f"Parsed search data: {json.dumps(stats_data, indent=2)}")
+        logger.debug(f"Full stats data structure: {json.dumps(stats_data, indent=2)}")
+
+def lazy_capture(logger, stats_data, response):
+    """The log calls of one capture after the logging rework."""
+    logger.debug("Searching for window with title: %s", 'Marvel Rivals')
+    logger.debug("Found window handle: %s", 1234)
+    logger.debug("Window state", extra={'fields': {
+        'style': 123, 'is_popup': True, 'is_maximized': False, 'has_border': False,
+        'has_caption': False, 'monitor_size': (2560, 1440), 'window_size': (2560, 1440)
+    }})
+    logger.info("New capture saved", extra={'fields': {
+        'hash': 'abcdef12', 'fullscreen': True, 'window_size': (2560, 1440),
+        'image_size': (2560, 1440), 'path': 'temp/capture.png', 'file_size': 123456
+    }})
+    for _ in range(PLAYERS_PER_CAPTURE):
+        for _ in range(2):
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Raw FlareSolverr response", extra={'fields': {
+                    'status': response.status_code,
+                    'headers': dict(response.headers),
+                    'content': response.text[:1000]
+                }})
+        logger.debug("Parsed search data: %s", LazyJSON(stats_data, indent=2))
+        logger.debug("Full stats data structure: %s", LazyJSON(stats_data, indent=2))
+
+def configure_sync(log_file, level):
+    handler = logging.FileHandler(log_file, encoding='utf-8')
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.handlers = [handler]
+    return None
+
+def configure_async(log_file, level):
+    handler = logging.FileHandler(log_file, encoding='utf-8')
+    handler.setFormatter(StructuredFormatter(LOG_FORMAT))
+    return start_async_logging([handler], level)
+
+def run(name, configure, capture, captures, level):
+    with tempfile.TemporaryDirectory() as tmp:
+        listener = configure(os.path.join(tmp, 'app.log'), level)
+        logger = logging.getLogger('bench')
+        stats_data = fake_stats_data()
+        response = FakeResponse(json.dumps(stats_data))
+
+        start = time.perf_counter()
+        for _ in range(captures):
+            capture(logger, stats_data, response)
+        elapsed = time.perf_counter() - start
+
+        if listener:
+            stop_async_logging(listener)
+        for handler in logging.getLogger().handlers:
+            handler.close()
+        logging.getLogger().handlers = []
+
+    print(f"{name:<32} {elapsed / captures * 1000:8.3f} ms per capture")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--captures', type=int, default=200)
+    parser.add_argument('--level', default='INFO', choices=['DEBUG', 'INFO'])
+    args = parser.parse_args()
+    level = getattr(logging, args.level)
+
+    print(f"Logging overhead in the calling thread at level {args.level}:")
+    run('sync FileHandler, f-strings', configure_sync, eager_capture, args.captures, level)
+    run('queued, lazy records', configure_async, lazy_capture, args.captures, level)
+
+if __name__ == '__main__':
+    main()
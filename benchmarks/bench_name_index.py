@@ -0,0 +1,97 @@
+"""Benchmark fuzzy username resolution against a large index of known IGNs.
+
+Usage: python benchmarks/bench_name_index.py [--names 100000] [--queries 2000]
+"""
+import argparse
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from name_index import NameIndex, normalize_name
+
+SYLLABLES = ['ka', 'ze', 'ro', 'mi', 'lo', 'xi', 'ne', 'va', 'tor', 'dan', 'shi', 'ryu', 'ix', 'el', 'qu', 'op']
+CONFUSIONS = {'l': 'I', 'I': 'l', 'o': '0', 'O': '0', '0': 'O', 's': '5', 'i': 'l', 'B': '8'}
+
+def random_name(rng):
+    name = ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+    if rng.random() < 0.5:
+        name = name.capitalize()
+    if rng.random() < 0.5:
+        name += rng.choice(['', '_', 'x']) + str(rng.randint(0, 9999))
+    if rng.random() < 0.2:
+        name = name.replace('o', 'O').replace('l', 'I')
+    return name
+
+def random_unknown_name(rng):
+    alphabet = string.ascii_letters + string.digits
+    return ''.join(rng.choice(alphabet) for _ in range(rng.randint(6, 12)))
+
+def corrupt(name, rng):
+    """Apply one OCR-style misread to a name."""
+    kind = rng.choice(['confusable', 'edit', 'suffix', 'case'])
+    if kind == 'confusable':
+        positions = [i for i, c in enumerate(name) if c in CONFUSIONS]
+        if positions:
+            i = rng.choice(positions)
+            return name[:i] + CONFUSIONS[name[i]] + name[i + 1:]
+    if kind == 'suffix' and len(name) > 7:
+        return name[:-rng.randint(1, 3)]
+    if kind == 'case':
+        return name.swapcase()
+    i = rng.randrange(len(name))
+    return name[:i] + rng.choice(string.ascii_lowercase) + name[i + 1:]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--names', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    # IGNs are unique ignoring case, so keep one name per normalized key
+    names = {}
+    while len(names) < args.names:
+        name = random_name(rng)
+        names.setdefault(normalize_name(name), name)
+    names = list(names.values())
+
+    index = NameIndex({})
+    start = time.perf_counter()
+    index.add_many(names)
+    build_time = time.perf_counter() - start
+
+    # A misread that is itself a real player's name can't be corrected
+    queries = []
+    while len(queries) < args.queries:
+        name = rng.choice(names)
+        query = corrupt(name, rng)
+        if query not in index.name_ids:
+            queries.append((query, name))
+
+    timings = []
+    correct = 0
+    for query, expected in queries:
+        start = time.perf_counter()
+        resolved = index.resolve(query)
+        timings.append(time.perf_counter() - start)
+        correct += resolved == expected
+
+    # Names that are not in the index should be left alone
+    unknown = [random_unknown_name(rng) for _ in range(args.queries)]
+    false_snaps = sum(index.resolve(name) != name for name in unknown)
+
+    timings.sort()
+    print(f"Indexed {len(index)} names in {build_time:.2f}s")
+    print(f"Resolution accuracy: {correct / len(queries) * 100:.1f}% ({correct}/{len(queries)})")
+    print(f"False snaps on unknown names: {false_snaps / len(unknown) * 100:.1f}%")
+    print(f"Lookup time: mean {sum(timings) / len(timings) * 1000:.3f} ms, "
+          f"p50 {timings[len(timings) // 2] * 1000:.3f} ms, "
+          f"p99 {timings[int(len(timings) * 0.99)] * 1000:.3f} ms")
+
+if __name__ == '__main__':
+    main()
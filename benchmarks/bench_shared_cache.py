@@ -0,0 +1,143 @@
+"""Benchmark upstream traffic from several tracker instances with and without the shared cache.
+
+Each instance is a separate TrackerLookup looking up the same lobby at the same
+time, as when two accounts on one PC capture the same match. A stub FlareSolverr
+counts the search and profile requests that reach it and the busiest second of
+traffic, first with every instance on its own and then with all of them using
+one cache daemon.
+
+Usage: python benchmarks/bench_shared_cache.py [--instances 3] [--players 12] [--rate 20]
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from cache_daemon import CacheDaemon
+from tracker_lookup import TrackerLookup
+
+PROFILE = {'data': {'segments': [{
+    'type': 'hero',
+    'metadata': {'name': 'Hela', 'roleName': 'Duelist'},
+    'attributes': {'heroId': '1024'},
+    'stats': {'matchesPlayed': {'value': 40}, 'matchesWon': {'value': 22}, 'kdaRatio': {'value': 3.1}},
+}]}}
+
+class StubFlareSolverr(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        if body['cmd'] == 'sessions.list':
+            data = {'status': 'ok', 'sessions': [{'id': 'bench'}]}
+        elif body['cmd'] == 'sessions.create':
+            data = {'status': 'ok', 'session': 'bench'}
+        else:
+            with self.server.lock:
+                self.server.requests.append(time.monotonic())
+            time.sleep(self.server.latency)
+            response = PROFILE if '/profile/' in body['url'] else {'data': [{'platformUserHandle': 'x'}]}
+            data = {'status': 'ok', 'solution': {'status': 200, 'response': json.dumps(response)}}
+
+        payload = json.dumps(data).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+def start_stub(latency):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubFlareSolverr)
+    server.daemon_threads = True
+    server.latency = latency
+    server.requests = []
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+def peak_rate(timestamps):
+    """Most requests seen in any one-second window."""
+    timestamps = sorted(timestamps)
+    peak, start = 0, 0
+    for end, stamp in enumerate(timestamps):
+        while stamp - timestamps[start] >= 1.0:
+            start += 1
+        peak = max(peak, end - start + 1)
+    return peak
+
+def run(stub, url, instances, players, rate, socket_path=None):
+    config = {
+        'flaresolverr': {
+            'url': url,
+            'min_request_delay': 1000 / rate,
+            'retry_delay': 10,
+            'throttle': {'max_rate': rate, 'rate_increase': 0, 'max_concurrency': 8},
+        },
+        'renderer': {'live_table': False},
+    }
+    if socket_path:
+        config['shared_cache'] = {'enabled': True, 'socket_path': socket_path, 'token': 'bench'}
+
+    lookups = [TrackerLookup(config) for _ in range(instances)]
+    for lookup in lookups:
+        lookup.throttle.concurrency = lookup.throttle.max_concurrency
+    lobby = [f"player{i}" for i in range(players)]
+    stub.requests = []
+
+    def capture(lookup):
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            return list(executor.map(lambda name: lookup.fetch_player(name)[0], lobby))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=instances) as executor:
+        results = list(executor.map(capture, lookups))
+    elapsed = time.perf_counter() - start
+    for lookup in lookups:
+        lookup.close()
+
+    found = sum(1 for captured in results for result in captured if result)
+    return len(stub.requests), peak_rate(stub.requests), elapsed, found
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--instances', type=int, default=3)
+    parser.add_argument('--players', type=int, default=12)
+    parser.add_argument('--rate', type=float, default=20, help="Requests per second allowed per instance")
+    parser.add_argument('--latency', type=float, default=0.05)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    stub, url = start_stub(args.latency)
+    total = args.instances * args.players
+    print(f"{args.instances} instances looking up the same {args.players} players, {args.rate:.0f} req/s each")
+
+    requests_made, peak, elapsed, found = run(stub, url, args.instances, args.players, args.rate)
+    print(f"independent:  {requests_made:3d} upstream requests, peak {peak:3d} req/s, "
+          f"{elapsed:5.2f}s, {found}/{total} results")
+
+    with tempfile.TemporaryDirectory() as directory:
+        socket_path = os.path.join(directory, 'cache.sock')
+        daemon = CacheDaemon({'shared_cache': {'socket_path': socket_path, 'token': 'bench'}})
+        threading.Thread(target=daemon.serve_forever, daemon=True).start()
+        while not os.path.exists(socket_path):
+            time.sleep(0.01)
+
+        requests_made, peak, elapsed, found = run(stub, url, args.instances, args.players, args.rate, socket_path)
+        print(f"shared cache: {requests_made:3d} upstream requests, peak {peak:3d} req/s, "
+              f"{elapsed:5.2f}s, {found}/{total} results")
+        print(f"daemon stats: {daemon.dispatch({'op': 'stats'})}")
+        daemon.shutdown()
+
+    stub.shutdown()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,253 @@
+import logging
+import threading
+import time
+import numpy as np
+
+class MatchupAnalytics:
+    """Lobby-level matchup summaries computed over columnar arrays from matches.db.
+
+    Stored stats are loaded into NumPy arrays once and then kept up to date as
+    players are looked up, so each capture only does a handful of vectorized
+    lookups and reductions. Captures from the hotkey and the local service can
+    arrive together, so the arrays are only touched under a lock.
+    """
+
+    def __init__(self, database, config=None):
+        self.logger = logging.getLogger(__name__)
+        self.database = database
+
+        form_config = (config or {}).get('recent_form', {})
+        self.form_window = form_config.get('window_days', 7) * 86400
+        self.form_min_games = form_config.get('min_games', 3)
+        self.loaded = False
+        self.results_version = None
+        self.cleanup_version = 0
+
+        self.player_index = {}
+        self.role_index = {}
+        self.main_win_rate = np.empty(0)
+        self.main_role = np.empty(0, dtype=np.int64)
+
+        self.opponent_index = {}
+        self.opponent_games = np.empty(0)
+        self.opponent_wins = np.empty(0)
+        self.hero_names = {}
+        self._lock = threading.RLock()
+
+    def refresh(self):
+        """Load the columnar arrays on first use and reload history when results change.
+
+        After old records are cleaned up, every array is loaded again.
+        """
+        with self._lock:
+            if self.cleanup_version != self.database.cleanup_version:
+                self.cleanup_version = self.database.cleanup_version
+                self.loaded = False
+                self.results_version = None
+            if not self.loaded:
+                self.load_hero_stats()
+                self.hero_names = self.database.load_hero_names()
+                self.loaded = True
+            if self.results_version != self.database.results_version:
+                self.results_version = self.database.results_version
+                self.load_opponent_history()
+
+    def load_hero_stats(self):
+        """Compute every player's most-played hero win rate and role."""
+        columns = self.database.load_hero_columns()
+
+        self.player_index = {}
+        players = np.array(
+            [self.player_index.setdefault(p, len(self.player_index)) for p in columns['player']],
+            dtype=np.int64
+        )
+        self.role_index = {}
+        roles = np.array(
+            [self.role_index.setdefault(r, len(self.role_index)) for r in columns['role']],
+            dtype=np.int64
+        )
+        matches = np.array(columns['matches'], dtype=np.float64)
+        wins = np.array(columns['wins'], dtype=np.float64)
+
+        # Sort by player, then matches, and keep the last (most played) row per player
+        order = np.lexsort((matches, players))
+        sorted_players = players[order]
+        is_last = np.ones(len(order), dtype=bool)
+        is_last[:-1] = sorted_players[1:] != sorted_players[:-1]
+        main_rows = order[is_last]
+
+        self.main_win_rate = np.full(len(self.player_index), np.nan)
+        self.main_role = np.full(len(self.player_index), -1, dtype=np.int64)
+        main_matches = matches[main_rows]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rates = np.where(main_matches > 0, wins[main_rows] / main_matches, np.nan)
+        self.main_win_rate[players[main_rows]] = rates
+        self.main_role[players[main_rows]] = roles[main_rows]
+
+    def update_player(self, player, heroes):
+        """Update a single player's main hero after a fresh lookup."""
+        with self._lock:
+            if not self.loaded or not heroes:
+                return
+            for hero in heroes:
+                self.hero_names.setdefault(hero['id'], hero['name'])
+
+            main = max(heroes, key=lambda hero: hero['matches'])
+            code = self.player_index.setdefault(player, len(self.player_index))
+            if code >= len(self.main_win_rate):
+                self.main_win_rate = np.append(self.main_win_rate, np.nan)
+                self.main_role = np.append(self.main_role, -1)
+
+            role = main.get('role') or 'Unknown'
+            self.main_role[code] = self.role_index.setdefault(role, len(self.role_index))
+            self.main_win_rate[code] = main['wins'] / main['matches'] if main['matches'] > 0 else np.nan
+
+    def load_opponent_history(self):
+        """Aggregate our results against every opponent seen in a finished match."""
+        self.opponent_index = {}
+        codes = []
+        outcomes = []
+        for _, enemy_team, result in self.database.load_match_results():
+            for player in enemy_team:
+                codes.append(self.opponent_index.setdefault(player, len(self.opponent_index)))
+                outcomes.append(result)
+
+        codes = np.array(codes, dtype=np.int64)
+        outcomes = np.array(outcomes, dtype=np.float64)
+        size = len(self.opponent_index)
+        self.opponent_games = np.bincount(codes, minlength=size).astype(np.float64)
+        self.opponent_wins = np.bincount(codes, weights=outcomes, minlength=size)
+
+    def team_summary(self, team):
+        """Summarize a team's average main-hero win rate and role coverage."""
+        codes = np.array([self.player_index.get(p, -1) for p in team], dtype=np.int64)
+        known = codes[codes >= 0]
+
+        rates = self.main_win_rate[known]
+        rates = rates[~np.isnan(rates)]
+        roles = self.main_role[known]
+        role_names = list(self.role_index)
+        coverage = np.bincount(roles[roles >= 0], minlength=len(role_names))
+
+        return {
+            'players_known': int(known.size),
+            'avg_main_win_rate': float(rates.mean()) if rates.size else None,
+            'role_coverage': {
+                role_names[i]: int(count) for i, count in enumerate(coverage) if count
+            },
+        }
+
+    def recurring_opponents(self, enemy_team):
+        """Return each side's historical win rate for enemies we have played before."""
+        codes = np.array([self.opponent_index.get(p, -1) for p in enemy_team], dtype=np.int64)
+        seen = codes >= 0
+        games = self.opponent_games[codes[seen]]
+        friendly_rates = self.opponent_wins[codes[seen]] / games
+
+        names = [p for p, is_seen in zip(enemy_team, seen) if is_seen]
+        return [
+            {
+                'player': name,
+                'games': int(count),
+                'friendly_win_rate': float(rate),
+                'enemy_win_rate': float(1 - rate),
+            }
+            for name, count, rate in zip(names, games, friendly_rates)
+        ]
+
+    def recent_form(self, players, now=None):
+        """Compute each player's recent form from their stat snapshots.
+
+        For every (player, hero) the games and wins played since the start of
+        the form window are the difference between the latest snapshot and the
+        last one taken before the window (or the first one, for heroes first
+        seen inside it). Returns players with at least form_min_games recent
+        games, best recent win rate first.
+        """
+        columns = self.database.load_snapshot_columns(players)
+        if not columns['player']:
+            return []
+
+        player_index = {}
+        player_codes = np.array(
+            [player_index.setdefault(p, len(player_index)) for p in columns['player']], dtype=np.int64
+        )
+        hero_index = {}
+        hero_codes = np.array(
+            [hero_index.setdefault(h, len(hero_index)) for h in columns['hero_id']], dtype=np.int64
+        )
+        taken_at = np.array(columns['taken_at'], dtype=np.float64)
+        matches = np.array(columns['matches'], dtype=np.float64)
+        wins = np.array(columns['wins'], dtype=np.float64)
+
+        # Sort into (player, hero) groups, oldest snapshot first within each
+        groups = player_codes * len(hero_index) + hero_codes
+        order = np.lexsort((taken_at, groups))
+        groups, taken_at, matches, wins = groups[order], taken_at[order], matches[order], wins[order]
+
+        is_start = np.ones(len(groups), dtype=bool)
+        is_start[1:] = groups[1:] != groups[:-1]
+        starts = np.flatnonzero(is_start)
+        ends = np.append(starts[1:] - 1, len(groups) - 1)
+        group_of_row = np.cumsum(is_start) - 1
+
+        # Rows at or before the window start come first in each group
+        cutoff = (now or time.time()) - self.form_window
+        before = np.bincount(group_of_row[taken_at <= cutoff], minlength=len(starts))
+        baseline = starts + np.maximum(before - 1, 0)
+
+        recent_games = matches[ends] - matches[baseline]
+        recent_wins = wins[ends] - wins[baseline]
+        # Totals that went down were reset (new season), so everything since counts
+        reset = recent_games < 0
+        recent_games[reset] = matches[ends][reset]
+        recent_wins[reset] = wins[ends][reset]
+
+        group_players = groups[starts] // len(hero_index)
+        group_heroes = groups[starts] % len(hero_index)
+        size = len(player_index)
+        games = np.bincount(group_players, weights=recent_games, minlength=size)
+        won = np.bincount(group_players, weights=recent_wins, minlength=size)
+        lifetime_games = np.bincount(group_players, weights=matches[ends], minlength=size)
+        lifetime_wins = np.bincount(group_players, weights=wins[ends], minlength=size)
+
+        self.refresh()
+        hero_ids = list(hero_index)
+        hero_names = self.hero_names
+        player_names = list(player_index)
+        form = []
+        for code in np.flatnonzero(games >= max(1, self.form_min_games)):
+            played = np.flatnonzero((group_players == code) & (recent_games > 0))
+            played = played[np.argsort(-recent_games[played])]
+            win_rate = won[code] / games[code]
+            lifetime_rate = lifetime_wins[code] / lifetime_games[code]
+            form.append({
+                'player': player_names[code],
+                'games': int(games[code]),
+                'win_rate': float(win_rate),
+                'lifetime_win_rate': float(lifetime_rate),
+                'delta': float(win_rate - lifetime_rate),
+                'heroes': [
+                    {
+                        'hero': hero_names.get(hero_ids[group_heroes[i]], hero_ids[group_heroes[i]]),
+                        'games': int(recent_games[i]),
+                        'win_rate': float(recent_wins[i] / recent_games[i]),
+                    }
+                    for i in played
+                ],
+            })
+        form.sort(key=lambda entry: entry['win_rate'], reverse=True)
+        return form
+
+    def summarize_lobby(self, friendly_team, enemy_team):
+        """Compute the matchup summary for a captured lobby."""
+        with self._lock:
+            self.refresh()
+            summary = {
+                'friendly': self.team_summary(friendly_team),
+                'enemy': self.team_summary(enemy_team),
+                'recurring_opponents': self.recurring_opponents(enemy_team),
+            }
+        # Reads only the database, not the shared arrays
+        summary['recent_form'] = self.recent_form(list(friendly_team) + list(enemy_team))
+        return summary
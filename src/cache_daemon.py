@@ -0,0 +1,418 @@
+import hmac
+import json
+import logging
+import os
+import secrets
+import socket
+import socketserver
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# A lookup result is a few KB; anything far larger is not one of ours
+MAX_LINE_BYTES = 64 * 1024
+# The slowest pace the throttle runs at is one request per 10s
+MAX_SLOT_INTERVAL = 10
+# Bound on how far one instance can push back everyone's schedule
+MAX_SLOT_WAIT = 30
+
+def shared_token(config, create=False):
+    """Return the token clients present to the daemon.
+
+    It comes from `shared_cache.token`, or else from `token_file`, which the
+    daemon creates with a random token (readable by this user only) the
+    first time it starts. Returns None if neither is set yet.
+    """
+    shared_config = config.get('shared_cache', {})
+    if shared_config.get('token'):
+        return shared_config['token']
+    path = os.path.join(ROOT, shared_config.get('token_file', 'data/shared_cache.token'))
+    try:
+        with open(path, 'r') as f:
+            token = f.read().strip()
+    except FileNotFoundError:
+        token = None
+    if token or not create:
+        return token
+    token = secrets.token_hex(16)
+    with os.fdopen(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'w') as f:
+        f.write(token)
+    return token
+
+def validate_result(key, value):
+    """Raise ValueError unless value is a lookup result for key."""
+    if not isinstance(value, dict) or value.get('player') != key:
+        raise ValueError("value must be a lookup result for the key")
+    if not isinstance(value.get('fetched_at'), (int, float)):
+        raise ValueError("value needs a numeric fetched_at")
+    heroes = value.get('heroes')
+    if not isinstance(heroes, list):
+        raise ValueError("value needs a list of heroes")
+    for hero in heroes:
+        if not isinstance(hero, dict):
+            raise ValueError("heroes must be objects")
+        if not all(isinstance(hero.get(field), str) for field in ('id', 'name', 'role')):
+            raise ValueError("heroes need string id, name and role")
+        if not all(isinstance(hero.get(field), (int, float)) for field in ('matches', 'wins', 'kda')):
+            raise ValueError("heroes need numeric matches, wins and kda")
+
+class CacheRequestHandler(socketserver.StreamRequestHandler):
+    """Serves JSON-lines requests from one tracker connection until it closes.
+
+    The first request must be {op: auth, token}. A line that isn't a JSON
+    object, or is too long to be one of ours, closes the connection.
+    """
+
+    def handle(self):
+        daemon = self.server.cache_daemon
+        authorized = False
+        while True:
+            line = self.rfile.readline(MAX_LINE_BYTES + 1)
+            if not line:
+                return
+            try:
+                request = json.loads(line) if len(line) <= MAX_LINE_BYTES else None
+            except ValueError:
+                request = None
+            if not isinstance(request, dict):
+                self.send({'error': 'Expected one JSON object per line'})
+                return
+
+            if not authorized:
+                token = request.get('token') if request.get('op') == 'auth' else None
+                if not isinstance(token, str) or not hmac.compare_digest(token.encode(), daemon.token.encode()):
+                    daemon.logger.warning("Rejected a cache client with a missing or invalid token")
+                    self.send({'error': 'Missing or invalid token'})
+                    return
+                authorized = True
+                self.send({'ok': True})
+                continue
+
+            try:
+                response = daemon.dispatch(request)
+            except Exception as e:
+                response = {'error': str(e)}
+            self.send(response)
+
+    def send(self, response):
+        self.wfile.write((json.dumps(response) + '\n').encode('utf-8'))
+
+class UnixCacheServer(socketserver.ThreadingUnixStreamServer):
+    # Every tracker thread holds its own connection, and a lobby opens a burst of them
+    request_queue_size = 128
+    daemon_threads = True
+
+class TCPCacheServer(socketserver.ThreadingTCPServer):
+    request_queue_size = 128
+    daemon_threads = True
+    allow_reuse_address = True
+
+class CacheDaemon:
+    """Lookup cache, single-flight leases and a request budget shared by tracker instances.
+
+    Requests are JSON objects, one per line, with an `op` of:
+      auth    {token}                  -> {ok}     (first request on a connection)
+      get     {key, max_age}           -> {value}
+      put     {key, value, stored_at}  -> {ok}     (also ends the key's lease)
+      lease   {key, max_age, timeout}  -> {value} or {lease: true} or {} on timeout
+      renew   {key}                    -> {ok}     (holder is still fetching)
+      release {key}                    -> {ok}     (lease holder gave up)
+      slot    {interval}               -> {wait}   (seconds to wait before the request)
+      stats   {}                       -> counters
+    """
+
+    def __init__(self, config):
+        self.logger = logging.getLogger(__name__)
+
+        shared_config = config.get('shared_cache', {})
+        self.socket_path = shared_config.get('socket_path')
+        self.port = shared_config.get('port', 8192)
+        # Holders renew their lease while fetching, so this only has to outlast a
+        # few missed renewals before a crashed holder's key is handed out again
+        self.lease_ttl = shared_config.get('lease_ttl', 120)
+        self.max_entries = shared_config.get('max_entries', 5000)
+        self.config = config
+        self.token = shared_config.get('token')
+
+        self.entries = OrderedDict()
+        self.leases = {}
+        self.next_slot = 0.0
+        self.stats = {'hits': 0, 'misses': 0, 'puts': 0, 'leased': 0, 'joined': 0, 'slots': 0}
+        self._condition = threading.Condition()
+        self.server = None
+
+    def dispatch(self, request):
+        op = request.get('op')
+        key = request.get('key')
+        if op in ('get', 'put', 'lease', 'renew', 'release') and not isinstance(key, str):
+            return {'error': 'key must be a string'}
+        if op == 'get':
+            return {'value': self.get(key, request.get('max_age'))}
+        if op == 'put':
+            validate_result(key, request.get('value'))
+            self.put(key, request['value'], request.get('stored_at'))
+            return {'ok': True}
+        if op == 'lease':
+            return self.lease(key, request.get('max_age'), request.get('timeout', 60))
+        if op == 'renew':
+            return {'ok': self.renew(key)}
+        if op == 'release':
+            self.release(key)
+            return {'ok': True}
+        if op == 'slot':
+            return {'wait': self.reserve_slot(float(request['interval']))}
+        if op == 'stats':
+            with self._condition:
+                return dict(self.stats, entries=len(self.entries), leases=len(self.leases))
+        return {'error': f"Unknown op: {op}"}
+
+    def lookup(self, key, max_age):
+        """Return a cached value no older than max_age. Caller must hold the lock."""
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        value, stored_at = entry
+        if max_age is not None and time.time() - stored_at >= max_age:
+            return None
+        self.entries.move_to_end(key)
+        return value
+
+    def get(self, key, max_age=None):
+        with self._condition:
+            value = self.lookup(key, max_age)
+            self.stats['hits' if value is not None else 'misses'] += 1
+            return value
+
+    def put(self, key, value, stored_at=None):
+        with self._condition:
+            self.entries[key] = (value, stored_at or time.time())
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            self.leases.pop(key, None)
+            self.stats['puts'] += 1
+            self._condition.notify_all()
+
+    def lease(self, key, max_age, timeout):
+        """Return a fresh value, or make the caller responsible for fetching it.
+
+        Callers that find the key already leased wait for the holder's put (or
+        release, after which one of them takes over) up to timeout seconds.
+        """
+        deadline = time.monotonic() + timeout
+        waited = False
+        with self._condition:
+            while True:
+                value = self.lookup(key, max_age)
+                if value is not None:
+                    self.stats['joined' if waited else 'hits'] += 1
+                    return {'value': value}
+
+                # Leases expire so a crashed holder can't block the key forever
+                now = time.monotonic()
+                if self.leases.get(key, 0) <= now:
+                    self.leases[key] = now + self.lease_ttl
+                    self.stats['leased'] += 1
+                    return {'lease': True}
+
+                remaining = deadline - now
+                if remaining <= 0:
+                    return {}
+                waited = True
+                self._condition.wait(remaining)
+
+    def renew(self, key):
+        """Extend a lease whose holder is still fetching. Returns False if it had ended."""
+        with self._condition:
+            if key not in self.leases:
+                return False
+            self.leases[key] = time.monotonic() + self.lease_ttl
+            return True
+
+    def release(self, key):
+        with self._condition:
+            self.leases.pop(key, None)
+            self._condition.notify_all()
+
+    def reserve_slot(self, interval):
+        """Reserve the next request slot across all instances.
+
+        Each reservation pushes the shared schedule back by the caller's own
+        request interval, so all instances together keep to one instance's pace.
+        Intervals and waits are clamped so no instance can stall the others.
+        """
+        interval = min(max(interval, 0.0), MAX_SLOT_INTERVAL)
+        with self._condition:
+            now = time.monotonic()
+            start = max(now, min(self.next_slot, now + MAX_SLOT_WAIT))
+            self.next_slot = start + interval
+            self.stats['slots'] += 1
+            return start - now
+
+    def serve_forever(self):
+        self.token = shared_token(self.config, create=True)
+        if self.socket_path:
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+            self.server = UnixCacheServer(self.socket_path, CacheRequestHandler)
+            address = self.socket_path
+        else:
+            self.server = TCPCacheServer(('127.0.0.1', self.port), CacheRequestHandler)
+            address = f"127.0.0.1:{self.server.server_address[1]}"
+        self.server.cache_daemon = self
+        self.logger.info(f"Shared lookup cache listening on {address}")
+        try:
+            self.server.serve_forever()
+        finally:
+            self.server.server_close()
+            if self.socket_path and os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+
+    def shutdown(self):
+        if self.server:
+            self.server.shutdown()
+
+class SharedCacheClient:
+    """Client for the shared cache daemon, used by TrackerLookup when configured.
+
+    Every call degrades to local-only behaviour (a miss, fetching the player
+    ourselves, no extra wait) if the daemon can't be reached, and reconnecting
+    is retried after `retry_seconds`.
+    """
+
+    def __init__(self, config):
+        self.logger = logging.getLogger(__name__)
+
+        shared_config = config.get('shared_cache', {})
+        self.socket_path = shared_config.get('socket_path')
+        self.port = shared_config.get('port', 8192)
+        self.lease_timeout = shared_config.get('lease_timeout', 90)
+        self.renew_interval = shared_config.get('renew_interval', 30)
+        self.request_timeout = shared_config.get('request_timeout', 2)
+        self.retry_seconds = shared_config.get('retry_seconds', 30)
+        self.config = config
+
+        self.unavailable_until = 0
+        self.local = threading.local()
+
+    def connect(self):
+        if self.socket_path:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.request_timeout)
+            sock.connect(self.socket_path)
+        else:
+            sock = socket.create_connection(('127.0.0.1', self.port), timeout=self.request_timeout)
+        reader = sock.makefile('rb')
+        try:
+            # Read on every connect, since the daemon may create it after we start
+            sock.sendall((json.dumps({'op': 'auth', 'token': shared_token(self.config) or ''}) + '\n').encode('utf-8'))
+            line = reader.readline()
+            if not line or not json.loads(line).get('ok'):
+                raise ConnectionError("cache daemon rejected our token")
+        except (OSError, ValueError):
+            reader.close()
+            sock.close()
+            raise
+        return sock, reader
+
+    def request(self, payload, timeout=None):
+        """Send one request on this thread's connection. Returns None if the daemon is unreachable."""
+        if time.monotonic() < self.unavailable_until:
+            return None
+        connection = getattr(self.local, 'connection', None)
+        try:
+            if connection is None:
+                connection = self.local.connection = self.connect()
+            sock, reader = connection
+            sock.settimeout((timeout or 0) + self.request_timeout)
+            sock.sendall((json.dumps(payload) + '\n').encode('utf-8'))
+            line = reader.readline()
+            if not line:
+                raise ConnectionError("connection closed by cache daemon")
+            return json.loads(line)
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Shared cache unavailable, using local cache only: {str(e)}")
+            self.close_connection()
+            self.unavailable_until = time.monotonic() + self.retry_seconds
+            return None
+
+    def close_connection(self):
+        connection = getattr(self.local, 'connection', None)
+        self.local.connection = None
+        if connection:
+            try:
+                connection[1].close()
+                connection[0].close()
+            except OSError:
+                pass
+
+    def get(self, key, max_age=None):
+        response = self.request({'op': 'get', 'key': key, 'max_age': max_age})
+        return response.get('value') if response else None
+
+    def put(self, key, value, stored_at=None):
+        self.request({'op': 'put', 'key': key, 'value': value, 'stored_at': stored_at})
+
+    def lease(self, key, max_age):
+        """Return (value, leased): a fresh shared value, or whether we should fetch it ourselves."""
+        response = self.request(
+            {'op': 'lease', 'key': key, 'max_age': max_age, 'timeout': self.lease_timeout},
+            timeout=self.lease_timeout
+        )
+        if not response:
+            # No daemon or the holder is taking too long: fetch locally
+            return None, False
+        return response.get('value'), response.get('lease', False)
+
+    def renew(self, key):
+        response = self.request({'op': 'renew', 'key': key})
+        return bool(response and response.get('ok'))
+
+    @contextmanager
+    def keep_lease(self, key):
+        """Renew a lease every `renew_interval` seconds while the caller fetches the value."""
+        done = threading.Event()
+
+        def renew_until_done():
+            while not done.wait(self.renew_interval):
+                if not self.renew(key):
+                    break
+            self.close_connection()
+
+        threading.Thread(target=renew_until_done, daemon=True).start()
+        try:
+            yield
+        finally:
+            done.set()
+
+    def release(self, key):
+        self.request({'op': 'release', 'key': key})
+
+    def reserve_slot(self, interval):
+        """Return seconds to wait before sending a request under the shared budget, or None."""
+        response = self.request({'op': 'slot', 'interval': interval})
+        if not response or not isinstance(response.get('wait'), (int, float)):
+            return None
+        return min(max(response['wait'], 0.0), MAX_SLOT_WAIT)
+
+def main():
+    config_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'config', 'config.json')
+    with open(config_path, 'r') as f:
+        config = json.load(f)
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        stream=sys.stdout
+    )
+    daemon = CacheDaemon(config)
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
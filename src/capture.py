@@ -8,6 +8,7 @@ from datetime import datetime
 import numpy as np
 import hashlib
 import time
+from profiling import profiled
 
 class ScreenCapture:
     def __init__(self, config):
@@ -35,13 +36,15 @@ class ScreenCapture:
             window = win32gui.GetWindowRect(hwnd)
             window_size = (window[2] - window[0], window[3] - window[1])
             
-            self.logger.debug(f"Window style: {style}")
-            self.logger.debug(f"Is popup: {is_popup}")
-            self.logger.debug(f"Is maximized: {is_maximized}")
-            self.logger.debug(f"Has border: {has_border}")
-            self.logger.debug(f"Has caption: {has_caption}")
-            self.logger.debug(f"Monitor size: {monitor}")
-            self.logger.debug(f"Window size: {window_size}")
+            self.logger.debug("Window state", extra={'fields': {
+                'style': style,
+                'is_popup': is_popup,
+                'is_maximized': is_maximized,
+                'has_border': has_border,
+                'has_caption': has_caption,
+                'monitor_size': monitor,
+                'window_size': window_size
+            }})
             
             return (is_popup and not has_border) or (is_maximized and window_size == monitor)
             
@@ -51,7 +54,7 @@ class ScreenCapture:
 
     def get_window_handle(self):
         """Find the game window handle."""
-        self.logger.info(f"Searching for window with title: {self.game_window_title}")
+        self.logger.debug("Searching for window with title: %s", self.game_window_title)
         hwnd = win32gui.FindWindow(None, self.game_window_title)
         if not hwnd:
             self.logger.error(f"Could not find window with title: {self.game_window_title}")
@@ -64,19 +67,13 @@ class ScreenCapture:
                 return True
             windows = []
             win32gui.EnumWindows(callback, windows)
-            self.logger.info(f"Available windows: {', '.join(windows)}")
+            self.logger.info("Available windows: %s", ', '.join(windows))
             return None
             
-        self.logger.info(f"Found window handle: {hwnd}")
-        
-        # Check window state
-        if self.is_fullscreen(hwnd):
-            self.logger.info("Window is in fullscreen mode")
-        else:
-            self.logger.info("Window is in windowed mode")
-            
+        self.logger.debug("Found window handle: %s", hwnd)
         return hwnd
 
+    @profiled('capture_window')
     def capture_window(self):
         """Capture the game window."""
         try:
@@ -89,10 +86,9 @@ class ScreenCapture:
             width = right - left
             height = bottom - top
 
-            self.logger.info("Capturing with ImageGrab")
-            
             # Bring window to foreground
-            if self.is_fullscreen(hwnd):
+            fullscreen = self.is_fullscreen(hwnd)
+            if fullscreen:
                 win32gui.SetForegroundWindow(hwnd)
                 time.sleep(0.1)  # Give window time to come to foreground
             
@@ -122,17 +118,18 @@ class ScreenCapture:
             # Ensure temp directory exists
             os.makedirs(self.temp_folder, exist_ok=True)
             
-            # Log capture details
-            self.logger.info(f"New capture - Hash: {current_hash[:8]}")
-            self.logger.info(f"Window dimensions: {width}x{height}")
-            self.logger.info(f"Image dimensions: {image.size}")
-            self.logger.info(f"Saving to: {filepath}")
-            
             image.save(filepath)
             
             if os.path.exists(filepath):
-                file_size = os.path.getsize(filepath)
-                self.logger.info(f"Saved successfully. File size: {file_size} bytes")
+                # Log capture details
+                self.logger.info("New capture saved", extra={'fields': {
+                    'hash': current_hash[:8],
+                    'fullscreen': fullscreen,
+                    'window_size': (width, height),
+                    'image_size': image.size,
+                    'path': filepath,
+                    'file_size': os.path.getsize(filepath)
+                }})
                 
                 # Verify saved file
                 with Image.open(filepath) as saved_img:
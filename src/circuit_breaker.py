@@ -0,0 +1,116 @@
+import logging
+import threading
+import time
+
+STATE_CLOSED = 'closed'
+STATE_OPEN = 'open'
+STATE_HALF_OPEN = 'half_open'
+
+class UpstreamUnavailableError(Exception):
+    """Raised when an upstream can't be called right now, so stale data may be served."""
+
+class CircuitOpenError(UpstreamUnavailableError):
+    """Raised instead of calling an upstream whose circuit breaker is open."""
+
+    def __init__(self, name, retry_in):
+        super().__init__(f"{name} circuit is open, retrying in {retry_in:.0f}s")
+        self.name = name
+        self.retry_in = retry_in
+
+class CircuitBreaker:
+    """Fails calls to an upstream fast after repeated failures.
+
+    After `failure_threshold` consecutive failures the circuit opens and every
+    call is refused for `reset_timeout` seconds. Then a single probe call is let
+    through (half-open): success closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, name, config):
+        self.logger = logging.getLogger(__name__)
+        self.name = name
+
+        breaker_config = config.get('circuit_breakers', {}).get(name, {})
+        self.failure_threshold = breaker_config.get('failure_threshold', 3)
+        self.reset_timeout = breaker_config.get('reset_timeout', 30)
+
+        self.state = STATE_CLOSED
+        self.failures = 0
+        self.opened_at = 0
+        self.probe_started = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Check if a call may go through, claiming the probe slot when half-open."""
+        return self.claim()[0]
+
+    def claim(self):
+        """Return (allowed, probe), where probe is True if this call claimed the probe slot."""
+        with self._lock:
+            if self.state == STATE_CLOSED:
+                return True, False
+
+            now = time.monotonic()
+            if self.state == STATE_OPEN and now - self.opened_at >= self.reset_timeout:
+                self.state = STATE_HALF_OPEN
+                self.logger.info(f"{self.name} circuit half-open, sending a probe")
+            # A probe that never reported back must not wedge the circuit
+            if self.state == STATE_HALF_OPEN and now - self.probe_started >= self.reset_timeout:
+                self.probe_started = now
+                return True, True
+
+            self.rejected += 1
+            return False, False
+
+    def check(self):
+        """Raise CircuitOpenError unless a call may go through.
+
+        Returns True if the call is the half-open probe. A probe must report
+        its outcome with record_success() or record_failure(), or give the
+        slot back with release_probe().
+        """
+        allowed, probe = self.claim()
+        if not allowed:
+            raise CircuitOpenError(self.name, self.retry_in())
+        return probe
+
+    def release_probe(self):
+        """Let another call probe, if the claimed probe ended without an outcome."""
+        with self._lock:
+            if self.state == STATE_HALF_OPEN:
+                self.probe_started = 0
+
+    def retry_in(self):
+        """Seconds until the next probe is allowed."""
+        with self._lock:
+            since = self.probe_started if self.state == STATE_HALF_OPEN else self.opened_at
+            return max(0.0, self.reset_timeout - (time.monotonic() - since))
+
+    def record_success(self):
+        with self._lock:
+            if self.state != STATE_CLOSED:
+                self.logger.info(f"{self.name} circuit closed")
+            self.state = STATE_CLOSED
+            self.failures = 0
+            self.probe_started = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == STATE_HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != STATE_OPEN:
+                    self.logger.warning(
+                        f"{self.name} circuit opened after {self.failures} failures, "
+                        f"failing fast for {self.reset_timeout}s"
+                    )
+                self.state = STATE_OPEN
+                self.opened_at = time.monotonic()
+                self.probe_started = 0
+
+    def metrics(self):
+        with self._lock:
+            return {
+                'state': self.state,
+                'failures': self.failures,
+                'rejected': self.rejected,
+            }
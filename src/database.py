@@ -10,6 +10,10 @@ class Database:
         self.logger = logging.getLogger(__name__)
         db_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), config['database_path'])
         self.db_path = db_path
+        # Incremented whenever a match result is recorded so readers can reload
+        self.results_version = 0
+        # Incremented after old records are deleted so readers can reload everything
+        self.cleanup_version = 0
         self.init_database()
 
     def init_database(self):
@@ -33,6 +37,48 @@ class Database:
                     )
                 ''')
                 
+                # Add match outcome column to databases created before it existed
+                columns = [row[1] for row in cursor.execute("PRAGMA table_info(matches)")]
+                if 'result' not in columns:
+                    cursor.execute('ALTER TABLE matches ADD COLUMN result INTEGER')
+                
+                # Create per-hero stats table with the latest lookup for each player
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS player_heroes (
+                        player TEXT NOT NULL,
+                        hero_id TEXT NOT NULL,
+                        hero_name TEXT,
+                        role TEXT,
+                        matches REAL,
+                        wins REAL,
+                        kda REAL,
+                        updated_at REAL,
+                        PRIMARY KEY (player, hero_id)
+                    )
+                ''')
+                
+                # Create per-hero stats history. A row is only written when a hero's
+                # totals changed since the previous lookup, so a player's stats at any
+                # time are the latest row per hero up to then.
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS hero_snapshots (
+                        player TEXT NOT NULL,
+                        hero_id TEXT NOT NULL,
+                        taken_at REAL NOT NULL,
+                        matches REAL,
+                        wins REAL,
+                        kda REAL,
+                        PRIMARY KEY (player, hero_id, taken_at)
+                    )
+                ''')
+                
+                # Seed the history from stats stored before it existed
+                cursor.execute('''
+                    INSERT INTO hero_snapshots (player, hero_id, taken_at, matches, wins, kda)
+                    SELECT player, hero_id, updated_at, matches, wins, kda FROM player_heroes
+                    WHERE NOT EXISTS (SELECT 1 FROM hero_snapshots)
+                ''')
+                
                 conn.commit()
                 self.logger.info("Database initialized successfully")
         except Exception as e:
@@ -60,6 +106,209 @@ class Database:
             self.logger.error(f"Error storing match data: {str(e)}")
             return None
 
+    def update_match_teams(self, match_id, friendly_team, enemy_team):
+        """Replace the teams of a stored match, e.g. after re-reading its lobby."""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    'UPDATE matches SET friendly_team = ?, enemy_team = ? WHERE id = ?',
+                    (json.dumps(friendly_team), json.dumps(enemy_team), match_id)
+                )
+                conn.commit()
+                # Opponent history counts the enemies of finished matches
+                self.results_version += 1
+                return cursor.rowcount > 0
+        except Exception as e:
+            self.logger.error(f"Error updating match teams: {str(e)}")
+            return False
+
+    def record_match_result(self, match_id, won):
+        """Record whether a stored match was won."""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    'UPDATE matches SET result = ? WHERE id = ?',
+                    (1 if won else 0, match_id)
+                )
+                conn.commit()
+                self.results_version += 1
+                return cursor.rowcount > 0
+        except Exception as e:
+            self.logger.error(f"Error recording match result: {str(e)}")
+            return False
+
+    def store_player_stats(self, player, heroes, updated_at):
+        """Store the latest per-hero stats for a player and snapshot the heroes that changed."""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    'SELECT hero_id, matches, wins FROM player_heroes WHERE player = ?',
+                    (player,)
+                )
+                previous = {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
+                cursor.executemany('''
+                    INSERT OR IGNORE INTO hero_snapshots (player, hero_id, taken_at, matches, wins, kda)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', [
+                    (player, hero['id'], updated_at, hero['matches'], hero['wins'], hero['kda'])
+                    for hero in heroes
+                    if previous.get(hero['id']) != (hero['matches'], hero['wins'])
+                ])
+                cursor.executemany('''
+                    INSERT OR REPLACE INTO player_heroes
+                        (player, hero_id, hero_name, role, matches, wins, kda, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ''', [
+                    (player, hero['id'], hero['name'], hero.get('role'),
+                     hero['matches'], hero['wins'], hero['kda'], updated_at)
+                    for hero in heroes
+                ])
+                conn.commit()
+        except Exception as e:
+            self.logger.error(f"Error storing player stats: {str(e)}")
+
+    def load_hero_columns(self):
+        """Load all stored per-hero stats as column lists."""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT player, role, matches, wins
+                    FROM player_heroes
+                ''')
+                rows = cursor.fetchall()
+                return {
+                    'player': [row[0] for row in rows],
+                    'role': [row[1] or 'Unknown' for row in rows],
+                    'matches': [row[2] for row in rows],
+                    'wins': [row[3] for row in rows],
+                }
+        except Exception as e:
+            self.logger.error(f"Error loading hero stats: {str(e)}")
+            return {'player': [], 'role': [], 'matches': [], 'wins': []}
+
+    def load_snapshot_columns(self, players):
+        """Load the stats history of the given players as column lists."""
+        empty = {'player': [], 'hero_id': [], 'taken_at': [], 'matches': [], 'wins': []}
+        if not players:
+            return empty
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                placeholders = ', '.join('?' * len(players))
+                cursor.execute(f'''
+                    SELECT player, hero_id, taken_at, matches, wins
+                    FROM hero_snapshots
+                    WHERE player IN ({placeholders})
+                ''', list(players))
+                rows = cursor.fetchall()
+                return {
+                    'player': [row[0] for row in rows],
+                    'hero_id': [row[1] for row in rows],
+                    'taken_at': [row[2] for row in rows],
+                    'matches': [row[3] for row in rows],
+                    'wins': [row[4] for row in rows],
+                }
+        except Exception as e:
+            self.logger.error(f"Error loading stat snapshots: {str(e)}")
+            return empty
+
+    def load_hero_names(self):
+        """Return a mapping of hero id to hero name."""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                cursor.execute('SELECT hero_id, MAX(hero_name) FROM player_heroes GROUP BY hero_id')
+                return dict(cursor.fetchall())
+        except Exception as e:
+            self.logger.error(f"Error loading hero names: {str(e)}")
+            return {}
+
+    def load_match_results(self):
+        """Load the teams of every match with a known result."""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT friendly_team, enemy_team, result
+                    FROM matches
+                    WHERE result IS NOT NULL
+                ''')
+                return [
+                    (json.loads(row[0]), json.loads(row[1]), row[2])
+                    for row in cursor.fetchall()
+                ]
+        except Exception as e:
+            self.logger.error(f"Error loading match results: {str(e)}")
+            return []
+
+    def get_known_players(self):
+        """Return (confirmed, seen) player names.
+
+        Confirmed names had a successful lookup; seen names only appeared in a
+        captured lobby and may be OCR misreads.
+        """
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                cursor.execute('SELECT DISTINCT player FROM player_heroes')
+                confirmed = [row[0] for row in cursor.fetchall()]
+
+                cursor.execute('SELECT friendly_team, enemy_team FROM matches')
+                seen = set()
+                for friendly_json, enemy_json in cursor.fetchall():
+                    seen.update(json.loads(friendly_json))
+                    seen.update(json.loads(enemy_json))
+
+                return confirmed, sorted(seen)
+        except Exception as e:
+            self.logger.error(f"Error loading known players: {str(e)}")
+            return [], []
+
+    def rank_encounters(self, teams=('friendly', 'enemy'), lookback_days=14, half_life_days=3,
+                        confirmed_only=True, limit=50):
+        """Rank players by how often and how recently they appeared in captures.
+
+        Each appearance counts 0.5 ** (age in days / half_life_days), so a
+        regular from yesterday outranks someone met many times a month ago.
+        Returns (player, score) tuples, highest score first.
+        """
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT julianday('now') - julianday(timestamp), friendly_team, enemy_team
+                    FROM matches
+                    WHERE timestamp >= datetime('now', ?)
+                ''', (f'-{lookback_days} days',))
+                rows = cursor.fetchall()
+
+                confirmed = None
+                if confirmed_only:
+                    cursor.execute('SELECT DISTINCT player FROM player_heroes')
+                    confirmed = {row[0] for row in cursor.fetchall()}
+
+            scores = {}
+            for age_days, friendly_json, enemy_json in rows:
+                weight = 0.5 ** (max(0.0, age_days) / half_life_days)
+                players = []
+                if 'friendly' in teams:
+                    players.extend(json.loads(friendly_json))
+                if 'enemy' in teams:
+                    players.extend(json.loads(enemy_json))
+                for player in players:
+                    if confirmed is None or player in confirmed:
+                        scores[player] = scores.get(player, 0.0) + weight
+
+            ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+            return ranked[:limit]
+        except Exception as e:
+            self.logger.error(f"Error ranking encounters: {str(e)}")
+            return []
+
     def get_recent_matches(self, limit=10):
         """Retrieve recent matches from the database."""
         try:
@@ -136,11 +385,14 @@ class Database:
             with sqlite3.connect(self.db_path) as conn:
                 cursor = conn.cursor()
                 
+                # SQLite only binds whole values, so the modifier is passed as one
+                cutoff = f'-{days} days'
+
                 # Get old records
                 cursor.execute('''
                     SELECT image_path FROM matches
-                    WHERE datetime(timestamp) < datetime('now', '-? days')
-                ''', (days,))
+                    WHERE datetime(timestamp) < datetime('now', ?)
+                ''', (cutoff,))
                 
                 # Delete associated image files
                 for (image_path,) in cursor.fetchall():
@@ -150,10 +402,22 @@ class Database:
                 # Delete old records
                 cursor.execute('''
                     DELETE FROM matches
-                    WHERE datetime(timestamp) < datetime('now', '-? days')
-                ''', (days,))
+                    WHERE datetime(timestamp) < datetime('now', ?)
+                ''', (cutoff,))
+                
+                # Keep each hero's newest snapshot as the baseline for later lookups
+                cursor.execute('''
+                    DELETE FROM hero_snapshots
+                    WHERE taken_at < CAST(strftime('%s', 'now', ?) AS REAL)
+                    AND taken_at < (
+                        SELECT MAX(latest.taken_at) FROM hero_snapshots AS latest
+                        WHERE latest.player = hero_snapshots.player
+                        AND latest.hero_id = hero_snapshots.hero_id
+                    )
+                ''', (cutoff,))
                 
                 conn.commit()
+                self.cleanup_version += 1
                 self.logger.info(f"Cleaned up records older than {days} days")
         except Exception as e:
             self.logger.error(f"Error cleaning up old records: {str(e)}")
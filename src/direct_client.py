@@ -0,0 +1,111 @@
+import logging
+import threading
+import time
+import httpx
+
+class DirectClient:
+    """Pooled HTTP client that reuses the Cloudflare clearance solved by FlareSolverr."""
+
+    def __init__(self, config, headers):
+        self.logger = logging.getLogger(__name__)
+
+        direct_config = config.get('flaresolverr', {}).get('direct', {})
+        self.enabled = direct_config.get('enabled', True)
+        self.timeout = direct_config.get('timeout', 10)
+        # Used when FlareSolverr doesn't report an expiry for cf_clearance
+        self.clearance_ttl = direct_config.get('clearance_ttl', 1800)
+        # Renew a little early so requests don't race the expiry
+        self.expiry_margin = direct_config.get('expiry_margin', 60)
+        # How long a clearance Cloudflare rejected stays unused if no new one arrives
+        self.rejected_cooldown = direct_config.get('rejected_cooldown', 300)
+
+        self.base_headers = headers
+        self.request_headers = None
+        self.expires_at = 0
+        self.clearance = None
+        self.rejected_clearance = None
+        self.rejected_until = 0
+        self._lock = threading.Lock()
+
+        self.client = httpx.Client(
+            timeout=self.timeout,
+            limits=httpx.Limits(
+                max_connections=direct_config.get('max_connections', 10),
+                max_keepalive_connections=direct_config.get('max_connections', 10)
+            )
+        )
+
+    def has_clearance(self):
+        """Check if harvested cookies are available and not about to expire."""
+        return (
+            self.enabled
+            and self.request_headers is not None
+            and time.time() < self.expires_at - self.expiry_margin
+        )
+
+    def harvest(self, solution):
+        """Store the cookies and user agent from a FlareSolverr solution.
+
+        Solutions without a cf_clearance cookie are ignored. So is a clearance
+        Cloudflare already rejected, until its cooldown runs out.
+        """
+        if not self.enabled:
+            return
+
+        cookies = [
+            cookie for cookie in solution.get('cookies', [])
+            if cookie.get('domain', '').lstrip('.').endswith('tracker.gg')
+        ]
+        clearance = next((c for c in cookies if c.get('name') == 'cf_clearance'), None)
+        if clearance is None:
+            return
+        if clearance.get('value') == self.rejected_clearance and time.time() < self.rejected_until:
+            return
+
+        expires_at = time.time() + self.clearance_ttl
+        expiry = clearance.get('expires', clearance.get('expiry', -1))
+        if expiry and expiry > 0:
+            expires_at = expiry
+        user_agent = solution.get('userAgent')
+
+        headers = dict(self.base_headers)
+        if user_agent:
+            # cf_clearance is bound to the browser that solved the challenge
+            headers['User-Agent'] = user_agent
+            if 'Chrome' not in user_agent:
+                for key in [k for k in headers if k.startswith('sec-ch-ua')]:
+                    del headers[key]
+        headers['Cookie'] = '; '.join(f"{c['name']}={c['value']}" for c in cookies)
+
+        with self._lock:
+            self.request_headers = headers
+            self.expires_at = expires_at
+            self.clearance = clearance.get('value')
+        self.logger.debug("Harvested %d cookies, clearance valid for %.0fs", len(cookies), expires_at - time.time())
+
+    def invalidate(self):
+        """Drop the harvested clearance so the next request goes through FlareSolverr.
+
+        The same cf_clearance value is not harvested again until the cooldown ends.
+        """
+        with self._lock:
+            if self.clearance is not None:
+                self.rejected_clearance = self.clearance
+                self.rejected_until = time.time() + self.rejected_cooldown
+            self.request_headers = None
+            self.expires_at = 0
+            self.clearance = None
+        self.logger.info("Direct clearance invalidated, falling back to FlareSolverr")
+
+    def get(self, url):
+        """Send a GET request with the harvested clearance. Returns (status_code, text)."""
+        with self._lock:
+            headers = self.request_headers
+        if headers is None:
+            raise httpx.RequestError("No clearance available")
+        response = self.client.get(url, headers=headers)
+        return response.status_code, response.text
+
+    def close(self):
+        """Close pooled connections."""
+        self.client.close()
@@ -0,0 +1,273 @@
+import logging
+import threading
+import time
+import requests
+from circuit_breaker import UpstreamUnavailableError
+
+# Bound on remembered key-to-endpoint pins
+MAX_AFFINITY_KEYS = 1000
+
+class FlareSolverrUnavailableError(UpstreamUnavailableError):
+    """Raised when no FlareSolverr instance is in rotation."""
+
+    def __init__(self, retry_in):
+        super().__init__(f"no FlareSolverr instance is reachable, retrying in {retry_in:.0f}s")
+        self.retry_in = retry_in
+
+class FlareSolverrEndpoint:
+    """A FlareSolverr instance with its browser sessions and concurrency limit."""
+
+    def __init__(self, url, max_concurrency):
+        self.url = url
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+
+        # Browser sessions not used by a request right now, and when each was last validated
+        self.idle_sessions = []
+        self.session_checks = {}
+
+        # Health tracking
+        self.consecutive_failures = 0
+        self.ejected_until = 0
+        self.probing = False
+
+    @property
+    def load(self):
+        return self.in_flight / self.max_concurrency
+
+    def is_available(self, now):
+        """Check if the endpoint can take another request right now."""
+        if self.in_flight >= self.max_concurrency:
+            return False
+        if self.ejected_until > now:
+            return False
+        # After the ejection period, allow a single probe request through
+        if self.ejected_until and self.probing:
+            return False
+        return True
+
+class FlareSolverrPool:
+    """Routes requests across FlareSolverr instances.
+
+    Requests go to the least-loaded healthy endpoint, preferring the one a key
+    was last sent to so related requests reuse the same browser's clearance.
+    A FlareSolverr session drives a single browser tab, so every in-flight
+    request checks out a session of its own and returns it afterwards.
+    Endpoints that keep failing are ejected for a while and re-admitted after a
+    successful probe request.
+    """
+
+    def __init__(self, config):
+        self.logger = logging.getLogger(__name__)
+
+        flaresolverr_config = config.get('flaresolverr', {})
+        default_concurrency = flaresolverr_config.get('endpoint_concurrency', 2)
+        endpoints = flaresolverr_config.get('endpoints')
+        if not endpoints:
+            urls = flaresolverr_config.get('url', "http://localhost:8191/v1")
+            endpoints = [{'url': url} for url in ([urls] if isinstance(urls, str) else urls)]
+
+        self.endpoints = [
+            FlareSolverrEndpoint(endpoint['url'], endpoint.get('max_concurrency', default_concurrency))
+            for endpoint in endpoints
+        ]
+        self.eject_after = flaresolverr_config.get('eject_after_failures', 3)
+        self.eject_seconds = flaresolverr_config.get('eject_seconds', 30)
+        self.session_check_interval = 60  # Check session validity every 60 seconds
+        self.request_timeout = flaresolverr_config.get('session_timeout', 30)
+        self.connect_timeout = flaresolverr_config.get('connect_timeout', 5)
+
+        self.affinity = {}
+        self._condition = threading.Condition()
+
+    @property
+    def capacity(self):
+        return sum(endpoint.max_concurrency for endpoint in self.endpoints)
+
+    def pick(self, affinity_key, now, avoid=None):
+        """Choose an endpoint for a request. Caller must hold the lock."""
+        available = [endpoint for endpoint in self.endpoints if endpoint.is_available(now)]
+        if not available:
+            return None
+        if avoid in available and len(available) > 1:
+            available.remove(avoid)
+
+        preferred = self.affinity.get(affinity_key)
+        if preferred in available:
+            return preferred
+        return min(available, key=lambda endpoint: endpoint.load)
+
+    def acquire(self, affinity_key=None, timeout=None, avoid=None):
+        """Reserve a slot on an endpoint, waiting until one is free.
+
+        A retry passes the endpoint that just failed it as avoid, which is only
+        used if no other endpoint is available. Returns None if no endpoint
+        becomes available within the timeout.
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self._condition:
+            while True:
+                now = time.time()
+                endpoint = self.pick(affinity_key, now, avoid)
+                if endpoint:
+                    break
+
+                # Wake up when the earliest ejection ends, or when a slot frees
+                wait = None
+                ejected = [e.ejected_until - now for e in self.endpoints if e.ejected_until > now]
+                if ejected:
+                    wait = min(ejected)
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return None
+                    wait = min(wait, remaining) if wait is not None else remaining
+                self._condition.wait(wait)
+
+            endpoint.in_flight += 1
+            if endpoint.ejected_until:
+                endpoint.probing = True
+                self.logger.info(f"Probing ejected FlareSolverr endpoint {endpoint.url}")
+            if affinity_key is not None:
+                if len(self.affinity) >= MAX_AFFINITY_KEYS:
+                    self.affinity.clear()
+                self.affinity[affinity_key] = endpoint
+            return endpoint
+
+    def release(self, endpoint, success, session_id=None):
+        """Release a slot and its session, and update the endpoint's health."""
+        dropped = []
+        with self._condition:
+            endpoint.in_flight -= 1
+            if session_id:
+                endpoint.idle_sessions.append(session_id)
+            if success:
+                if endpoint.ejected_until:
+                    self.logger.info(f"Re-admitting FlareSolverr endpoint {endpoint.url}")
+                endpoint.consecutive_failures = 0
+                endpoint.ejected_until = 0
+                endpoint.probing = False
+            else:
+                endpoint.consecutive_failures += 1
+                # Let retries of keys pinned here try another endpoint
+                self.unpin(endpoint)
+                if endpoint.probing or endpoint.consecutive_failures >= self.eject_after:
+                    dropped = self.eject(endpoint)
+            self._condition.notify_all()
+        if dropped:
+            # The endpoint is failing, so don't hold up the caller on it
+            threading.Thread(target=self.destroy_sessions, args=(endpoint, dropped), daemon=True).start()
+
+    def eject(self, endpoint):
+        """Take an endpoint out of rotation. Caller must hold the lock.
+
+        Returns the idle sessions it dropped, for destroy_sessions().
+        """
+        dropped = endpoint.idle_sessions
+        endpoint.ejected_until = time.time() + self.eject_seconds
+        endpoint.probing = False
+        endpoint.idle_sessions = []
+        endpoint.session_checks = {}
+        self.logger.warning(
+            f"Ejecting FlareSolverr endpoint {endpoint.url} for {self.eject_seconds}s "
+            f"after {endpoint.consecutive_failures} failures"
+        )
+        return dropped
+
+    def destroy_sessions(self, endpoint, session_ids):
+        """Ask an endpoint to close browser sessions we no longer use, if it still answers."""
+        for session_id in session_ids:
+            try:
+                requests.post(endpoint.url, json={"cmd": "sessions.destroy", "session": session_id},
+                              timeout=(self.connect_timeout, self.request_timeout))
+            except Exception as e:
+                self.logger.debug("Could not destroy session %s on %s: %s", session_id, endpoint.url, e)
+                return
+
+    def unpin(self, endpoint):
+        """Free the keys pinned to an endpoint to move elsewhere. Caller must hold the lock."""
+        self.affinity = {key: e for key, e in self.affinity.items() if e is not endpoint}
+
+    def has_available(self):
+        """Check if any endpoint is in rotation or due for a probe."""
+        now = time.time()
+        with self._condition:
+            return any(endpoint.ejected_until <= now for endpoint in self.endpoints)
+
+    def all_failing(self):
+        """Check if every endpoint failed its last request or is out of rotation."""
+        now = time.time()
+        with self._condition:
+            return all(endpoint.consecutive_failures or endpoint.ejected_until > now for endpoint in self.endpoints)
+
+    def next_available_in(self):
+        """Seconds until the first ejected endpoint is due for a probe."""
+        now = time.time()
+        with self._condition:
+            return max(0.0, min(endpoint.ejected_until for endpoint in self.endpoints) - now)
+
+    def checkout_session(self, endpoint):
+        """Take a browser session on the endpoint for one request, creating one if needed.
+
+        Returns the session id to hand back to release(), or None on failure.
+        """
+        with self._condition:
+            session_id = endpoint.idle_sessions.pop() if endpoint.idle_sessions else None
+            checked_at = endpoint.session_checks.get(session_id, 0)
+        current_time = time.time()
+
+        try:
+            # Check the session still exists every now and then
+            if session_id and current_time - checked_at >= self.session_check_interval:
+                sessions_response = requests.post(
+                    endpoint.url, json={"cmd": "sessions.list"}, timeout=(self.connect_timeout, self.request_timeout)
+                )
+                sessions_data = sessions_response.json()
+                if session_id in [s.get('id') for s in sessions_data.get("sessions", [])]:
+                    self.logger.debug("Existing session %s is valid", session_id)
+                    with self._condition:
+                        endpoint.session_checks[session_id] = current_time
+                else:
+                    self.logger.info(f"Session {session_id} no longer valid")
+                    with self._condition:
+                        endpoint.session_checks.pop(session_id, None)
+                    session_id = None
+
+            if session_id:
+                return session_id
+
+            # Create new session if needed
+            self.logger.info(f"Creating new FlareSolverr session on {endpoint.url}")
+            create_response = requests.post(endpoint.url, json={
+                "cmd": "sessions.create",
+                "options": {
+                    "browser": "firefox"  # More reliable than chrome for Cloudflare
+                }
+            }, timeout=(self.connect_timeout, self.request_timeout))
+            create_data = create_response.json()
+
+            if create_data.get("status") != "ok":
+                self.logger.error(f"Failed to create FlareSolverr session: {create_data.get('message')}")
+                return None
+
+            session_id = create_data.get('session')
+            with self._condition:
+                endpoint.session_checks[session_id] = current_time
+            self.logger.info(f"Created new session: {session_id}")
+            return session_id
+
+        except Exception as e:
+            self.logger.error(f"Error managing FlareSolverr session on {endpoint.url}: {str(e)}")
+            return None
+
+    def metrics(self):
+        with self._condition:
+            now = time.time()
+            return {
+                endpoint.url: {
+                    'in_flight': endpoint.in_flight,
+                    'max_concurrency': endpoint.max_concurrency,
+                    'healthy': endpoint.ejected_until <= now and not endpoint.probing,
+                }
+                for endpoint in self.endpoints
+            }
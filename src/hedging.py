@@ -0,0 +1,150 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+
+class LatencyTracker:
+    """Sliding window of observed request latencies."""
+
+    def __init__(self, window=200):
+        self.samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.samples)
+
+    def record(self, seconds):
+        with self._lock:
+            self.samples.append(seconds)
+
+    def percentile(self, pct):
+        """Return the given percentile of recent latencies, or None with no samples."""
+        with self._lock:
+            ordered = sorted(self.samples)
+        if not ordered:
+            return None
+        index = min(len(ordered) - 1, int(len(ordered) * pct / 100))
+        return ordered[index]
+
+class HedgePolicy:
+    """Decides when to send a hedged request and caps how often it happens."""
+
+    def __init__(self, hedging_config):
+        self.logger = logging.getLogger(__name__)
+        self.enabled = hedging_config.get('enabled', False)
+        self.percentile = hedging_config.get('percentile', 90)
+        self.initial_delay = hedging_config.get('initial_delay', 5.0)
+        self.min_delay = hedging_config.get('min_delay', 0.5)
+        self.min_samples = hedging_config.get('min_samples', 10)
+        self.max_hedge_rate = hedging_config.get('max_hedge_rate', 0.2)
+
+        self.latencies = LatencyTracker(hedging_config.get('window', 200))
+        # One [hedged] slot per recent request, so each caller marks its own
+        self.recent = deque(maxlen=hedging_config.get('window', 200))
+        self._lock = threading.Lock()
+
+    def hedge_delay(self):
+        """Seconds to wait for the first response before hedging."""
+        if len(self.latencies) < self.min_samples:
+            return self.initial_delay
+        return max(self.min_delay, self.latencies.percentile(self.percentile))
+
+    def try_hedge(self, slot):
+        """Reserve a hedge for the request holding slot if the recent hedge rate is under the cap."""
+        with self._lock:
+            hedges = sum(hedged for hedged, in self.recent)
+            if self.recent and hedges / len(self.recent) >= self.max_hedge_rate:
+                return False
+            slot[0] = True
+            return True
+
+    def start_request(self):
+        """Count a request towards the hedge rate and return its slot for try_hedge()."""
+        slot = [False]
+        with self._lock:
+            self.recent.append(slot)
+        return slot
+
+    def stats(self):
+        with self._lock:
+            hedges = sum(hedged for hedged, in self.recent)
+            requests = len(self.recent)
+        return {
+            'hedge_delay': round(self.hedge_delay(), 3),
+            'hedge_rate': round(hedges / requests, 3) if requests else 0.0,
+        }
+
+class BackgroundLoop:
+    """An asyncio event loop on a daemon thread, kept for the life of the process.
+
+    Hedged requests run here so their async client keeps its connections
+    between captures instead of paying for a new loop and TLS handshake.
+    """
+
+    def __init__(self):
+        self.loop = None
+        self.thread = None
+        self._lock = threading.Lock()
+
+    def run(self, coroutine):
+        """Run a coroutine on the loop and block until it finishes."""
+        with self._lock:
+            if self.loop is None:
+                self.loop = asyncio.new_event_loop()
+                self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+                self.thread.start()
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    def close(self):
+        with self._lock:
+            if self.loop is None:
+                return
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join()
+            self.loop.close()
+            self.loop = None
+
+async def run_hedged(make_request, policy):
+    """Await make_request(), hedging with a second identical call if it is slow.
+
+    Whichever call succeeds first wins. A losing hedge is cancelled, but a
+    losing primary is left to finish so its real latency can be recorded:
+    cutting it short would only ever record the hedge delay and drag the
+    percentile down. Needs a loop that outlives the call, like BackgroundLoop.
+    """
+    slot = policy.start_request()
+    started = time.monotonic()
+    primary = asyncio.ensure_future(make_request())
+
+    def record_latency(task):
+        if not task.cancelled() and task.exception() is None:
+            policy.latencies.record(time.monotonic() - started)
+
+    primary.add_done_callback(record_latency)
+    tasks = {primary}
+
+    done, _ = await asyncio.wait(tasks, timeout=policy.hedge_delay())
+    if not done and policy.try_hedge(slot):
+        policy.logger.info("Vision request slower than %.2fs, sending hedge", policy.hedge_delay())
+        tasks.add(asyncio.ensure_future(make_request()))
+
+    error = None
+    winner = None
+    while tasks and winner is None:
+        done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            if task.exception() is None:
+                winner = task
+                break
+            error = task.exception()
+
+    for task in tasks - {primary}:
+        task.cancel()
+    await asyncio.gather(*(tasks - {primary}), return_exceptions=True)
+
+    if winner is None:
+        raise error
+    if winner is not primary:
+        policy.logger.info("Hedged vision request won after %.2fs", time.monotonic() - started)
+    return winner.result()
@@ -0,0 +1,140 @@
+import logging
+import sys
+import threading
+from array import array
+from collections import OrderedDict
+
+# Rough cost of one cache slot (OrderedDict entry and its key) on top of the record
+ENTRY_OVERHEAD = 120
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+class HeroTable:
+    """Registry of the (id, name, role) heroes seen so far.
+
+    Records store a small index into this table instead of their own copies
+    of each hero's strings, so every cached player shares one set of them.
+    """
+
+    def __init__(self):
+        self.heroes = []
+        self.index = {}
+        self._lock = threading.Lock()
+
+    def intern(self, hero_id, name, role):
+        key = (_intern(hero_id), _intern(name), _intern(role))
+        with self._lock:
+            position = self.index.get(key)
+            if position is None:
+                position = len(self.heroes)
+                self.heroes.append(key)
+                self.index[key] = position
+            return position
+
+    def get(self, position):
+        return self.heroes[position]
+
+HEROES = HeroTable()
+
+class HeroStats:
+    """Compact lookup result: one player's heroes and their stats.
+
+    Heroes are kept as indices into HEROES and their stats in one flat
+    array of (matches, wins, kda) triples, in the order they were given
+    (sorted by matches played for lookup results).
+    """
+
+    __slots__ = ('player', 'fetched_at', 'heroes', 'stats')
+
+    def __init__(self, player, fetched_at, heroes, stats):
+        self.player = player
+        self.fetched_at = fetched_at
+        self.heroes = heroes
+        self.stats = stats
+
+    @classmethod
+    def from_heroes(cls, player, heroes, fetched_at):
+        """Build a record from a list of hero dicts as returned by lookups."""
+        indices = array('H')
+        stats = array('d')
+        for hero in heroes:
+            indices.append(HEROES.intern(hero['id'], hero['name'], hero['role']))
+            stats.extend((hero['matches'], hero['wins'], hero['kda']))
+        return cls(player, fetched_at, indices, stats)
+
+    @classmethod
+    def from_result(cls, result):
+        return cls.from_heroes(result['player'], result['heroes'], result['fetched_at'])
+
+    def to_result(self):
+        """Return the result dict that lookups have always returned."""
+        heroes = []
+        stats = self.stats
+        for i, position in enumerate(self.heroes):
+            hero_id, name, role = HEROES.get(position)
+            heroes.append({
+                'id': hero_id,
+                'name': name,
+                'role': role,
+                'matches': stats[3 * i],
+                'wins': stats[3 * i + 1],
+                'kda': stats[3 * i + 2],
+            })
+        return {'player': self.player, 'heroes': heroes, 'fetched_at': self.fetched_at}
+
+    def nbytes(self):
+        """Approximate memory held by this record, not counting the shared hero table."""
+        return (
+            sys.getsizeof(self) + sys.getsizeof(self.player)
+            + sys.getsizeof(self.heroes) + sys.getsizeof(self.stats)
+            + sys.getsizeof(self.fetched_at)
+        )
+
+class HeroStatsCache:
+    """LRU cache of HeroStats records bounded by their approximate size in bytes.
+
+    Entries are not dropped when they expire, only when the cache is over
+    `max_bytes`, so an expired result can still be served as stale.
+    """
+
+    def __init__(self, max_bytes):
+        self.logger = logging.getLogger(__name__)
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.sizes = {}
+        self.nbytes = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, player_name):
+        with self._lock:
+            record = self.entries.get(player_name)
+            if record is not None:
+                self.entries.move_to_end(player_name)
+            return record
+
+    def put(self, record):
+        size = record.nbytes() + ENTRY_OVERHEAD
+        with self._lock:
+            self.nbytes += size - self.sizes.get(record.player, 0)
+            self.entries[record.player] = record
+            self.sizes[record.player] = size
+            self.entries.move_to_end(record.player)
+            # Always keep the newest entry, even if it alone is over the limit
+            while self.nbytes > self.max_bytes and len(self.entries) > 1:
+                player, _ = self.entries.popitem(last=False)
+                self.nbytes -= self.sizes.pop(player)
+                self.evictions += 1
+
+    def metrics(self):
+        with self._lock:
+            return {
+                'entries': len(self.entries),
+                'bytes': self.nbytes,
+                'max_bytes': self.max_bytes,
+                'evictions': self.evictions,
+            }
@@ -0,0 +1,135 @@
+import atexit
+import json
+import logging
+import queue
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+# Listeners started by start_async_logging and not yet stopped, and the one
+# the root logger currently feeds
+_running_listeners = set()
+_current_listener = None
+_listener_lock = threading.Lock()
+
+class LazyJSON:
+    """Defers json.dumps until a log record is actually formatted."""
+
+    __slots__ = ('data', 'indent', 'limit')
+
+    def __init__(self, data, indent=None, limit=None):
+        self.data = data
+        self.indent = indent
+        self.limit = limit
+
+    def __str__(self):
+        text = json.dumps(self.data, indent=self.indent, default=str)
+        return text[:self.limit] if self.limit else text
+
+class LazyText:
+    """Defers slicing or building large strings until a log record is formatted."""
+
+    __slots__ = ('func',)
+
+    def __init__(self, func):
+        self.func = func
+
+    def __str__(self):
+        return str(self.func())
+
+class StructuredFormatter(logging.Formatter):
+    """Formatter that appends a record's structured `fields` extra as JSON."""
+
+    def format(self, record):
+        message = super().format(record)
+        fields = getattr(record, 'fields', None)
+        if fields:
+            message += ' ' + json.dumps(fields, default=str)
+        return message
+
+class DeferredQueueHandler(QueueHandler):
+    """Queue handler that leaves formatting to the listener thread.
+
+    The stock QueueHandler formats the message before enqueueing it, which
+    would evaluate lazy arguments on the calling (hot) thread.
+    """
+
+    def prepare(self, record):
+        return record
+
+class RateLimitFilter(logging.Filter):
+    """Drops noisy records beyond a per-message budget in each period.
+
+    Records at or above min_level always pass; below it, each distinct message
+    template is allowed `rate` times per `period` seconds. Windows that have
+    run out are dropped once per period so one-off messages don't pile up.
+    """
+
+    def __init__(self, rate=20, period=1.0, min_level=logging.INFO):
+        super().__init__()
+        self.rate = rate
+        self.period = period
+        self.min_level = min_level
+        self.windows = {}
+        self.pruned_at = time.monotonic()
+        self.suppressed = 0
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno >= self.min_level:
+            return True
+
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            if now - self.pruned_at >= self.period:
+                self.windows = {
+                    k: window for k, window in self.windows.items()
+                    if now - window[0] < self.period
+                }
+                self.pruned_at = now
+            window_start, count = self.windows.get(key, (now, 0))
+            if now - window_start >= self.period:
+                window_start, count = now, 0
+            if count >= self.rate:
+                self.suppressed += 1
+                self.windows[key] = (window_start, count)
+                return False
+            self.windows[key] = (window_start, count + 1)
+        return True
+
+def start_async_logging(handlers, level, debug_rate=20, debug_period=1.0):
+    """Route root logging through a queue so callers never wait on file I/O.
+
+    Returns the QueueListener, which is also stopped automatically at exit.
+    A listener from an earlier call is stopped once the new one has taken over.
+    """
+    global _current_listener
+    log_queue = queue.SimpleQueue()
+    queue_handler = DeferredQueueHandler(log_queue)
+    queue_handler.addFilter(RateLimitFilter(debug_rate, debug_period))
+
+    root_logger = logging.getLogger()
+    root_logger.setLevel(level)
+    for handler in root_logger.handlers:
+        handler.close()
+    root_logger.handlers = [queue_handler]
+
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    with _listener_lock:
+        _running_listeners.add(listener)
+        previous, _current_listener = _current_listener, listener
+    atexit.register(stop_async_logging, listener)
+    if previous is not None:
+        # Drains what was queued before the switch
+        stop_async_logging(previous)
+    return listener
+
+def stop_async_logging(listener):
+    """Flush queued records and stop the listener thread. Safe to call twice."""
+    with _listener_lock:
+        if listener not in _running_listeners:
+            return
+        _running_listeners.discard(listener)
+    listener.stop()
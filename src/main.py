@@ -1,27 +1,35 @@
+import argparse
 import json
 from hotkey import GlobalHotkey
 import logging
 import os
 import sys
+import threading
 import win32con
 import time
 from datetime import datetime
 from capture import ScreenCapture
 from ocr import OCRProcessor
 from database import Database
-from tracker_lookup import TrackerLookup
+from analytics import MatchupAnalytics
+from tracker_lookup import TrackerLookup, CONFIRMED_NAME_WEIGHT
+from log_utils import StructuredFormatter, start_async_logging
+from service import LookupService
+from profiling import CaptureProfiler, profiled
 
 class MarvelTracker:
-    def __init__(self):
+    def __init__(self, args=None):
         # Set up basic logging first
         self.setup_basic_logging()
         
         # Load config and reconfigure logging
         self.load_config()
+        self.apply_args(args)
         self.setup_logging()
         
         # Initialize rest of the application
         self.initialize_components()
+        self.start_warmup()
         self.setup_hotkey()
         self.logger.info("Marvel Tracker initialized successfully")
 
@@ -51,16 +59,20 @@ class MarvelTracker:
         log_level = getattr(logging, log_config.get('level', 'INFO'))
         log_format = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
         log_file = os.path.join(log_dir, log_config.get('file', 'app.log'))
+        self.log_dir = os.path.dirname(log_file)
         
         # Create file handler with config
         file_handler = logging.FileHandler(log_file, encoding='utf-8')
-        file_handler.setFormatter(logging.Formatter(log_format))
+        file_handler.setFormatter(StructuredFormatter(log_format))
         
-        # Configure root logger
-        root_logger = logging.getLogger()
-        root_logger.setLevel(log_level)
-        root_logger.handlers = []  # Remove any existing handlers
-        root_logger.addHandler(file_handler)
+        # Configure root logger to hand records to a background writer thread,
+        # rate-limiting repetitive debug messages on the way
+        self.log_listener = start_async_logging(
+            [file_handler],
+            log_level,
+            debug_rate=log_config.get('debug_rate_limit', 20),
+            debug_period=log_config.get('debug_rate_period', 1.0)
+        )
         
         # Set up OCR logger with debug level
         ocr_logger = logging.getLogger('ocr')
@@ -87,6 +99,16 @@ class MarvelTracker:
             self.logger.error(f"Error loading configuration: {str(e)}")
             sys.exit(1)
 
+    def apply_args(self, args):
+        """Apply command line overrides to the loaded configuration."""
+        if args is None:
+            return
+        profiling_config = self.config.setdefault('profiling', {})
+        if args.profile:
+            profiling_config['enabled'] = True
+        if args.profile_every:
+            profiling_config['every'] = args.profile_every
+
     def initialize_components(self):
         """Initialize main components."""
         try:
@@ -98,11 +120,56 @@ class MarvelTracker:
                 tracker_lookup=self.tracker_lookup
             )
             self.database = Database(self.config)
+            self.analytics = MatchupAnalytics(self.database, self.config)
+            # Re-captures of a lobby update its row; the hotkey and service both capture
+            self.last_match_id = None
+            self.capture_lock = threading.Lock()
+            self.profiler = CaptureProfiler(self.config, self.log_dir)
+
+            # Seed username correction with every player we have seen before
+            confirmed, seen = self.database.get_known_players()
+            self.tracker_lookup.name_index.add_many(confirmed, weight=CONFIRMED_NAME_WEIGHT)
+            self.tracker_lookup.name_index.add_many(seen)
+
+            # Optional local API so overlays and scripts share our lookups
+            self.service = None
+            if self.config.get('service', {}).get('enabled', False):
+                self.service = LookupService(
+                    self.config,
+                    self.tracker_lookup,
+                    self.ocr_processor,
+                    database=self.database,
+                    on_capture=self.record_capture
+                )
+                try:
+                    self.service.start()
+                except OSError as e:
+                    # The tracker works without the service, e.g. when the port is taken
+                    self.logger.error(f"Lookup service could not start, continuing without it: {str(e)}")
+                    self.service = None
+
             self.logger.info("Components initialized successfully")
         except Exception as e:
             self.logger.error(f"Error initializing components: {str(e)}")
             sys.exit(1)
 
+    def start_warmup(self):
+        """Prefetch the players we meet most often so early lobbies hit the cache."""
+        warmup_config = self.config.get('warmup', {})
+        if not warmup_config.get('enabled', True):
+            return
+        try:
+            ranked = self.database.rank_encounters(
+                teams=self.tracker_lookup.looked_up_teams(),
+                lookback_days=warmup_config.get('lookback_days', 14),
+                half_life_days=warmup_config.get('half_life_days', 3),
+                confirmed_only=warmup_config.get('confirmed_only', True),
+                limit=warmup_config.get('max_players', 50)
+            )
+            self.tracker_lookup.warm_up([player for player, _ in ranked])
+        except Exception as e:
+            self.logger.error(f"Error starting cache warm-up: {str(e)}")
+
     def setup_hotkey(self):
         """Set up the hotkey listener."""
         try:
@@ -117,19 +184,52 @@ class MarvelTracker:
 
     def handle_hotkey(self, key):
         """Handle hotkey press event."""
-        try:
-            self.logger.info(f"Global hotkey triggered: {key}")
+        # Profiles this capture when due; otherwise a no-op
+        with self.profiler.capture():
+            try:
+                self.logger.info(f"Global hotkey triggered: {key}")
             
-            # Capture the screenshot and get the filepath
-            screenshot_path = self.screen_capture.capture_window()
-            if screenshot_path:
-                # Process the captured screenshot
-                self.ocr_processor.process_uploaded_image(screenshot_path)
+                # Capture the screenshot and get the filepath
+                screenshot_path = self.screen_capture.capture_window()
+                if screenshot_path:
+                    # Process the captured screenshot
+                    captured = self.ocr_processor.process_uploaded_image(screenshot_path)
+                    self.record_capture(screenshot_path, *captured)
+                else:
+                    self.logger.error("Failed to capture screenshot")
+
+            except Exception as e:
+                self.logger.error(f"Error processing capture: {str(e)}")
+
+    @profiled('record_capture')
+    def record_capture(self, screenshot_path, friendly_team, enemy_team, results, won=None, same_lobby=False):
+        """Store a processed capture and show the lobby matchup summary.
+
+        A re-capture of the same lobby updates the earlier match row instead of
+        adding one. Captures of an end-of-match screen also record the outcome
+        read from it.
+        """
+        if not friendly_team and not enemy_team:
+            return
+
+        with self.capture_lock:
+            match_id = self.last_match_id if same_lobby else None
+            if match_id is not None and self.database.update_match_teams(match_id, friendly_team, enemy_team):
+                self.logger.info(f"Updated match {match_id} from a re-capture of the same lobby")
             else:
-                self.logger.error("Failed to capture screenshot")
+                match_id = self.database.store_match(None, friendly_team, enemy_team, None, screenshot_path)
+                self.logger.info(f"Stored capture as match {match_id}")
+            self.last_match_id = match_id
+        if match_id is not None and won is not None:
+            self.database.record_match_result(match_id, won)
+            self.logger.info(f"Recorded match {match_id} as a {'win' if won else 'loss'}")
+        for player, result in results.items():
+            self.database.store_player_stats(player, result['heroes'], result['fetched_at'])
+            self.analytics.update_player(player, result['heroes'])
 
-        except Exception as e:
-            self.logger.error(f"Error processing capture: {str(e)}")
+        summary = self.analytics.summarize_lobby(friendly_team, enemy_team)
+        summary['match_id'] = match_id
+        self.tracker_lookup.renderer.emit_summary(summary)
 
     def cleanup(self):
         """Cleanup resources before exit."""
@@ -138,6 +238,12 @@ class MarvelTracker:
             self.screen_capture.cleanup_old_captures()
             # Cleanup old database records
             self.database.cleanup_old_records()
+            # Stop the local lookup service
+            if self.service:
+                self.service.stop()
+            # Close pooled lookup connections
+            self.tracker_lookup.close()
+            self.ocr_processor.close()
             self.logger.info("Cleanup completed successfully")
         except Exception as e:
             self.logger.error(f"Error during cleanup: {str(e)}")
@@ -158,6 +264,14 @@ class MarvelTracker:
         finally:
             self.cleanup()
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Marvel Rivals lobby tracker")
+    parser.add_argument('--profile', action='store_true',
+                        help="Profile the first capture and write a report to the logs folder")
+    parser.add_argument('--profile-every', type=int, metavar='N',
+                        help="Profile every Nth capture")
+    return parser.parse_args()
+
 if __name__ == "__main__":
-    tracker = MarvelTracker()
+    tracker = MarvelTracker(parse_args())
     tracker.run()
@@ -0,0 +1,142 @@
+import logging
+import threading
+from collections import Counter
+
+# Characters the vision model commonly confuses, folded onto one representative
+CONFUSABLES = str.maketrans({
+    'i': 'l', '1': 'l', '|': 'l', '!': 'l',
+    '0': 'o',
+    '5': 's',
+    '8': 'b',
+})
+
+def normalize_name(name):
+    """Fold case and OCR-confusable characters so misreads share a key."""
+    return name.casefold().translate(CONFUSABLES)
+
+def trigrams(key):
+    """Return the set of padded trigrams of a normalized name."""
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def bounded_levenshtein(a, b, limit):
+    """Edit distance between a and b, or limit + 1 if it exceeds limit."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char_a != char_b)
+            ))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+class NameIndex:
+    """Trigram index of known IGNs used to snap OCR misreads to real players."""
+
+    def __init__(self, config):
+        self.logger = logging.getLogger(__name__)
+
+        resolution_config = config.get('name_resolution', {})
+        self.enabled = resolution_config.get('enabled', True)
+        self.max_distance = resolution_config.get('max_distance', 2)
+        self.min_length = resolution_config.get('min_length', 4)
+        # A read must cover this much of a known name to be taken as a dropped suffix
+        self.min_prefix_ratio = resolution_config.get('min_prefix_ratio', 0.6)
+        self.max_candidates = resolution_config.get('max_candidates', 20)
+
+        self.names = []
+        self.keys = []
+        self.weights = []
+        self.name_ids = {}
+        self.by_key = {}
+        self.postings = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.names)
+
+    def add(self, name, weight=1):
+        """Add a known name, or increase its weight if it is already indexed."""
+        if not name:
+            return
+        with self._lock:
+            name_id = self.name_ids.get(name)
+            if name_id is not None:
+                self.weights[name_id] += weight
+                return
+
+            name_id = len(self.names)
+            key = normalize_name(name)
+            self.names.append(name)
+            self.keys.append(key)
+            self.weights.append(weight)
+            self.name_ids[name] = name_id
+            self.by_key.setdefault(key, []).append(name_id)
+            for gram in trigrams(key):
+                self.postings.setdefault(gram, []).append(name_id)
+
+    def add_many(self, names, weight=1):
+        """Add several known names."""
+        for name in names:
+            self.add(name, weight)
+
+    def resolve(self, name):
+        """Return the known name closest to an OCR'd name, or the name unchanged."""
+        if not self.enabled or not name or len(name) < self.min_length:
+            return name
+
+        with self._lock:
+            # A name seen before may itself be a misread, so names sharing its key
+            # are weighed against it rather than returning it as soon as it is known
+            key = normalize_name(name)
+            exact = self.by_key.get(key)
+            if exact:
+                return self.pick(exact, name)
+
+            # Rank names by shared trigrams, then verify the best few by edit distance.
+            # Very common trigrams say little about identity, so they are skipped
+            # unless the name has nothing rarer to go on.
+            postings = [self.postings.get(gram, ()) for gram in trigrams(key)]
+            common_limit = max(100, len(self.names) // 50)
+            rare = [ids for ids in postings if len(ids) <= common_limit]
+            shared = Counter()
+            for ids in (rare if len(rare) >= 2 else postings):
+                shared.update(ids)
+            if not shared:
+                return name
+
+            # Short names tolerate fewer edits before they could be someone else
+            limit = min(self.max_distance, max(1, len(key) // 4))
+            best_ids, best_distance = [], limit + 1
+            prefix_ids = []
+            for name_id, _ in shared.most_common(self.max_candidates):
+                candidate = self.keys[name_id]
+                distance = bounded_levenshtein(key, candidate, limit)
+                if distance < best_distance:
+                    best_ids, best_distance = [name_id], distance
+                elif distance == best_distance and distance <= limit:
+                    best_ids.append(name_id)
+                if candidate.startswith(key) and len(key) >= len(candidate) * self.min_prefix_ratio:
+                    prefix_ids.append(name_id)
+
+            if best_ids:
+                return self.pick(best_ids, name)
+            # Dropped suffix: only snap when exactly one known name extends the read
+            if len(prefix_ids) == 1:
+                return self.names[prefix_ids[0]]
+            return name
+
+    def pick(self, name_ids, fallback):
+        """Pick the most-seen name among equally close matches, or give up on a tie."""
+        ranked = sorted(name_ids, key=self.weights.__getitem__, reverse=True)
+        if len(ranked) > 1 and self.weights[ranked[0]] == self.weights[ranked[1]]:
+            self.logger.debug("Ambiguous match for %s: %s", fallback, [self.names[i] for i in ranked[:3]])
+            return fallback
+        return self.names[ranked[0]]
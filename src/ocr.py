@@ -1,11 +1,22 @@
 import json
 import logging
 import base64
-from openai import OpenAI
+import io
+import time
+import numpy as np
+from PIL import Image
+from openai import OpenAI, AsyncOpenAI, APIStatusError
 from dotenv import load_dotenv
 import os
 from capture import ScreenCapture
 from tracker_lookup import TrackerLookup
+from hedging import BackgroundLoop, HedgePolicy, run_hedged
+from profiling import profiled
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from scoreboard import Scoreboard, TEAMS
+
+# Match outcomes the vision model may report from an end-of-match screen
+OUTCOMES = {'victory': True, 'defeat': False}
 
 class OCRProcessor:
     def __init__(self, config, screen_capture=None, tracker_lookup=None):
@@ -21,10 +32,28 @@ class OCRProcessor:
         openai_settings = self.config.get('openai_settings', {})
         self.openai_model = openai_settings.get('model', 'gpt-4-turbo')
         self.max_tokens = openai_settings.get('max_tokens', 300)
+        self.timeout = openai_settings.get('timeout', 30)
+        self.max_retries = openai_settings.get('max_retries', 2)
+
+        # Optional hedging of slow vision requests, on one long-lived loop and client
+        self.hedge_policy = HedgePolicy(openai_settings.get('hedging', {}))
+        self.hedge_loop = BackgroundLoop()
+        self.async_client = None
+
+        # Skip vision requests quickly while the API keeps failing
+        self.vision_breaker = CircuitBreaker('vision', config)
+
+        # Row fingerprints of the last scoreboard for incremental re-capture
+        self.scoreboard = Scoreboard(config)
 
         # Initialize the OpenAI client using environment variable
-        self.client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+        self.client = OpenAI(
+            api_key=os.getenv('OPENAI_API_KEY'),
+            timeout=self.timeout,
+            max_retries=self.max_retries
+        )
 
+    @profiled('encode_image')
     def encode_image(self, image_path):
         """
         Encodes an image file to base64 string.
@@ -36,13 +65,69 @@ class OCRProcessor:
             self.logger.error(f"Error encoding image: {e}")
             return None
 
+    @profiled('vision_request')
+    def create_completion(self, **request):
+        """
+        Sends a chat completion request, hedging it with a duplicate if hedging is enabled.
+        Raises CircuitOpenError without sending anything while the vision API keeps failing.
+        """
+        self.vision_breaker.check()
+        try:
+            if not self.hedge_policy.enabled:
+                started = time.monotonic()
+                response = self.client.chat.completions.create(**request)
+                self.hedge_policy.latencies.record(time.monotonic() - started)
+            else:
+                response = self.hedge_loop.run(self.create_hedged_completion(request))
+        except APIStatusError as e:
+            # Client errors mean the API is up; only outages and throttling count
+            if e.status_code >= 500 or e.status_code in (408, 429):
+                self.vision_breaker.record_failure()
+            else:
+                self.vision_breaker.record_success()
+            raise
+        except Exception:
+            self.vision_breaker.record_failure()
+            raise
+        self.vision_breaker.record_success()
+        return response
+
+    async def create_hedged_completion(self, request):
+        """
+        Races the request against a hedge sent once it exceeds the adaptive latency threshold.
+        """
+        # Created on the hedging loop's thread, which is the only one that uses it
+        if self.async_client is None:
+            self.async_client = AsyncOpenAI(
+                api_key=os.getenv('OPENAI_API_KEY'),
+                timeout=self.timeout,
+                max_retries=self.max_retries
+            )
+        response = await run_hedged(
+            lambda: self.async_client.chat.completions.create(**request),
+            self.hedge_policy
+        )
+        self.logger.debug("Vision hedging stats: %s", self.hedge_policy.stats())
+        return response
+
+    def close(self):
+        """Close the hedging client and stop its event loop."""
+        if self.async_client is not None:
+            self.hedge_loop.run(self.async_client.close())
+            self.async_client = None
+        self.hedge_loop.close()
+
     def extract_usernames(self, image_path):
+        """
+        Reads both teams' usernames from a capture, and the match outcome if the screen shows one.
+        Returns (friendly_team, enemy_team, won) where won is None unless a result is shown.
+        """
         try:
             # Encode the image to base64
             base64_image = self.encode_image(image_path)
             if not base64_image:
                 self.logger.error("Image encoding failed.")
-                return [], []
+                return [], [], None
 
             messages = [
                 {
@@ -52,9 +137,12 @@ class OCRProcessor:
                         "Return valid JSON with the structure:\n"
                         "{\n"
                         "  \"friendly_team\": [\"username1\", \"username2\", ...],\n"
-                        "  \"enemy_team\": [\"username3\", \"username4\", ...]\n"
+                        "  \"enemy_team\": [\"username3\", \"username4\", ...],\n"
+                        "  \"result\": \"victory\" or \"defeat\" or null\n"
                         "}\n"
                         "Only include real player usernames from the image. "
+                        "Set result only if the screen shows the match outcome for the friendly team, "
+                        "otherwise null. "
                         "No additional keys or text. Do not include ```json``` code block."
                     )
                 },
@@ -73,7 +161,7 @@ class OCRProcessor:
                 }
             ]
 
-            response = self.client.chat.completions.create(
+            response = self.create_completion(
                 model="gpt-4o-mini",  # Using vision model instead of text model
                 messages=messages,
                 max_tokens=self.max_tokens,
@@ -90,25 +178,171 @@ class OCRProcessor:
 
             friendly = extracted_data.get('friendly_team', [])
             enemy = extracted_data.get('enemy_team', [])
+            won = OUTCOMES.get(str(extracted_data.get('result')).lower())
 
-            return friendly, enemy
+            return friendly, enemy, won
 
+        except CircuitOpenError as e:
+            self.logger.error(f"Skipping username extraction: {str(e)}")
+            return [], [], None
         except Exception as e:
             self.logger.error(f"Error extracting usernames: {e}")
-            return [], []
+            return [], [], None
+
+    def extract_row_names(self, rows_image, count):
+        """
+        Reads one username per row from a composite image of scoreboard rows.
+        Returns the names top to bottom, or None if they don't line up with the rows.
+        """
+        try:
+            buffer = io.BytesIO()
+            Image.fromarray(rows_image).save(buffer, format='PNG')
+            base64_image = base64.b64encode(buffer.getvalue()).decode("utf-8")
+
+            messages = [
+                {
+                    "role": "system",
+                    "content": (
+                        f"You are reading player usernames from {count} game scoreboard rows "
+                        "stacked top to bottom in one image. "
+                        "Return valid JSON with the structure:\n"
+                        "{\n"
+                        "  \"names\": [\"username1\", \"username2\", ...]\n"
+                        "}\n"
+                        f"with exactly {count} entries, one per row, top to bottom. "
+                        "Use an empty string for a row without a username. "
+                        "No additional keys or text. Do not include ```json``` code block."
+                    )
+                },
+                {
+                    "role": "user",
+                    "content": [
+                        {
+                            "type": "text",
+                            "text": "List the username in each row. Return them in the JSON format described above."
+                        },
+                        {
+                            "type": "image_url",
+                            "image_url": {"url": f"data:image/png;base64,{base64_image}"}
+                        }
+                    ]
+                }
+            ]
+
+            response = self.create_completion(
+                model="gpt-4o-mini",
+                messages=messages,
+                max_tokens=self.max_tokens,
+                temperature=0.5
+            )
+            content = response.choices[0].message.content
+            self.logger.info("Raw GPT row output: %s", content)
+
+            names = json.loads(content.strip()).get('names', [])
+            if len(names) != count:
+                self.logger.warning(f"Expected {count} row names, got {len(names)}")
+                return None
+            return [name or '' for name in names]
+
+        except CircuitOpenError as e:
+            self.logger.error(f"Skipping row extraction: {str(e)}")
+            return None
+        except Exception as e:
+            self.logger.error(f"Error extracting row names: {e}")
+            return None
+
+    def diff_scoreboard(self, image_path):
+        """
+        Fingerprints the scoreboard rows of a capture and compares them with the last one.
+        Returns (pixels, fingerprints, changed) where changed is None if the capture must be read in full.
+        """
+        try:
+            with Image.open(image_path) as image:
+                pixels = np.asarray(image.convert('RGB'))
+            fingerprints = self.scoreboard.fingerprint(pixels)
+            return pixels, fingerprints, self.scoreboard.diff(pixels.shape, fingerprints)
+        except Exception as e:
+            self.logger.error(f"Error fingerprinting scoreboard: {e}")
+            return None, None, None
+
+    def extract_changed_rows(self, pixels, changed):
+        """
+        Re-reads only the scoreboard rows that changed, reusing names from the rest.
+        Returns (row_names, reuse) where row_names maps each team to one name per row and
+        reuse holds the previous lookup results of unchanged players, or None on failure.
+        Results older than the lookup cache TTL, or served stale, are looked up again.
+        """
+        row_names = self.scoreboard.previous_names()
+        previous_results = self.scoreboard.previous_results()
+        if row_names is None:
+            return None
+
+        rows = [(team, row) for team in TEAMS for row in changed[team]]
+        if rows:
+            names = self.extract_row_names(self.scoreboard.composite(pixels, rows), len(rows))
+            if names is None:
+                return None
+            for (team, row), name in zip(rows, names):
+                row_names[team][row] = name
+
+        reuse = {}
+        oldest = time.time() - self.tracker_lookup.cache_ttl
+        for team in TEAMS:
+            for row, name in enumerate(row_names[team]):
+                result = previous_results.get(name)
+                if row in changed[team] or not result or result.get('stale'):
+                    continue
+                if result.get('fetched_at', 0) > oldest:
+                    reuse[name] = result
+        self.logger.info(f"Re-read {len(rows)} changed scoreboard rows, reusing {len(reuse)} lookups")
+        return row_names, reuse
+
+    def resolve_usernames(self, usernames):
+        """
+        Snaps OCR'd usernames to known players within the fuzzy-match threshold.
+        """
+        resolved = []
+        for username in usernames:
+            match = self.tracker_lookup.name_index.resolve(username)
+            if match != username:
+                self.logger.info(f"Resolved username {username} -> {match}")
+            resolved.append(match)
+        return resolved
 
     def process_uploaded_image(self, image_path):
         """
         Processes an uploaded image by extracting usernames via GPT and performing tracker lookup.
+        Returns (friendly_team, enemy_team, results, won, same_lobby) where results are keyed by
+        player name and won is the match outcome if the capture shows one, else None.
+        With incremental re-capture, only scoreboard rows that changed since the last capture
+        are read and looked up again, and same_lobby is True.
         """
-        friendly_team, enemy_team = self.extract_usernames(image_path)
+        pixels = fingerprints = changed = None
+        if self.scoreboard.enabled:
+            pixels, fingerprints, changed = self.diff_scoreboard(image_path)
+
+        won = None
+        extracted = self.extract_changed_rows(pixels, changed) if changed is not None else None
+        if extracted:
+            row_names, reuse = extracted
+        else:
+            friendly_team, enemy_team, won = self.extract_usernames(image_path)
+            row_names, reuse = {'friendly': friendly_team, 'enemy': enemy_team}, {}
+
+        row_names = {team: self.resolve_usernames(row_names[team]) for team in TEAMS}
+        friendly_team = [name for name in row_names['friendly'] if name]
+        enemy_team = [name for name in row_names['enemy'] if name]
 
         if not friendly_team and not enemy_team:
             self.logger.error("No usernames were extracted from the uploaded image.")
-            return
+            return [], [], {}, None, False
 
         self.logger.info(f"Extracted usernames - Friendly: {friendly_team}, Enemy: {enemy_team}")
-        self.tracker_lookup.lookup_players(
+        results = self.tracker_lookup.lookup_players(
             friendly_team=friendly_team, 
-            enemy_team=enemy_team
+            enemy_team=enemy_team,
+            reuse=reuse
         )
+        if fingerprints is not None:
+            self.scoreboard.remember(pixels.shape, fingerprints, row_names, results)
+        return friendly_team, enemy_team, results, won, bool(extracted)
@@ -0,0 +1,286 @@
+import cProfile
+import fnmatch
+import functools
+import io
+import logging
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+
+class NullStage:
+    """Context manager that does nothing, shared by every stage when profiling is off."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+NULL_STAGE = NullStage()
+
+# Allocations made by the profiler's own bookkeeping
+SNAPSHOT_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, fnmatch.__file__),
+    tracemalloc.Filter(False, os.path.join(os.path.dirname(re.__file__), '*')),
+    tracemalloc.Filter(False, __file__),
+]
+
+# Before 3.12 cProfile only sees the thread that enabled it. From 3.12 on it
+# sees every thread, and enabling a second profiler raises ValueError.
+PER_THREAD_PROFILERS = sys.version_info < (3, 12)
+
+# The capture currently being profiled, if any
+_active = None
+
+def profiled(name):
+    """Decorator that runs a function as a named profiling stage."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _active is None:
+                return func(*args, **kwargs)
+            with ProfiledStage(_active, name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+class StageStats:
+    """Time, memory and allocation totals for one stage across a capture."""
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.peak_bytes = 0
+        self.allocations = {}
+
+    def add_allocations(self, diffs):
+        for diff in diffs:
+            if diff.size_diff <= 0:
+                continue
+            location = str(diff.traceback[0])
+            size, count = self.allocations.get(location, (0, 0))
+            self.allocations[location] = (size + diff.size_diff, count + diff.count_diff)
+
+class ProfiledStage:
+    """Times a stage and measures its memory high-water mark and allocations.
+
+    On Pythons where the capture's CPU profiler only sees its own thread,
+    stages running on other threads get a profiler of their own, merged into
+    the capture's report at the end. Memory figures are approximate when stages overlap on several threads,
+    since tracemalloc's counters are process-wide.
+    """
+
+    __slots__ = ('profile', 'name', 'profiler', 'start_memory', 'before', 'started')
+
+    def __init__(self, profile, name):
+        self.profile = profile
+        self.name = name
+
+    def __enter__(self):
+        profile = self.profile
+        self.before = profile.take_snapshot()
+        self.start_memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+
+        self.profiler = None
+        if PER_THREAD_PROFILERS and not getattr(profile.local, 'profiler', None):
+            self.profiler = profile.thread_profiler()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.started
+        profile = self.profile
+        peak = tracemalloc.get_traced_memory()[1]
+        if self.profiler:
+            self.profiler.disable()
+            profile.local.profiler = None
+
+        diffs = []
+        after = profile.take_snapshot() if self.before is not None else None
+        if after is not None:
+            diffs = after.compare_to(self.before, 'lineno')
+
+        with profile.lock:
+            stats = profile.stages.setdefault(self.name, StageStats())
+            stats.calls += 1
+            stats.seconds += elapsed
+            stats.peak_bytes = max(stats.peak_bytes, peak - self.start_memory)
+            stats.add_allocations(diffs)
+            profile.peak_bytes = max(profile.peak_bytes, peak)
+        return False
+
+class CaptureProfile:
+    """CPU and allocation profile of a single capture."""
+
+    def __init__(self, number, snapshots=True):
+        self.logger = logging.getLogger(__name__)
+        self.number = number
+        self.snapshots = snapshots
+        self.started_at = datetime.now()
+        self.stages = {}
+        self.profilers = []
+        self.peak_bytes = 0
+        self.seconds = 0.0
+        self.local = threading.local()
+        self.lock = threading.Lock()
+
+    def thread_profiler(self):
+        """Start a CPU profiler for the calling thread.
+
+        Returns None if another profiler is already running.
+        """
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError as e:
+            self.logger.warning(f"Could not start CPU profiler: {str(e)}")
+            return None
+        self.local.profiler = profiler
+        with self.lock:
+            self.profilers.append(profiler)
+        return profiler
+
+    def take_snapshot(self):
+        """Snapshot traced allocations, with the profiler paused so it isn't charged for it."""
+        if not self.snapshots or not tracemalloc.is_tracing():
+            return None
+        profiler = getattr(self.local, 'profiler', None)
+        if profiler:
+            profiler.disable()
+        try:
+            return tracemalloc.take_snapshot().filter_traces(SNAPSHOT_FILTERS)
+        finally:
+            if profiler:
+                profiler.enable()
+
+    def __enter__(self):
+        global _active
+        tracemalloc.start()
+        self.thread_profiler()
+        self.started = time.perf_counter()
+        _active = self
+        return self
+
+    def __exit__(self, *exc_info):
+        global _active
+        _active = None
+        self.seconds = time.perf_counter() - self.started
+        if self.local.profiler:
+            self.local.profiler.disable()
+            self.local.profiler = None
+        self.peak_bytes = max(self.peak_bytes, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        return False
+
+    def merged_stats(self, stream):
+        """Merge the per-thread CPU profiles into one pstats.Stats, or None if there are none."""
+        with self.lock:
+            profilers = list(self.profilers)
+        if not profilers:
+            return None
+        stats = pstats.Stats(profilers[0], stream=stream)
+        for profiler in profilers[1:]:
+            stats.add(profiler)
+        return stats
+
+    def report(self, top_functions, top_allocations):
+        """Render the profile as a text report. Returns (text, merged pstats.Stats)."""
+        stream = io.StringIO()
+        stream.write(f"Capture #{self.number} profiled at {self.started_at.isoformat(timespec='seconds')}\n")
+        stream.write(f"Total {self.seconds:.3f}s, peak traced memory {self.peak_bytes / 2**20:.1f} MiB\n\n")
+
+        stream.write("Stages (memory is the high-water mark above the stage's starting level)\n")
+        stream.write(f"  {'stage':<20} {'calls':>6} {'seconds':>9} {'peak MiB':>9}\n")
+        for name, stats in sorted(self.stages.items(), key=lambda item: -item[1].seconds):
+            stream.write(
+                f"  {name:<20} {stats.calls:>6} {stats.seconds:>9.3f} {stats.peak_bytes / 2**20:>9.2f}\n"
+            )
+
+        if self.snapshots:
+            stream.write("\nAllocation hot spots by stage (net new memory still held at stage exit)\n")
+            for name, stats in self.stages.items():
+                stream.write(f"  {name}:\n")
+                ranked = sorted(stats.allocations.items(), key=lambda item: -item[1][0])
+                for location, (size, count) in ranked[:top_allocations]:
+                    stream.write(f"    {size / 1024:>10.1f} KiB {count:>7} blocks  {location}\n")
+
+        stream.write("\nTop functions by cumulative time\n")
+        stats = self.merged_stats(stream)
+        if stats:
+            stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(top_functions)
+        else:
+            stream.write("  No CPU profile, another profiler was running\n")
+        return stream.getvalue(), stats
+
+class CaptureProfiler:
+    """Decides which captures to profile and writes their reports.
+
+    Profiles the first capture when enabled, or every Nth capture when `every`
+    is set. Reports go to the log directory as profile_<time>.txt alongside a
+    .prof file that pstats and snakeviz can open.
+    """
+
+    def __init__(self, config, log_dir):
+        self.logger = logging.getLogger(__name__)
+
+        profiling_config = config.get('profiling', {})
+        self.enabled = profiling_config.get('enabled', False)
+        self.every = profiling_config.get('every', 0)
+        self.top_functions = profiling_config.get('top_functions', 30)
+        self.top_allocations = profiling_config.get('top_allocations', 10)
+        self.snapshots = profiling_config.get('allocation_snapshots', True)
+        self.log_dir = log_dir
+        self.captures = 0
+
+    def should_profile(self):
+        """Count a capture and decide whether it should be profiled."""
+        self.captures += 1
+        if self.every:
+            return self.captures % self.every == 0
+        return self.enabled and self.captures == 1
+
+    def capture(self):
+        """Context manager for one capture; a no-op unless this capture is due."""
+        if not self.should_profile() or _active is not None:
+            return NULL_STAGE
+        return ProfilerRun(self, CaptureProfile(self.captures, self.snapshots))
+
+    def write_report(self, profile):
+        try:
+            text, stats = profile.report(self.top_functions, self.top_allocations)
+            timestamp = profile.started_at.strftime("%Y%m%d_%H%M%S")
+            base_path = os.path.join(self.log_dir, f"profile_{timestamp}_{profile.number}")
+            with open(base_path + '.txt', 'w', encoding='utf-8') as f:
+                f.write(text)
+            if stats:
+                stats.dump_stats(base_path + '.prof')
+            self.logger.info(f"Wrote capture profile to {base_path}.txt")
+        except Exception as e:
+            self.logger.error(f"Error writing capture profile: {str(e)}")
+
+class ProfilerRun:
+    """Profiles the wrapped block and writes its report on exit."""
+
+    __slots__ = ('profiler', 'profile')
+
+    def __init__(self, profiler, profile):
+        self.profiler = profiler
+        self.profile = profile
+
+    def __enter__(self):
+        self.profile.__enter__()
+        return self.profile
+
+    def __exit__(self, *exc_info):
+        self.profile.__exit__(*exc_info)
+        self.profiler.write_report(self.profile)
+        return False
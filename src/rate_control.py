@@ -0,0 +1,132 @@
+import logging
+import random
+import threading
+import time
+
+# Markers that identify a Cloudflare interstitial instead of the API payload
+CHALLENGE_MARKERS = (
+    'Just a moment...',
+    'cf-browser-verification',
+    'challenge-platform',
+    'cf_chl_opt',
+    'Attention Required! | Cloudflare',
+)
+
+
+def is_challenge_page(text):
+    """Check if a response body is a Cloudflare challenge page."""
+    if not text:
+        return False
+    head = text[:4000]
+    return any(marker in head for marker in CHALLENGE_MARKERS)
+
+
+class AdaptiveThrottle:
+    """AIMD rate and concurrency controller for tracker.gg requests.
+
+    Rate and concurrency grow additively for every clean response and are cut
+    multiplicatively whenever tracker.gg or Cloudflare pushes back.
+    """
+
+    def __init__(self, config):
+        self.logger = logging.getLogger(__name__)
+
+        flaresolverr_config = config.get('flaresolverr', {})
+        throttle_config = flaresolverr_config.get('throttle', {})
+
+        # Existing request delays define the starting pace and the slowest pace
+        min_request_delay = flaresolverr_config.get('min_request_delay', 5000)
+        max_request_delay = flaresolverr_config.get('max_request_delay', 10000)
+        self.min_rate = 1000 / max_request_delay
+        self.max_rate = throttle_config.get('max_rate', 2.0)
+        self.rate = min(self.max_rate, 1000 / min_request_delay)
+        self.rate_increase = throttle_config.get('rate_increase', 0.05)
+        self.decrease_factor = throttle_config.get('decrease_factor', 0.5)
+
+        self.min_concurrency = 1
+        self.max_concurrency = throttle_config.get('max_concurrency', 4)
+        self.concurrency = float(self.min_concurrency)
+        self.concurrency_increase = throttle_config.get('concurrency_increase', 0.25)
+
+        # Retry delays in milliseconds
+        self.base_retry_delay = flaresolverr_config.get('retry_delay', 1000)
+        self.max_retry_delay = throttle_config.get('max_retry_delay', 30000)
+
+        # Optional SharedCacheClient pacing requests across tracker instances
+        self.shared_budget = None
+
+        self.in_flight = 0
+        self.next_slot = 0.0
+        self.successes = 0
+        self.backoffs = {}
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        """Block until a concurrency slot is free and the current rate allows a request."""
+        with self._condition:
+            while self.in_flight >= int(self.concurrency):
+                self._condition.wait()
+            self.in_flight += 1
+            interval = 1 / self.rate
+
+        # With a shared budget, every instance's requests go on one schedule
+        delay = self.shared_budget.reserve_slot(interval) if self.shared_budget else None
+        if delay is None:
+            with self._condition:
+                now = time.monotonic()
+                start = max(now, self.next_slot)
+                self.next_slot = start + interval
+            delay = start - now
+        if delay > 0:
+            time.sleep(delay)
+
+    def release(self):
+        """Release a concurrency slot taken by acquire()."""
+        with self._condition:
+            self.in_flight = max(0, self.in_flight - 1)
+            self._condition.notify_all()
+
+    def record_success(self):
+        """Additively increase rate and concurrency after a clean response."""
+        with self._condition:
+            self.successes += 1
+            self.rate = min(self.max_rate, self.rate + self.rate_increase)
+            self.concurrency = min(
+                self.max_concurrency,
+                self.concurrency + self.concurrency_increase / self.concurrency
+            )
+            self._condition.notify_all()
+
+    def record_backoff(self, reason):
+        """Multiplicatively decrease rate and concurrency after push-back."""
+        with self._condition:
+            self.backoffs[reason] = self.backoffs.get(reason, 0) + 1
+            self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+            self.concurrency = max(self.min_concurrency, self.concurrency * self.decrease_factor)
+            # Push the next slot out so queued requests feel the cut immediately
+            self.next_slot = max(self.next_slot, time.monotonic() + 1 / self.rate)
+        self.logger.warning(
+            "Backing off (%s): rate %.2f req/s, concurrency %d",
+            reason, self.rate, int(self.concurrency)
+        )
+
+    def retry_delay(self, attempt):
+        """Return a full-jitter exponential retry delay in seconds.
+
+        The delay is drawn uniformly from zero up to the exponential backoff cap,
+        so clients retrying after the same failure spread out instead of
+        retrying in lockstep.
+        """
+        cap = min(self.max_retry_delay, self.base_retry_delay * (2 ** attempt))
+        return random.uniform(0, cap) / 1000
+
+    def metrics(self):
+        """Return the controller state for logging and export."""
+        with self._condition:
+            return {
+                'rate': round(self.rate, 3),
+                'concurrency': int(self.concurrency),
+                'in_flight': self.in_flight,
+                'successes': self.successes,
+                'backoffs': dict(self.backoffs),
+            }
@@ -0,0 +1,183 @@
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+# Lookup lifecycle events, in the order a player normally goes through them
+EVENT_QUEUED = 'queued'
+EVENT_CACHED = 'cached'
+EVENT_FETCHED = 'fetched'
+EVENT_FAILED = 'failed'
+# Lobby-level matchup summary, emitted once all lookups for a capture are done
+EVENT_SUMMARY = 'summary'
+
+class ResultRenderer:
+    """Renders per-player lookup events as a live terminal table and an NDJSON stream."""
+
+    def __init__(self, config):
+        self.logger = logging.getLogger(__name__)
+
+        renderer_config = config.get('renderer', {})
+        self.top_heroes = renderer_config.get('top_heroes', 3)
+        self.live = renderer_config.get('live_table', True) and sys.stdout.isatty()
+
+        self.ndjson_file = None
+        ndjson_path = renderer_config.get('ndjson_path')
+        if ndjson_path:
+            ndjson_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), ndjson_path)
+            os.makedirs(os.path.dirname(ndjson_path), exist_ok=True)
+            self.ndjson_file = open(ndjson_path, 'a', encoding='utf-8', buffering=1)
+
+        if self.live and os.name == 'nt':
+            os.system('')  # Enables ANSI escape sequences in the Windows console
+
+        self.lobby_id = 0
+        self.rows = {}
+        self.drawn_lines = 0
+        self.listeners = []
+        self._lock = threading.Lock()
+
+    def add_listener(self, callback):
+        """Register a callback that receives every event dict."""
+        with self._lock:
+            self.listeners.append(callback)
+
+    def remove_listener(self, callback):
+        """Unregister a callback added with add_listener()."""
+        with self._lock:
+            if callback in self.listeners:
+                self.listeners.remove(callback)
+
+    def notify_listeners(self, listeners, record):
+        """Forward a record to listener callbacks, outside the renderer lock."""
+        for callback in listeners:
+            try:
+                callback(record)
+            except Exception as e:
+                self.logger.error(f"Error in event listener: {str(e)}")
+
+    def start_lobby(self):
+        """Start a fresh table for a new capture."""
+        with self._lock:
+            self.lobby_id += 1
+            self.rows = {}
+            self.drawn_lines = 0
+            return self.lobby_id
+
+    def emit(self, event, player, team, lobby=None, **fields):
+        """Record a per-player event, update the table and forward it to all sinks.
+
+        Events for an earlier lobby still reach the NDJSON stream and listeners
+        but no longer touch the terminal table.
+        """
+        record = {
+            'event': event,
+            'lobby': lobby or self.lobby_id,
+            'player': player,
+            'team': team,
+            'timestamp': time.time(),
+        }
+        record.update(fields)
+
+        with self._lock:
+            if self.ndjson_file:
+                self.ndjson_file.write(json.dumps(record) + '\n')
+            if record['lobby'] == self.lobby_id:
+                self.rows[(team, player)] = record
+                if self.live:
+                    self.redraw()
+                elif event != EVENT_QUEUED:
+                    print(self.format_row(record))
+            listeners = list(self.listeners)
+
+        self.notify_listeners(listeners, record)
+
+    def emit_summary(self, summary):
+        """Show a lobby matchup summary below the table and forward it to all sinks."""
+        record = {
+            'event': EVENT_SUMMARY,
+            'lobby': self.lobby_id,
+            'timestamp': time.time(),
+        }
+        record.update(summary)
+
+        lines = []
+        for side in ('friendly', 'enemy'):
+            team = summary[side]
+            if not team['players_known']:
+                continue
+            win_rate = team['avg_main_win_rate']
+            win_rate = f"{win_rate * 100:.1f}%" if win_rate is not None else 'n/a'
+            roles = ', '.join(f"{role} {count}" for role, count in team['role_coverage'].items())
+            lines.append(f"{side.capitalize()}: {win_rate} avg main-hero WR | {roles}")
+        for opponent in summary['recurring_opponents']:
+            lines.append(
+                f"Seen before: {opponent['player']} ({opponent['games']} games, "
+                f"we won {opponent['friendly_win_rate'] * 100:.0f}%)"
+            )
+        for form in summary.get('recent_form', []):
+            line = (
+                f"Recent form: {form['player']} {form['win_rate'] * 100:.0f}% over {form['games']} games "
+                f"({form['delta'] * 100:+.0f} vs lifetime)"
+            )
+            if form['heroes']:
+                line += f", mostly {form['heroes'][0]['hero']}"
+            lines.append(line)
+
+        with self._lock:
+            if self.ndjson_file:
+                self.ndjson_file.write(json.dumps(record) + '\n')
+            if lines:
+                print('\n'.join(lines))
+                # Keep the summary out of the next in-place redraw
+                self.drawn_lines = 0
+            listeners = list(self.listeners)
+
+        self.notify_listeners(listeners, record)
+
+    def format_heroes(self, heroes):
+        """Format the top heroes of a player for a single table cell."""
+        parts = []
+        for hero in heroes[:self.top_heroes]:
+            win_rate = (hero['wins'] / hero['matches'] * 100) if hero['matches'] > 0 else 0
+            parts.append(f"{hero['name']} {win_rate:.0f}% ({hero['matches']:.0f}g, {hero['kda']:.2f} KDA)")
+        return ' | '.join(parts)
+
+    def format_row(self, record):
+        """Format one player row."""
+        status = record['event']
+        if record['event'] in (EVENT_CACHED, EVENT_FETCHED):
+            detail = self.format_heroes(record.get('heroes', []))
+            if record.get('stale'):
+                # Served from an expired cache entry while the upstream is down
+                status = 'stale'
+                detail += time.strftime(" (as of %H:%M)", time.localtime(record['fetched_at']))
+        elif record['event'] == EVENT_FAILED:
+            detail = record.get('error', 'lookup failed')
+        else:
+            detail = '...'
+        return f"{record['team']:<8} {record['player']:<20} {status:<8} {detail}"
+
+    def redraw(self):
+        """Redraw the whole table in place. Caller must hold the lock."""
+        lines = [f"{'TEAM':<8} {'PLAYER':<20} {'STATUS':<8} TOP HEROES"]
+        lines.extend(self.format_row(record) for record in self.rows.values())
+
+        output = ''
+        if self.drawn_lines:
+            # Move to the start of the previous table and clear it
+            output += f"\x1b[{self.drawn_lines}F\x1b[J"
+        else:
+            output += '\n'
+        output += '\n'.join(lines) + '\n'
+        sys.stdout.write(output)
+        sys.stdout.flush()
+        self.drawn_lines = len(lines)
+
+    def close(self):
+        """Close the NDJSON stream."""
+        if self.ndjson_file:
+            self.ndjson_file.close()
+            self.ndjson_file = None
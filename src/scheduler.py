@@ -0,0 +1,217 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import Future
+
+# Team ranks used as the first priority component within a lobby
+TEAM_PRIORITY = {'enemy': 0, 'friendly': 1}
+
+# Generation of background lookups that belong to no lobby. Lobby generations
+# start at 1, so idle lookups sort after every lobby and are never cancelled.
+IDLE_GENERATION = 0
+
+class ScheduledLookup:
+    """A single player lookup queued for a lobby."""
+
+    def __init__(self, player, team, lobby, generation, deadline, priority):
+        self.player = player
+        self.team = team
+        self.lobby = lobby
+        self.generation = generation
+        self.deadline = deadline
+        self.priority = priority
+        self.future = Future()
+
+class LobbyBatch:
+    """The lookups submitted for one capture and their deadline bookkeeping."""
+
+    def __init__(self, lobby, deadline, tasks):
+        self.lobby = lobby
+        self.deadline = deadline
+        self.tasks = tasks
+        self.made_deadline = 0
+        self.missed_deadline = 0
+        self.failed = 0
+        self.cancelled = 0
+
+    def wait(self):
+        """Wait until every lookup finishes or the deadline passes.
+
+        Returns results that are available by then, keyed by player name.
+        Lookups still running keep going in the background.
+        """
+        results = {}
+        for task in self.tasks:
+            remaining = self.deadline - time.monotonic()
+            try:
+                result = task.future.result(timeout=max(0, remaining))
+            except Exception:
+                continue
+            if result:
+                results[task.player] = result
+        return results
+
+class LookupScheduler:
+    """Runs player lookups by priority against a per-capture deadline.
+
+    Within a lobby, enemies go before friendlies, uncached players before cached
+    ones and never-seen names first. A new capture cancels (or pushes behind
+    itself) whatever is still pending from the previous one. Idle lookups run
+    only when no lobby lookup is waiting, on at most `idle_concurrency` workers.
+    """
+
+    def __init__(self, config, run_lookup, workers):
+        self.logger = logging.getLogger(__name__)
+
+        scheduler_config = config.get('scheduler', {})
+        self.deadline_seconds = scheduler_config.get('deadline_seconds', 40)
+        self.cancel_previous = scheduler_config.get('previous_lobby', 'cancel') == 'cancel'
+        self.idle_concurrency = scheduler_config.get('idle_concurrency', 1)
+
+        self.run_lookup = run_lookup
+        self.workers = workers
+        self.generation = 0
+        self.batches = {}
+        self.queue = []
+        self.sequence = itertools.count()
+        self.totals = {'made_deadline': 0, 'missed_deadline': 0, 'failed': 0, 'cancelled': 0, 'idle': 0}
+        self.idle_running = 0
+        self._condition = threading.Condition()
+        self.threads = []
+
+    def start(self):
+        """Start the worker threads."""
+        for i in range(self.workers):
+            thread = threading.Thread(target=self.worker_loop, name=f"lookup-worker-{i}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def submit_lobby(self, lobby, players, deadline_seconds=None):
+        """Queue lookups for a new capture.
+
+        players is a list of (name, team, cached, seen_before) tuples.
+        """
+        if not self.threads:
+            self.start()
+
+        deadline = time.monotonic() + (deadline_seconds or self.deadline_seconds)
+        with self._condition:
+            self.generation += 1
+            if self.cancel_previous:
+                self.cancel_pending(self.generation)
+
+            tasks = []
+            for player, team, cached, seen_before in players:
+                priority = (
+                    -self.generation,
+                    TEAM_PRIORITY.get(team, len(TEAM_PRIORITY)),
+                    cached,
+                    seen_before,
+                    next(self.sequence)
+                )
+                task = ScheduledLookup(player, team, lobby, self.generation, deadline, priority)
+                heapq.heappush(self.queue, (priority, task))
+                tasks.append(task)
+
+            batch = LobbyBatch(lobby, deadline, tasks)
+            self.batches[self.generation] = batch
+            self._condition.notify_all()
+        return batch
+
+    def submit_idle(self, players):
+        """Queue background lookups that run only while no lobby is waiting.
+
+        players is a list of names, looked up in the given order. Returns the
+        scheduled lookups.
+        """
+        if not self.threads:
+            self.start()
+
+        with self._condition:
+            tasks = []
+            for player in players:
+                priority = (IDLE_GENERATION, 0, 0, 0, next(self.sequence))
+                task = ScheduledLookup(player, None, None, IDLE_GENERATION, None, priority)
+                heapq.heappush(self.queue, (priority, task))
+                tasks.append(task)
+            self._condition.notify_all()
+        return tasks
+
+    def cancel_pending(self, current_generation):
+        """Drop queued lookups from older lobbies. Caller must hold the lock."""
+        remaining = []
+        for priority, task in self.queue:
+            if IDLE_GENERATION < task.generation < current_generation:
+                task.future.cancel()
+                self.finish(task, cancelled=True)
+            else:
+                remaining.append((priority, task))
+        heapq.heapify(remaining)
+        self.queue = remaining
+
+    def worker_loop(self):
+        while True:
+            with self._condition:
+                while not self.queue or self.idle_blocked():
+                    self._condition.wait()
+                _, task = heapq.heappop(self.queue)
+                if task.generation == IDLE_GENERATION:
+                    self.idle_running += 1
+
+            if not task.future.set_running_or_notify_cancel():
+                continue
+            failed = True
+            try:
+                result = self.run_lookup(task.player, task.team, task.lobby)
+                failed = not result
+                task.future.set_result(result)
+            except Exception as e:
+                self.logger.error(f"Scheduled lookup for {task.player} failed: {str(e)}")
+                task.future.set_exception(e)
+
+            with self._condition:
+                self.finish(task, failed=failed)
+
+    def idle_blocked(self):
+        """Check if the next lookup is idle work that has to wait for a free slot."""
+        return self.queue[0][1].generation == IDLE_GENERATION and self.idle_running >= self.idle_concurrency
+
+    def finish(self, task, cancelled=False, failed=False):
+        """Record how a lookup ended against its deadline. Caller must hold the lock.
+
+        Lookups that failed or returned no result are counted as failed, not as
+        making or missing the deadline.
+        """
+        if task.generation == IDLE_GENERATION:
+            self.idle_running -= 1
+            self.totals['idle'] += 1
+            self._condition.notify_all()
+            return
+
+        batch = self.batches.get(task.generation)
+        if cancelled:
+            outcome = 'cancelled'
+        elif failed:
+            outcome = 'failed'
+        elif time.monotonic() <= task.deadline:
+            outcome = 'made_deadline'
+        else:
+            outcome = 'missed_deadline'
+        self.totals[outcome] += 1
+        if not batch:
+            return
+
+        setattr(batch, outcome, getattr(batch, outcome) + 1)
+        if batch.made_deadline + batch.missed_deadline + batch.failed + batch.cancelled == len(batch.tasks):
+            self.logger.info(
+                "Lobby %d: %d/%d lookups made the deadline (%d missed, %d failed, %d cancelled)",
+                batch.lobby, batch.made_deadline, len(batch.tasks), batch.missed_deadline,
+                batch.failed, batch.cancelled
+            )
+            del self.batches[task.generation]
+
+    def metrics(self):
+        with self._condition:
+            return dict(self.totals, queued=len(self.queue))
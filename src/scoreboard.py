@@ -0,0 +1,134 @@
+import logging
+import threading
+import numpy as np
+
+TEAMS = ('friendly', 'enemy')
+
+class Scoreboard:
+    """Per-row fingerprints of the last captured scoreboard.
+
+    Each team's rows sit inside a box given in fractions of the image size
+    (x0, y0, x1, y1), split evenly into `rows_per_team` rows. A row is
+    fingerprinted by mean-pooling its grayscale pixels onto a small grid, so
+    rows can be compared between captures without re-reading them.
+    """
+
+    def __init__(self, config):
+        self.logger = logging.getLogger(__name__)
+
+        scoreboard_config = config.get('scoreboard', {})
+        self.enabled = scoreboard_config.get('incremental', False)
+        self.rows_per_team = scoreboard_config.get('rows_per_team', 6)
+        self.boxes = {
+            'friendly': scoreboard_config.get('friendly_box', [0.05, 0.2, 0.48, 0.8]),
+            'enemy': scoreboard_config.get('enemy_box', [0.52, 0.2, 0.95, 0.8]),
+        }
+        self.grid = tuple(scoreboard_config.get('fingerprint_grid', [4, 32]))
+        self.change_threshold = scoreboard_config.get('change_threshold', 6.0)
+        self.max_changed_rows = scoreboard_config.get('max_changed_rows', 6)
+
+        # State of the last capture whose rows could be matched to names
+        self.image_shape = None
+        self.fingerprints = None
+        self.names = None
+        self.results = {}
+        self._lock = threading.Lock()
+
+    def row_bounds(self, image_shape, team):
+        """Return the pixel (x0, x1) and per-row (y0, y1) bounds of a team's rows."""
+        height, width = image_shape[:2]
+        x0, y0, x1, y1 = self.boxes[team]
+        left, right = int(x0 * width), int(x1 * width)
+        edges = np.linspace(y0 * height, y1 * height, self.rows_per_team + 1).astype(int)
+        return (left, right), list(zip(edges[:-1], edges[1:]))
+
+    def fingerprint(self, pixels):
+        """Fingerprint every row of both teams.
+
+        Returns a dict of team -> (rows, features) float32 array.
+        """
+        grid_rows, grid_cols = self.grid
+        fingerprints = {}
+        for team in TEAMS:
+            (left, right), rows = self.row_bounds(pixels.shape, team)
+            top, bottom = rows[0][0], rows[-1][1]
+            # Trim the box so it splits evenly into rows x grid cells, then pool
+            cell_height = (bottom - top) // (self.rows_per_team * grid_rows)
+            cell_width = (right - left) // grid_cols
+            region = pixels[top:top + cell_height * self.rows_per_team * grid_rows,
+                            left:left + cell_width * grid_cols]
+            # Sum the uint8 pixels (and channels) per cell without a float copy of the frame
+            cells = region.reshape(
+                self.rows_per_team * grid_rows, cell_height, grid_cols, cell_width, -1
+            )
+            pooled = cells.sum(axis=(1, 3, 4), dtype=np.uint32) / np.float32(cells[0, :, 0].size)
+            fingerprints[team] = pooled.astype(np.float32).reshape(self.rows_per_team, grid_rows * grid_cols)
+        return fingerprints
+
+    def diff(self, pixels_shape, fingerprints):
+        """Return team -> indices of rows that changed since the last capture.
+
+        Returns None when the capture has to be read in full: nothing to compare
+        against, a different resolution, or more than max_changed_rows changes.
+        """
+        with self._lock:
+            if self.fingerprints is None or self.image_shape != pixels_shape:
+                return None
+            changed = {}
+            for team in TEAMS:
+                distance = np.abs(fingerprints[team] - self.fingerprints[team]).mean(axis=1)
+                changed[team] = np.flatnonzero(distance > self.change_threshold).tolist()
+
+        total = sum(len(rows) for rows in changed.values())
+        if total > self.max_changed_rows:
+            self.logger.debug("%d scoreboard rows changed, reading the whole capture", total)
+            return None
+        return changed
+
+    def composite(self, pixels, rows):
+        """Stack the given (team, row) crops top to bottom into one image array."""
+        crops = []
+        width = None
+        for team, row in rows:
+            (left, right), bounds = self.row_bounds(pixels.shape, team)
+            top, bottom = bounds[row]
+            crop = pixels[top:bottom, left:right]
+            if width is None:
+                width = crop.shape[1]
+            # Teams' boxes may differ in width by a pixel or two
+            crop = crop[:, :width]
+            if crop.shape[1] < width:
+                padding = [(0, 0), (0, width - crop.shape[1])] + [(0, 0)] * (crop.ndim - 2)
+                crop = np.pad(crop, padding)
+            crops.append(crop)
+        return np.concatenate(crops, axis=0)
+
+    def previous_names(self):
+        """Return team -> list of names per row from the last capture, or None if reset."""
+        with self._lock:
+            if self.names is None:
+                return None
+            return {team: list(self.names[team]) for team in TEAMS}
+
+    def previous_results(self):
+        """Return the lookup results of the last capture, keyed by player name."""
+        with self._lock:
+            return dict(self.results)
+
+    def remember(self, pixels_shape, fingerprints, teams, results):
+        """Store a capture's fingerprints, names and lookup results for the next diff.
+
+        Rows can only be reused when every row was matched to a name, so a team
+        with a different number of names than rows resets the state.
+        """
+        with self._lock:
+            if any(len(teams[team]) != self.rows_per_team for team in TEAMS):
+                self.logger.debug("Names don't line up with scoreboard rows, not reusing this capture")
+                self.fingerprints = None
+                self.names = None
+                self.results = {}
+                return
+            self.image_shape = pixels_shape
+            self.fingerprints = fingerprints
+            self.names = {team: list(teams[team]) for team in TEAMS}
+            self.results = dict(results)
@@ -0,0 +1,344 @@
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import os
+import queue
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+WEBSOCKET_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+MAX_UPLOAD_BYTES = 20 * 1024 * 1024
+# Clients only ever send us control frames, which are limited to 125 bytes
+MAX_CLIENT_FRAME_BYTES = 64 * 1024
+UPLOAD_CONTENT_TYPES = ('image/png', 'image/jpeg', 'application/octet-stream')
+LOOPBACK_HOSTS = ('127.0.0.1', 'localhost', '::1')
+# A full lobby; more names per request would let one caller queue many upstream lookups
+MAX_LOOKUP_PLAYERS = 12
+
+OPCODE_TEXT = 0x1
+OPCODE_CLOSE = 0x8
+OPCODE_PING = 0x9
+OPCODE_PONG = 0xA
+
+def host_name(host):
+    """Return the name from a Host header without its port or IPv6 brackets."""
+    if host.startswith('['):
+        return host[1:].split(']', 1)[0]
+    return host.rsplit(':', 1)[0]
+
+def websocket_frame(payload, opcode=OPCODE_TEXT):
+    """Encode an unmasked server-to-client WebSocket frame."""
+    header = bytes([0x80 | opcode])
+    length = len(payload)
+    if length < 126:
+        header += bytes([length])
+    elif length < 65536:
+        header += bytes([126]) + struct.pack('!H', length)
+    else:
+        header += bytes([127]) + struct.pack('!Q', length)
+    return header + payload
+
+def read_websocket_frame(rfile):
+    """Read one masked client-to-server frame. Returns (opcode, payload), or None on EOF.
+
+    Raises ValueError on frames a client must not send.
+    """
+    header = rfile.read(2)
+    if len(header) < 2:
+        return None
+    opcode = header[0] & 0x0F
+    if not header[1] & 0x80:
+        raise ValueError("Client frames must be masked")
+    length = header[1] & 0x7F
+    if length == 126:
+        length = struct.unpack('!H', rfile.read(2))[0]
+    elif length == 127:
+        length = struct.unpack('!Q', rfile.read(8))[0]
+    if length > MAX_CLIENT_FRAME_BYTES:
+        raise ValueError(f"Client frame of {length} bytes is too large")
+    mask = rfile.read(4)
+    payload = rfile.read(length)
+    if len(mask) < 4 or len(payload) < length:
+        return None
+    return opcode, bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+
+class LookupRequestHandler(BaseHTTPRequestHandler):
+    """HTTP/WebSocket handler for the local lookup API."""
+
+    # WebSocket upgrades require HTTP/1.1
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        self.server.service.logger.debug("%s - %s", self.address_string(), format % args)
+
+    def send_json(self, status, data):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def authorize(self, url):
+        """Reject requests that don't come from a local client we trust.
+
+        Web pages the user visits can reach localhost too, so requests must
+        name a loopback Host (against DNS rebinding) and browsers' Origin must
+        be one of `allowed_origins`. With a `token` configured, it must be sent
+        as a Bearer token or a `token` query parameter (for WebSockets).
+        """
+        service = self.server.service
+        host = (self.headers.get('Host') or '').lower()
+        if host_name(host) not in service.allowed_hosts:
+            self.send_json(403, {'error': 'Host not allowed'})
+            return False
+
+        origin = self.headers.get('Origin')
+        if origin is not None and origin not in service.allowed_origins:
+            service.logger.warning(f"Rejected request from origin {origin}")
+            self.send_json(403, {'error': 'Origin not allowed'})
+            return False
+
+        if service.token:
+            supplied = parse_qs(url.query).get('token', [''])[0]
+            authorization = self.headers.get('Authorization', '')
+            if authorization.startswith('Bearer '):
+                supplied = authorization[len('Bearer '):]
+            if not hmac.compare_digest(supplied.encode(), service.token.encode()):
+                self.send_json(401, {'error': 'Missing or invalid token'})
+                return False
+        return True
+
+    def do_GET(self):
+        service = self.server.service
+        url = urlparse(self.path)
+
+        if url.path == '/health':
+            self.send_json(200, {'status': 'ok'})
+            return
+        if not self.authorize(url):
+            return
+
+        if url.path == '/lookup':
+            players = parse_qs(url.query).get('player', [])
+            if not players:
+                self.send_json(400, {'error': "Missing 'player' query parameter"})
+                return
+            if len(players) > MAX_LOOKUP_PLAYERS:
+                self.send_json(400, {'error': f"At most {MAX_LOOKUP_PLAYERS} players per request"})
+                return
+            self.send_json(200, service.lookup(players))
+        elif url.path == '/subscribe':
+            self.handle_subscribe()
+        elif url.path == '/metrics':
+            self.send_json(200, service.tracker_lookup.get_metrics())
+        else:
+            self.send_json(404, {'error': 'Not found'})
+
+    def do_POST(self):
+        service = self.server.service
+        url = urlparse(self.path)
+        if not self.authorize(url):
+            return
+
+        if url.path == '/result':
+            self.handle_result()
+            return
+        if url.path != '/screenshot':
+            self.send_json(404, {'error': 'Not found'})
+            return
+
+        # Image types can't be sent cross-site without a CORS preflight, which we never grant
+        content_type = self.headers.get('Content-Type', '').split(';')[0].strip().lower()
+        if content_type not in UPLOAD_CONTENT_TYPES:
+            self.send_json(415, {'error': 'Expected Content-Type image/png'})
+            return
+
+        length = int(self.headers.get('Content-Length', 0))
+        if length <= 0 or length > MAX_UPLOAD_BYTES:
+            self.send_json(400, {'error': 'Expected an image body up to 20 MB'})
+            return
+
+        friendly_team, enemy_team, results, won = service.process_screenshot(self.rfile.read(length))
+        self.send_json(200, {
+            'friendly_team': friendly_team,
+            'enemy_team': enemy_team,
+            'results': service.serialize_results(results),
+            'won': won,
+        })
+
+    def handle_result(self):
+        """Record a match outcome from a JSON body: {"match_id": 1, "won": true}."""
+        service = self.server.service
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            body = json.loads(self.rfile.read(length))
+            match_id = int(body['match_id'])
+            won = bool(body['won'])
+        except (ValueError, KeyError, TypeError):
+            self.send_json(400, {'error': "Expected JSON with 'match_id' and 'won'"})
+            return
+
+        if not service.record_result(match_id, won):
+            self.send_json(404, {'error': f"Match {match_id} not found"})
+            return
+        self.send_json(200, {'match_id': match_id, 'won': won})
+
+    def handle_subscribe(self):
+        """Upgrade to a WebSocket and push every lookup event to the client."""
+        service = self.server.service
+        key = self.headers.get('Sec-WebSocket-Key')
+        if self.headers.get('Upgrade', '').lower() != 'websocket' or not key:
+            self.send_json(426, {'error': 'WebSocket upgrade required'})
+            return
+
+        accept = base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode()).digest()).decode()
+        self.send_response(101)
+        self.send_header('Upgrade', 'websocket')
+        self.send_header('Connection', 'Upgrade')
+        self.send_header('Sec-WebSocket-Accept', accept)
+        self.end_headers()
+
+        events = queue.Queue(maxsize=1000)
+        write_lock = threading.Lock()
+        closed = threading.Event()
+
+        def send(payload, opcode=OPCODE_TEXT):
+            with write_lock:
+                self.wfile.write(websocket_frame(payload, opcode))
+                self.wfile.flush()
+
+        def on_event(record):
+            try:
+                events.put_nowait(record)
+            except queue.Full:
+                service.logger.warning("Dropping event for slow subscriber")
+
+        def read_frames():
+            """Answer the client's pings and close handshake until it goes away."""
+            try:
+                while not closed.is_set():
+                    frame = read_websocket_frame(self.rfile)
+                    if frame is None:
+                        break
+                    opcode, payload = frame
+                    if opcode == OPCODE_PING:
+                        send(payload, OPCODE_PONG)
+                    elif opcode == OPCODE_CLOSE:
+                        # Echo the status code to complete the close handshake
+                        send(payload[:2], OPCODE_CLOSE)
+                        break
+            except ValueError as e:
+                service.logger.debug(f"Closing subscriber after bad frame: {str(e)}")
+                send(struct.pack('!H', 1002), OPCODE_CLOSE)
+            except OSError:
+                pass
+            finally:
+                closed.set()
+                # Wake the writer so it notices the connection is done
+                events.put(None)
+
+        service.renderer.add_listener(on_event)
+        reader = threading.Thread(target=read_frames, daemon=True)
+        reader.start()
+        try:
+            while not service.stopping.is_set() and not closed.is_set():
+                try:
+                    record = events.get(timeout=service.ping_interval)
+                    if record is not None:
+                        send(json.dumps(record).encode('utf-8'))
+                except queue.Empty:
+                    # Pings surface disconnected clients
+                    send(b'', OPCODE_PING)
+        except OSError:
+            service.logger.debug("Subscriber disconnected")
+        finally:
+            closed.set()
+            service.renderer.remove_listener(on_event)
+            self.close_connection = True
+
+class LookupService:
+    """Local HTTP/WebSocket API backed by the tracker's shared lookup sessions and cache."""
+
+    def __init__(self, config, tracker_lookup, ocr_processor, database=None, on_capture=None):
+        self.logger = logging.getLogger(__name__)
+        self.tracker_lookup = tracker_lookup
+        self.ocr_processor = ocr_processor
+        self.database = database
+        # Called with (image_path, friendly_team, enemy_team, results, won) after an upload is processed
+        self.on_capture = on_capture
+        self.renderer = tracker_lookup.renderer
+
+        service_config = config.get('service', {})
+        self.host = service_config.get('host', '127.0.0.1')
+        self.port = service_config.get('port', 8765)
+        self.ping_interval = service_config.get('ping_interval', 30)
+        self.token = service_config.get('token', '')
+        self.allowed_origins = service_config.get('allowed_origins', [])
+        self.allowed_hosts = set(LOOPBACK_HOSTS) | {self.host.lower().strip('[]')}
+        self.upload_folder = os.path.join(os.path.dirname(os.path.dirname(__file__)), config['temp_folder'])
+
+        self.server = None
+        self.thread = None
+        self.stopping = threading.Event()
+
+    def serialize_results(self, results):
+        """Convert lookup results to a JSON-friendly dict."""
+        return {
+            player: result and {'heroes': result['heroes'], 'fetched_at': result['fetched_at']}
+            for player, result in results.items()
+        }
+
+    def lookup(self, players):
+        """Look up several players, coalescing with any lookups already in flight."""
+        workers = self.tracker_lookup.throttle.max_concurrency
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            fetched = executor.map(self.tracker_lookup.fetch_player, players)
+            return {
+                player: result and dict(result, cached=cached)
+                for player, (result, cached) in zip(players, fetched)
+            }
+
+    def process_screenshot(self, image_bytes):
+        """Save an uploaded screenshot and run it through the capture pipeline."""
+        os.makedirs(self.upload_folder, exist_ok=True)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        filepath = os.path.join(self.upload_folder, f"capture_upload_{timestamp}.png")
+        with open(filepath, 'wb') as f:
+            f.write(image_bytes)
+        self.logger.info(f"Received screenshot upload: {filepath}")
+        friendly_team, enemy_team, results, won, same_lobby = self.ocr_processor.process_uploaded_image(filepath)
+        if self.on_capture:
+            self.on_capture(filepath, friendly_team, enemy_team, results, won, same_lobby)
+        return friendly_team, enemy_team, results, won
+
+    def record_result(self, match_id, won):
+        """Record the outcome of a stored match."""
+        if not self.database:
+            return False
+        return self.database.record_match_result(match_id, won)
+
+    def start(self):
+        """Start serving in a background thread."""
+        self.server = ThreadingHTTPServer((self.host, self.port), LookupRequestHandler)
+        self.server.daemon_threads = True
+        self.server.service = self
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.logger.info(f"Lookup service listening on http://{self.host}:{self.port}")
+
+    def stop(self):
+        """Stop serving and disconnect subscribers."""
+        if not self.server:
+            return
+        self.stopping.set()
+        self.server.shutdown()
+        self.server.server_close()
+        self.server = None
+        self.logger.info("Lookup service stopped")
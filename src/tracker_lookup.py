@@ -1,30 +1,56 @@
 import logging
 import time
 import requests
-import random
 import json
 import re
+import threading
+from concurrent.futures import Future
+import httpx
+from rate_control import AdaptiveThrottle, is_challenge_page
+from direct_client import DirectClient
+from flaresolverr_pool import FlareSolverrPool, FlareSolverrUnavailableError
+from name_index import NameIndex
+from log_utils import LazyJSON, LazyText
+from scheduler import LookupScheduler
+from profiling import profiled
+from circuit_breaker import CircuitBreaker, CircuitOpenError, UpstreamUnavailableError
+from cache_daemon import SharedCacheClient
+from hero_stats import HeroStats, HeroStatsCache
+from renderer import ResultRenderer, EVENT_QUEUED, EVENT_CACHED, EVENT_FETCHED, EVENT_FAILED
+
+# Back-off reasons caused by tracker.gg or Cloudflare rather than FlareSolverr
+TRACKER_PUSHBACK = ('challenge', 'http_403', 'http_429', 'no_json')
+
+# Names confirmed by a successful lookup outrank names only seen in a capture
+CONFIRMED_NAME_WEIGHT = 10
 
 class TrackerLookup:
-    def __init__(self, config):
+    def __init__(self, config, renderer=None):
         self.logger = logging.getLogger(__name__)
         self.config = config
         self.base_url = "https://api.tracker.gg/api/v2/marvel-rivals"
         
         # FlareSolverr settings
         flaresolverr_config = config.get('flaresolverr', {})
-        self.flaresolverr_url = flaresolverr_config.get('url', "http://localhost:8191/v1")
         self.max_timeout = flaresolverr_config.get('max_timeout', 60000)
         self.retry_attempts = flaresolverr_config.get('retry_attempts', 3)
         self.retry_delay = flaresolverr_config.get('retry_delay', 1000)
+        self.connect_timeout = flaresolverr_config.get('connect_timeout', 5)
+        self.throttle = AdaptiveThrottle(config)
         
         self.lookup_friendly = config.get('lookup_friendly_team', False)
         self.lookup_enemy = config.get('lookup_enemy_team', True)
         
-        # Session management
-        self.session_id = None
-        self.last_session_check = 0
-        self.session_check_interval = 60  # Check session validity every 60 seconds
+        # FlareSolverr instances, each with its own browser session
+        self.flaresolverr_pool = FlareSolverrPool(config)
+        # Allow as many parallel requests as the instances can serve together,
+        # starting from one per instance
+        self.throttle.max_concurrency = max(self.throttle.max_concurrency, self.flaresolverr_pool.capacity)
+        self.throttle.concurrency = max(self.throttle.concurrency, float(len(self.flaresolverr_pool.endpoints)))
+
+        # Fail fast while FlareSolverr or tracker.gg keeps failing
+        self.flaresolverr_breaker = CircuitBreaker('flaresolverr', config)
+        self.tracker_breaker = CircuitBreaker('tracker', config)
 
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
@@ -38,65 +64,36 @@ class TrackerLookup:
             'sec-ch-ua-platform': '"Windows"'
         }
 
-    def ensure_session(self):
-        """Ensure a FlareSolverr session exists and is valid."""
-        current_time = time.time()
-        
-        # Check if we need to validate the session
-        if self.session_id and (current_time - self.last_session_check) < self.session_check_interval:
-            return True
-            
-        try:
-            # List current sessions
-            sessions_response = requests.post(self.flaresolverr_url, json={"cmd": "sessions.list"})
-            sessions_data = sessions_response.json()
-            
-            # Check if our session is still valid
-            if self.session_id:
-                if self.session_id in [s.get('id') for s in sessions_data.get("sessions", [])]:
-                    self.logger.debug(f"Existing session {self.session_id} is valid")
-                    self.last_session_check = current_time
-                    return True
-                else:
-                    self.logger.info(f"Session {self.session_id} no longer valid")
-                    self.session_id = None
-            
-            # Create new session if needed
-            self.logger.info("Creating new FlareSolverr session")
-            create_response = requests.post(self.flaresolverr_url, json={
-                "cmd": "sessions.create",
-                "options": {
-                    "browser": "firefox"  # More reliable than chrome for Cloudflare
-                }
-            })
-            create_data = create_response.json()
-            
-            if create_data.get("status") != "ok":
-                self.logger.error(f"Failed to create FlareSolverr session: {create_data.get('message')}")
-                return False
-            
-            self.session_id = create_data.get('session')
-            self.last_session_check = current_time
-            self.logger.info(f"Created new session: {self.session_id}")
-            return True
+        # Compact lookup results by player name, bounded in bytes. Expired entries
+        # are kept until evicted so they can be served as stale results while an
+        # upstream is down.
+        self.cache = HeroStatsCache(config.get('lookup_cache_max_bytes', 8 * 1024 * 1024))
+        self.cache_ttl = config.get('lookup_cache_ttl', 1800)
 
-        except Exception as e:
-            self.logger.error(f"Error managing FlareSolverr session: {str(e)}")
-            return False
+        # Optional cache and request budget shared with other instances on this host
+        self.shared_cache = None
+        if config.get('shared_cache', {}).get('enabled', False):
+            self.shared_cache = SharedCacheClient(config)
+            self.throttle.shared_budget = self.shared_cache
+
+        # Lookups currently in progress, shared by concurrent callers
+        self.inflight = {}
+        self.inflight_lock = threading.Lock()
+
+        self.renderer = renderer or ResultRenderer(config)
+
+        # Known IGNs used to correct OCR misreads before any request is made
+        self.name_index = NameIndex(config)
+
+        # Deadline-aware, prioritized lookup workers
+        self.scheduler = LookupScheduler(config, self.lookup_team_player, self.throttle.max_concurrency)
+
+        # Direct API calls reuse the clearance cookies solved by FlareSolverr
+        self.direct_client = DirectClient(config, self.headers)
 
     def check_flaresolverr(self):
-        """Check if FlareSolverr is running and accessible."""
-        try:
-            health_check = requests.post(self.flaresolverr_url, json={"cmd": "sessions.list"})
-            if not health_check.ok:
-                return False
-                
-            # Ensure we have a valid session
-            return self.ensure_session()
-                
-        except requests.RequestException as e:
-            self.logger.error(f"FlareSolverr health check failed: {str(e)}")
-            return False
+        """Check if any FlareSolverr instance is in rotation."""
+        return self.flaresolverr_pool.has_available()
 
     def extract_json_from_html(self, html_text):
         """Extract JSON from HTML-wrapped response."""
@@ -109,242 +106,638 @@ class TrackerLookup:
             return json_match.group(1)
         return html_text
 
-    def flaresolverr_request(self, url):
-        """Uses FlareSolverr to bypass Cloudflare restrictions with retry logic."""
-        if not self.check_flaresolverr():
-            self.logger.error("FlareSolverr is not running or not accessible")
-            self.logger.error("Please start FlareSolverr and try again.")
-            return None
-
-        payload = {
-            "cmd": "request.get",
-            "url": url,
-            "maxTimeout": self.max_timeout,
-            "headers": self.headers,
-            "session": self.session_id
-        }
+    def flaresolverr_request(self, url, affinity_key=None):
+        """Uses FlareSolverr to bypass Cloudflare restrictions with adaptive retry logic.
 
+        Requests sharing an affinity_key stick to the same FlareSolverr instance
+        while it is healthy. Raises CircuitOpenError while FlareSolverr or
+        tracker.gg keeps failing, and FlareSolverrUnavailableError while no
+        instance is reachable.
+        """
+        failed_endpoint = None
         for attempt in range(self.retry_attempts):
+            probes = self.check_breakers(self.flaresolverr_breaker, self.tracker_breaker)
             try:
-                self.logger.debug(f"FlareSolverr request attempt {attempt + 1} for URL: {url}")
-                response = requests.post(
-                    self.flaresolverr_url, 
-                    json=payload, 
-                    timeout=self.max_timeout / 1000 + 5  # Convert to seconds and add buffer
+                if not self.check_flaresolverr():
+                    self.logger.error("FlareSolverr is not running or not accessible")
+                    self.logger.error("Please start FlareSolverr and try again.")
+                    self.flaresolverr_breaker.record_failure()
+                    raise FlareSolverrUnavailableError(self.flaresolverr_pool.next_available_in())
+
+                # Wait for a free instance first so a throttle slot is only held while
+                # a request can actually be sent
+                endpoint = self.flaresolverr_pool.acquire(
+                    affinity_key, timeout=self.max_timeout / 1000, avoid=failed_endpoint
                 )
-                
-                # Debug log response details
-                self.logger.debug(f"Raw FlareSolverr response status: {response.status_code}")
-                self.logger.debug(f"Raw FlareSolverr response headers: {dict(response.headers)}")
-                self.logger.debug(f"Raw FlareSolverr response content: {response.text[:1000]}")
-                
-                if not response.ok:
-                    self.logger.error(f"FlareSolverr HTTP error: {response.status_code}")
-                    if attempt < self.retry_attempts - 1:
-                        time.sleep(self.retry_delay / 1000)
-                        continue
+                if not endpoint:
+                    self.logger.error("No FlareSolverr instance available")
+                    self.flaresolverr_breaker.record_failure()
                     return None
 
-                data = response.json()
-                
-                # Check FlareSolverr status
-                if data.get("status") != "ok":
-                    self.logger.error(f"FlareSolverr error status: {data.get('status')}, message: {data.get('message')}")
-                    if attempt < self.retry_attempts - 1:
-                        time.sleep(self.retry_delay / 1000)
-                        continue
-                    return None
+                data, backoff_reason = self.flaresolverr_attempt(endpoint, url, attempt)
+                if data:
+                    self.flaresolverr_breaker.record_success()
+                    self.tracker_breaker.record_success()
+                    self.throttle.record_success()
+                    self.direct_client.harvest(data["solution"])
+                    return data
+                if backoff_reason in TRACKER_PUSHBACK:
+                    self.flaresolverr_breaker.record_success()
+                    self.tracker_breaker.record_failure()
+                else:
+                    # Retry on another instance, and only trip the breaker when
+                    # no instance is left working
+                    failed_endpoint = endpoint
+                    if self.flaresolverr_pool.all_failing():
+                        self.flaresolverr_breaker.record_failure()
+                if backoff_reason:
+                    self.throttle.record_backoff(backoff_reason)
+            finally:
+                self.release_probes(probes)
+
+            if attempt < self.retry_attempts - 1:
+                time.sleep(self.throttle.retry_delay(attempt))
+
+        return None
+
+    def check_breakers(self, *breakers):
+        """Check that every breaker lets a call through.
+
+        Returns the breakers whose half-open probe this call claimed. If one of
+        them refuses, probes already claimed are given back before
+        CircuitOpenError is raised.
+        """
+        probes = []
+        try:
+            for breaker in breakers:
+                if breaker.check():
+                    probes.append(breaker)
+        except CircuitOpenError:
+            self.release_probes(probes)
+            raise
+        return probes
+
+    def release_probes(self, probes):
+        """Give back probes whose call ended without recording an outcome."""
+        for breaker in probes:
+            breaker.release_probe()
+
+    def flaresolverr_attempt(self, endpoint, url, attempt):
+        """Send one request through an acquired pool endpoint and release it.
+
+        Returns a (data, backoff_reason) tuple like send_flaresolverr_request.
+        """
+        data, backoff_reason, session_id = None, None, None
+        try:
+            self.throttle.acquire()
+            try:
+                session_id = self.flaresolverr_pool.checkout_session(endpoint)
+                if session_id:
+                    payload = {
+                        "cmd": "request.get",
+                        "url": url,
+                        "maxTimeout": self.max_timeout,
+                        "headers": self.headers,
+                        "session": session_id
+                    }
+                    data, backoff_reason = self.send_flaresolverr_request(endpoint.url, url, payload, attempt)
+            finally:
+                self.throttle.release()
+        finally:
+            # Push-back from tracker.gg says nothing about the instance's health
+            self.flaresolverr_pool.release(
+                endpoint, data is not None or backoff_reason in TRACKER_PUSHBACK, session_id
+            )
+        return data, backoff_reason
+
+    def send_flaresolverr_request(self, flaresolverr_url, url, payload, attempt):
+        """Send a single FlareSolverr request.
+
+        Returns a (data, backoff_reason) tuple where data is None on failure and
+        backoff_reason is set when the failure means we should slow down.
+        """
+        try:
+            self.logger.debug("FlareSolverr request attempt %d for URL: %s", attempt + 1, url)
+            response = requests.post(
+                flaresolverr_url, 
+                json=payload, 
+                # Convert to seconds and add buffer, but give up quickly if nothing is listening
+                timeout=(self.connect_timeout, self.max_timeout / 1000 + 5)
+            )
+            
+            # Debug log response details
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug("Raw FlareSolverr response", extra={'fields': {
+                    'status': response.status_code,
+                    'headers': dict(response.headers),
+                    'content': response.text[:1000]
+                }})
+            
+            if not response.ok:
+                self.logger.error(f"FlareSolverr HTTP error: {response.status_code}")
+                return None, self.classify_flaresolverr_error(response.text)
 
-                # Validate solution exists and has response
-                if not data.get("solution", {}).get("response"):
-                    self.logger.error("FlareSolverr response missing solution or response data")
-                    if attempt < self.retry_attempts - 1:
-                        time.sleep(self.retry_delay / 1000)
-                        continue
-                    return None
-                
+            data = response.json()
+            
+            # Check FlareSolverr status
+            if data.get("status") != "ok":
+                self.logger.error(f"FlareSolverr error status: {data.get('status')}, message: {data.get('message')}")
+                return None, self.classify_flaresolverr_error(data.get('message'))
+
+            # Validate solution exists and has response
+            solution = data.get("solution", {})
+            if not solution.get("response"):
+                self.logger.error("FlareSolverr response missing solution or response data")
+                return None, None
+
+            backoff_reason = self.classify_solution(solution)
+            if backoff_reason:
+                self.logger.warning(f"tracker.gg pushed back ({backoff_reason}) for URL: {url}")
+                return None, backoff_reason
+            
+            return data, None
+
+        except requests.Timeout as e:
+            self.logger.error(f"FlareSolverr request timed out (attempt {attempt + 1}): {str(e)}")
+            return None, "timeout"
+        except requests.RequestException as e:
+            self.logger.error(f"Request to FlareSolverr failed (attempt {attempt + 1}): {str(e)}")
+            return None, None
+        except json.JSONDecodeError as e:
+            self.logger.error(f"Failed to parse FlareSolverr response (attempt {attempt + 1}): {str(e)}")
+            self.logger.debug("Response content: %s", LazyText(lambda: response.text[:200]))
+            return None, None
+
+    def direct_request(self, url):
+        """Fetch a URL directly with the harvested clearance, bypassing the browser."""
+        probes = self.check_breakers(self.tracker_breaker)
+        try:
+            return self.send_direct_request(url)
+        finally:
+            self.release_probes(probes)
+
+    def send_direct_request(self, url):
+        """Send a single direct request. Returns the FlareSolverr-shaped data or None.
+
+        A 404 is returned as data, since tracker.gg answered and FlareSolverr
+        would get the same miss.
+        """
+        self.throttle.acquire()
+        try:
+            self.logger.debug("Direct request for URL: %s", url)
+            status_code, text = self.direct_client.get(url)
+        except httpx.TimeoutException as e:
+            self.logger.warning(f"Direct request timed out: {str(e)}")
+            self.tracker_breaker.record_failure()
+            self.throttle.record_backoff('timeout')
+            return None
+        except httpx.ConnectError as e:
+            self.logger.warning(f"Direct request could not connect: {str(e)}")
+            self.tracker_breaker.record_failure()
+            self.throttle.record_backoff('connect_error')
+            return None
+        except httpx.HTTPError as e:
+            self.logger.warning(f"Direct request failed: {str(e)}")
+            self.tracker_breaker.record_failure()
+            return None
+        finally:
+            self.throttle.release()
+
+        solution = {"url": url, "status": status_code, "response": text}
+        backoff_reason = self.classify_solution(solution)
+        if backoff_reason == "http_429":
+            self.logger.warning(f"Direct request rate limited for URL: {url}")
+            self.tracker_breaker.record_failure()
+            self.throttle.record_backoff(backoff_reason)
+            return None
+        if backoff_reason:
+            # Clearance expired or was revoked. That says nothing about the request
+            # rate, so only stop using it and let FlareSolverr solve it again
+            self.logger.info(f"Direct request rejected ({backoff_reason}) for URL: {url}")
+            self.direct_client.invalidate()
+            return None
+
+        if status_code == 404:
+            self.logger.debug("Direct request got HTTP 404 for URL: %s", url)
+            self.tracker_breaker.record_success()
+            self.throttle.record_success()
+            return {"status": "ok", "solution": solution}
+
+        if not 200 <= status_code < 300:
+            # Let FlareSolverr retry it; server errors also count against tracker.gg
+            self.logger.warning(f"Direct request got HTTP {status_code} for URL: {url}")
+            if status_code >= 500:
+                self.tracker_breaker.record_failure()
+                self.throttle.record_backoff(f"http_{status_code}")
+            return None
+
+        if not text:
+            self.logger.warning(f"Empty direct response (HTTP {status_code}) for URL: {url}")
+            return None
+
+        self.tracker_breaker.record_success()
+        self.throttle.record_success()
+        return {"status": "ok", "solution": solution}
+
+    def api_request(self, url, affinity_key=None):
+        """Fetch a tracker.gg API URL, preferring the direct path while clearance is valid."""
+        if self.direct_client.has_clearance():
+            data = self.direct_request(url)
+            if data:
                 return data
+        return self.flaresolverr_request(url, affinity_key)
+
+    def classify_flaresolverr_error(self, message):
+        """Map a FlareSolverr error message to a back-off reason, if it is one."""
+        message = (message or "").lower()
+        if "timeout" in message:
+            return "timeout"
+        if "challenge" in message or "cloudflare" in message:
+            return "challenge"
+        return None
+
+    def classify_solution(self, solution):
+        """Return a back-off reason if the solved page is not a clean API response."""
+        status = solution.get("status")
+        if status in (403, 429):
+            return f"http_{status}"
+
+        response_text = solution.get("response", "")
+        if is_challenge_page(response_text):
+            return "challenge"
+        if response_text.lstrip().startswith('<html') and not re.search(r'<pre[^>]*>', response_text):
+            return "no_json"
+        return None
+
+    def close(self):
+        """Release pooled connections and the event stream."""
+        self.direct_client.close()
+        self.renderer.close()
+
+    def get_metrics(self):
+        """Return lookup metrics, including the current adaptive request rate."""
+        return {
+            'throttle': self.throttle.metrics(),
+            'flaresolverr': self.flaresolverr_pool.metrics(),
+            'scheduler': self.scheduler.metrics(),
+            'cache': self.cache.metrics(),
+            'breakers': {
+                'flaresolverr': self.flaresolverr_breaker.metrics(),
+                'tracker': self.tracker_breaker.metrics(),
+            },
+        }
 
-            except requests.RequestException as e:
-                self.logger.error(f"Request to FlareSolverr failed (attempt {attempt + 1}): {str(e)}")
-                if attempt < self.retry_attempts - 1:
-                    time.sleep(self.retry_delay / 1000)
-                    continue
-                return None
-            except json.JSONDecodeError as e:
-                self.logger.error(f"Failed to parse FlareSolverr response (attempt {attempt + 1}): {str(e)}")
-                self.logger.debug(f"Response content: {response.text[:200]}")
-                if attempt < self.retry_attempts - 1:
-                    time.sleep(self.retry_delay / 1000)
-                    continue
-                return None
+    def get_cached(self, player_name):
+        """Return a cached lookup result if it is still fresh."""
+        record = self.cache.get(player_name)
+        if record and time.time() - record.fetched_at < self.cache_ttl:
+            return record.to_result()
+        return None
+
+    def get_stale(self, player_name, error):
+        """Return the last known result for a player, marked stale, or None."""
+        record = self.cache.get(player_name)
+        result = record.to_result() if record else None
+        if not result and self.shared_cache:
+            result = self.shared_cache.get(player_name)
+        if not result:
+            self.logger.warning(f"No stats for {player_name}: {str(error)}")
+            return None
+        self.logger.info(f"Serving stale stats for {player_name}: {str(error)}")
+        return dict(result, stale=True)
 
+    @profiled('lookup_player')
     def lookup_player(self, player_name):
-        """Look up a single player using FlareSolverr."""
+        """Look up a single player through the direct path or FlareSolverr.
+
+        Returns a result dict with the player's heroes sorted by matches played,
+        or None if the lookup failed.
+        """
         try:
             # URL encode the player name for the API request
             encoded_name = requests.utils.quote(player_name)
-            search_url = f"{self.base_url}/standard/search?platform=ign&query={encoded_name}"
-            result = self.flaresolverr_request(search_url)
-
-            if not result:
-                self.logger.error(f"Empty response from FlareSolverr for {player_name}")
+            if not self.search_player(player_name, encoded_name):
                 return
 
-            if "solution" not in result:
-                self.logger.error(f"No 'solution' in FlareSolverr response for {player_name}")
+            # The responses are parsed in helpers so the parsed JSON is freed as
+            # soon as they return; only the compact record is kept
+            sorted_heroes = self.fetch_hero_stats(player_name, encoded_name)
+            if sorted_heroes is None:
                 return
 
-            if "response" not in result["solution"]:
-                self.logger.error(f"No 'response' in solution for {player_name}")
-                return
+            record = HeroStats.from_heroes(player_name, sorted_heroes, time.time())
+            self.cache.put(record)
+            self.name_index.add(player_name, weight=CONFIRMED_NAME_WEIGHT)
+            return record.to_result()
 
-            response_text = result["solution"]["response"]
-            if not response_text:
-                self.logger.error(f"Empty response text for {player_name}")
-                return
+        except UpstreamUnavailableError:
+            raise
+        except Exception as e:
+            self.logger.error(f"Unexpected error looking up {player_name}: {str(e)}")
 
-            # Extract JSON from response
-            search_json = self.extract_json_from_html(response_text)
-            if not search_json:
-                return
+    def search_player(self, player_name, encoded_name):
+        """Check that tracker.gg knows the player. Returns True if the search found them."""
+        search_url = f"{self.base_url}/standard/search?platform=ign&query={encoded_name}"
+        result = self.api_request(search_url, affinity_key=player_name)
 
+        if not result:
+            self.logger.error(f"Empty response from FlareSolverr for {player_name}")
+            return False
+
+        if "solution" not in result:
+            self.logger.error(f"No 'solution' in FlareSolverr response for {player_name}")
+            return False
+
+        if "response" not in result["solution"]:
+            self.logger.error(f"No 'response' in solution for {player_name}")
+            return False
+
+        response_text = result["solution"]["response"]
+        if not response_text:
+            self.logger.error(f"Empty response text for {player_name}")
+            return False
+
+        # Extract JSON from response
+        search_json = self.extract_json_from_html(response_text)
+        if not search_json:
+            return False
+
+        try:
             search_data = json.loads(search_json)
-            if not search_data.get('data'):
-                self.logger.error(f"No search results found for {player_name}")
-                return
-            
-            self.logger.debug(f"Parsed search data: {json.dumps(search_data, indent=2)}")
-            # Get player's stats
-            stats_url = f"{self.base_url}/standard/profile/ign/{encoded_name}"
-            stats_result = self.flaresolverr_request(stats_url)
+        except json.JSONDecodeError as e:
+            self.logger.error(f"Error parsing response for {player_name}: {str(e)}")
+            self.logger.debug("Response that failed to parse:")
+            self.logger.debug("Search URL: %s", search_url)
+            self.logger.debug("Response text: %s", LazyText(lambda: response_text[:500]))
+            return False
 
-            if not stats_result:
-                self.logger.error(f"Empty stats response from FlareSolverr for {player_name}")
-                return
+        if not search_data.get('data'):
+            self.logger.error(f"No search results found for {player_name}")
+            return False
 
-            if "solution" not in stats_result:
-                self.logger.error(f"No 'solution' in stats response for {player_name}")
-                return
+        self.logger.debug("Parsed search data: %s", LazyJSON(search_data, indent=2))
+        return True
 
-            if "response" not in stats_result["solution"]:
-                self.logger.error(f"No 'response' in stats solution for {player_name}")
-                return
+    def fetch_hero_stats(self, player_name, encoded_name):
+        """Fetch a player's profile and total their stats per hero.
 
-            stats_response_text = stats_result["solution"]["response"]
-            if not stats_response_text:
-                self.logger.error(f"Empty stats response text for {player_name}")
-                return
+        Returns the hero dicts sorted by matches played, or None on failure.
+        """
+        stats_url = f"{self.base_url}/standard/profile/ign/{encoded_name}"
+        stats_result = self.api_request(stats_url, affinity_key=player_name)
 
-            # Extract JSON from stats response
-            stats_json = self.extract_json_from_html(stats_response_text)
-            if not stats_json:
-                return
+        if not stats_result:
+            self.logger.error(f"Empty stats response from FlareSolverr for {player_name}")
+            return None
 
-            try:
-                stats_data = json.loads(stats_json)
-            except json.JSONDecodeError as e:
-                self.logger.error(f"Failed to parse JSON data: {e}")
-                self.logger.debug(f"Raw JSON data: {stats_json[:1000]}")
-                return
+        if "solution" not in stats_result:
+            self.logger.error(f"No 'solution' in stats response for {player_name}")
+            return None
 
-            if not isinstance(stats_data, dict):
-                self.logger.error(f"Stats data is not a dictionary: {type(stats_data)}")
-                return
-                
-            if 'data' not in stats_data:
-                self.logger.error("No 'data' key in stats data")
-                return
-                
-            if not stats_data['data']:
-                self.logger.error("Empty data array in stats response")
-                return
+        if "response" not in stats_result["solution"]:
+            self.logger.error(f"No 'response' in stats solution for {player_name}")
+            return None
 
-            # Log full data structure for debugging
-            self.logger.debug(f"Full stats data structure: {json.dumps(stats_data, indent=2)}")
+        stats_response_text = stats_result["solution"]["response"]
+        if not stats_response_text:
+            self.logger.error(f"Empty stats response text for {player_name}")
+            return None
 
-            # Get segments from the data
-            segments = stats_data.get('data', {}).get('segments', [])
-            if not isinstance(segments, list):
-                self.logger.error(f"Unexpected segments structure - expected list, got {type(segments)}")
-                return
+        # Extract JSON from stats response
+        stats_json = self.extract_json_from_html(stats_response_text)
+        if not stats_json:
+            return None
+
+        try:
+            stats_data = json.loads(stats_json)
+        except json.JSONDecodeError as e:
+            self.logger.error(f"Failed to parse JSON data: {e}")
+            self.logger.debug("Raw JSON data: %s", LazyText(lambda: stats_json[:1000]))
+            return None
 
-            # Filter for hero segments
-            hero_segments = [
-                seg for seg in segments 
-                if isinstance(seg, dict) and seg.get('type') == 'hero'
-            ]
+        if not isinstance(stats_data, dict):
+            self.logger.error(f"Stats data is not a dictionary: {type(stats_data)}")
+            return None
             
-            if not hero_segments:
-                self.logger.error(f"No hero segments found for {player_name}")
-                return
+        if 'data' not in stats_data:
+            self.logger.error("No 'data' key in stats data")
+            return None
             
-            # Process hero stats
-            hero_stats = {}
-            for segment in hero_segments:
-                hero_name = segment.get('metadata', {}).get('name', 'Unknown Hero')
-                hero_id = segment.get('attributes', {}).get('heroId')
-                
-                if not hero_id:
-                    self.logger.warning(f"Missing heroId for hero: {hero_name}")
-                    continue
-                
-                if hero_id not in hero_stats:
-                    hero_stats[hero_id] = {
-                        'name': hero_name,
-                        'matches': 0,
-                        'wins': 0,
-                        'kda': 0
-                    }
-                
-                stats = segment.get('stats', {})
-                if not stats:
-                    self.logger.warning(f"No stats found for hero: {hero_name}")
-                    continue
-                    
-                # Extract stats from the response structure
-                matches = float(stats.get('matchesPlayed', {}).get('value', 0))
-                wins = float(stats.get('matchesWon', {}).get('value', 0))
-                kda = float(stats.get('kdaRatio', {}).get('value', 0))
-                
-                hero_stats[hero_id]['matches'] += matches
-                hero_stats[hero_id]['wins'] += wins
-                hero_stats[hero_id]['kda'] = max(hero_stats[hero_id]['kda'], kda)
+        if not stats_data['data']:
+            self.logger.error("Empty data array in stats response")
+            return None
 
-            # Sort heroes by matches played
-            sorted_heroes = sorted(hero_stats.values(), key=lambda x: x['matches'], reverse=True)
+        # Log full data structure for debugging
+        self.logger.debug("Full stats data structure: %s", LazyJSON(stats_data, indent=2))
+
+        # Get segments from the data
+        segments = stats_data.get('data', {}).get('segments', [])
+        if not isinstance(segments, list):
+            self.logger.error(f"Unexpected segments structure - expected list, got {type(segments)}")
+            return None
+
+        # Filter for hero segments
+        hero_segments = [
+            seg for seg in segments 
+            if isinstance(seg, dict) and seg.get('type') == 'hero'
+        ]
+        
+        if not hero_segments:
+            self.logger.error(f"No hero segments found for {player_name}")
+            return None
+        
+        # Process hero stats
+        hero_stats = {}
+        for segment in hero_segments:
+            hero_name = segment.get('metadata', {}).get('name', 'Unknown Hero')
+            hero_role = segment.get('metadata', {}).get('roleName', 'Unknown')
+            hero_id = segment.get('attributes', {}).get('heroId')
+            
+            if not hero_id:
+                self.logger.warning(f"Missing heroId for hero: {hero_name}")
+                continue
+            
+            if hero_id not in hero_stats:
+                hero_stats[hero_id] = {
+                    'id': hero_id,
+                    'name': hero_name,
+                    'role': hero_role,
+                    'matches': 0,
+                    'wins': 0,
+                    'kda': 0
+                }
             
-            # Display top 3 heroes
-            print(f"\n{player_name}")
-            for hero in sorted_heroes[:3]:
-                losses = hero['matches'] - hero['wins']
-                win_rate = (hero['wins'] / hero['matches'] * 100) if hero['matches'] > 0 else 0
-                print(f"  • {hero['name']} ({hero['matches']} games)")
-                print(f"    {win_rate:.1f}% WR ({hero['wins']} W - {losses} L), KDA: {hero['kda']:.2f}")
+            stats = segment.get('stats', {})
+            if not stats:
+                self.logger.warning(f"No stats found for hero: {hero_name}")
+                continue
+                
+            # Extract stats from the response structure
+            matches = float(stats.get('matchesPlayed', {}).get('value', 0))
+            wins = float(stats.get('matchesWon', {}).get('value', 0))
+            kda = float(stats.get('kdaRatio', {}).get('value', 0))
+            
+            hero_stats[hero_id]['matches'] += matches
+            hero_stats[hero_id]['wins'] += wins
+            hero_stats[hero_id]['kda'] = max(hero_stats[hero_id]['kda'], kda)
+
+        # Sort heroes by matches played
+        return sorted(hero_stats.values(), key=lambda x: x['matches'], reverse=True)
+
+    def fetch_player(self, player_name):
+        """Return a player's stats from the cache or a lookup.
+
+        Concurrent callers asking for the same player share a single upstream
+        lookup. While an upstream is unavailable, the last known result is
+        returned marked stale. Returns a (result, cached) tuple.
+        """
+        cached = self.get_cached(player_name)
+        if cached:
+            return cached, True
+
+        with self.inflight_lock:
+            future = self.inflight.get(player_name)
+            is_owner = future is None
+            if is_owner:
+                future = Future()
+                self.inflight[player_name] = future
+
+        if not is_owner:
+            self.logger.debug("Joining in-flight lookup for %s", player_name)
+            try:
+                return future.result(), False
+            except UpstreamUnavailableError as e:
+                stale = self.get_stale(player_name, e)
+                return stale, stale is not None
 
-        except json.JSONDecodeError as e:
-            self.logger.error(f"Error parsing response for {player_name}: {str(e)}")
-            self.logger.debug("Response that failed to parse:")
-            self.logger.debug(f"Search URL: {search_url}")
-            self.logger.debug(f"Stats URL: {stats_url}")
-            self.logger.debug(f"Response text: {response_text[:500] if 'response_text' in locals() else 'N/A'}")
+        try:
+            result, cached = self.lookup_shared(player_name)
+            future.set_result(result)
+            return result, cached
+        except UpstreamUnavailableError as e:
+            future.set_exception(e)
+            stale = self.get_stale(player_name, e)
+            return stale, stale is not None
         except Exception as e:
-            self.logger.error(f"Unexpected error looking up {player_name}: {str(e)}")
-
-    def lookup_players(self, friendly_team=None, enemy_team=None):
-        """Look up player stats based on configuration settings."""
+            future.set_exception(e)
+            raise
+        finally:
+            with self.inflight_lock:
+                del self.inflight[player_name]
+
+    def lookup_shared(self, player_name):
+        """Look up a player, sharing the work with other instances through the cache daemon.
+
+        Only one instance fetches a given player at a time; the others wait for
+        its result. Returns a (result, cached) tuple like fetch_player.
+        """
+        if not self.shared_cache:
+            return self.lookup_player(player_name), False
+
+        shared, leased = self.shared_cache.lease(player_name, self.cache_ttl)
+        if shared:
+            self.cache.put(HeroStats.from_result(shared))
+            self.name_index.add(player_name, weight=CONFIRMED_NAME_WEIGHT)
+            return shared, True
+
+        result = None
+        try:
+            if leased:
+                # Keep other instances waiting on us for as long as the lookup takes
+                with self.shared_cache.keep_lease(player_name):
+                    result = self.lookup_player(player_name)
+            else:
+                result = self.lookup_player(player_name)
+        finally:
+            if result:
+                self.shared_cache.put(player_name, result, result['fetched_at'])
+            elif leased:
+                self.shared_cache.release(player_name)
+        return result, False
+
+    def lookup_team_player(self, player_name, team, lobby=None):
+        """Look up a player and report the outcome to the renderer.
+
+        Lookups outside a lobby (cache warm-up) fill the cache without
+        showing anything.
+        """
+        result, cached = self.fetch_player(player_name)
+        if lobby is None:
+            self.logger.debug("Warm-up lookup for %s (%s)", player_name, 'cached' if cached else 'fetched')
+            return result
+        if cached:
+            self.renderer.emit(
+                EVENT_CACHED, player_name, team, lobby=lobby, heroes=result['heroes'],
+                stale=result.get('stale', False), fetched_at=result['fetched_at']
+            )
+        elif result:
+            self.renderer.emit(EVENT_FETCHED, player_name, team, lobby=lobby, heroes=result['heroes'])
+        else:
+            self.renderer.emit(EVENT_FAILED, player_name, team, lobby=lobby, error="lookup failed")
+        return result
+
+    def looked_up_teams(self):
+        """Return the teams whose players are looked up for a capture."""
+        teams = []
+        if self.lookup_friendly:
+            teams.append('friendly')
+        if self.lookup_enemy:
+            teams.append('enemy')
+        return teams
+
+    def warm_up(self, players):
+        """Prefetch players into the cache at idle priority.
+
+        Players already cached are skipped. Lookups only run while no capture
+        is waiting on the scheduler, and are paced by the same throttle.
+        """
+        players = [player for player in players if self.get_cached(player) is None]
+        if not players:
+            return []
+        self.logger.info(f"Warming lookup cache with {len(players)} players")
+        return self.scheduler.submit_idle(players)
+
+    def lookup_players(self, friendly_team=None, enemy_team=None, reuse=None):
+        """Look up player stats based on configuration settings.
+
+        Players in reuse (a dict of earlier results by name) are shown from it
+        without a lookup. Returns a dict mapping player names to their lookup results.
+        """
         if not friendly_team and not enemy_team:
             self.logger.error("No player teams provided for lookup")
-            return
+            return {}
 
+        players = []
         if self.lookup_friendly and friendly_team:
-            print("\nFriendly Team:")
-            for player in friendly_team:
-                self.lookup_player(player)
-                time.sleep(random.uniform(1, 2))  # Add delay between requests
-
+            players.extend((player, 'friendly') for player in friendly_team)
         if self.lookup_enemy and enemy_team:
-            print("\nEnemy Team:")
-            for player in enemy_team:
-                self.lookup_player(player)
-                time.sleep(random.uniform(1, 2))  # Add delay between requests
\ No newline at end of file
+            players.extend((player, 'enemy') for player in enemy_team)
+
+        reuse = reuse or {}
+        reused = {}
+        lobby = self.renderer.start_lobby()
+        scheduled = []
+        for player, team in players:
+            if player in reuse:
+                result = reused[player] = reuse[player]
+                self.renderer.emit(
+                    EVENT_CACHED, player, team, lobby=lobby, heroes=result['heroes'],
+                    stale=result.get('stale', False), fetched_at=result['fetched_at']
+                )
+                continue
+            self.renderer.emit(EVENT_QUEUED, player, team)
+            cached = self.get_cached(player) is not None
+            seen_before = player in self.name_index.name_ids
+            scheduled.append((player, team, cached, seen_before))
+
+        # Lookups run in priority order on the scheduler's workers, paced by the
+        # adaptive throttle. Results are rendered as each one completes; we only
+        # wait for them until the capture's deadline.
+        results = {}
+        if scheduled:
+            batch = self.scheduler.submit_lobby(lobby, scheduled)
+            results = batch.wait()
+        results.update(reused)
+
+        self.logger.info("Lookup metrics: %s", self.get_metrics())
+        return results
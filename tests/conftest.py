@@ -0,0 +1,76 @@
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+class StubFlareSolverrHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        with server.lock:
+            server.commands.append(body)
+        if body['cmd'] == 'sessions.list':
+            with server.lock:
+                data = {'status': 'ok', 'sessions': [{'id': session} for session in server.sessions]}
+        elif body['cmd'] == 'sessions.create':
+            with server.lock:
+                server.created += 1
+                session = f"session{server.created}"
+                server.sessions.append(session)
+            data = {'status': 'ok', 'session': session}
+        elif body['cmd'] == 'sessions.destroy':
+            with server.lock:
+                if body['session'] in server.sessions:
+                    server.sessions.remove(body['session'])
+            data = {'status': 'ok'}
+        else:
+            with server.lock:
+                server.active[body.get('session')] = server.active.get(body.get('session'), 0) + 1
+                server.overlaps = max([server.overlaps] + list(server.active.values()))
+            time.sleep(server.latency)
+            with server.lock:
+                server.active[body.get('session')] -= 1
+            data = {'status': 'ok', 'solution': {'status': server.status, 'response': server.respond(body['url'])}}
+
+        payload = json.dumps(data).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+@pytest.fixture
+def stub_flaresolverr():
+    """A FlareSolverr stand-in that records commands and per-session overlap."""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubFlareSolverrHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.commands = []
+    server.sessions = []
+    server.created = 0
+    server.active = {}
+    server.overlaps = 0
+    server.latency = 0.02
+    server.status = 200
+    server.respond = lambda url: '{"data": {}}'
+    server.url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture(autouse=True)
+def quiet_logging():
+    logging.disable(logging.CRITICAL)
+    yield
+    logging.disable(logging.NOTSET)
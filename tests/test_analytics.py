@@ -0,0 +1,128 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from analytics import MatchupAnalytics
+from database import Database
+
+def hero(hero_id, matches, wins, name=None, role='Duelist'):
+    return {'id': hero_id, 'name': name or f"Hero {hero_id}", 'role': role,
+            'matches': float(matches), 'wins': float(wins), 'kda': 2.0}
+
+@pytest.fixture
+def database(tmp_path):
+    return Database({'database_path': str(tmp_path / 'matches.db')})
+
+def rows(database, query, *params):
+    with sqlite3.connect(database.db_path) as conn:
+        return conn.execute(query, params).fetchall()
+
+def test_summary_uses_main_heroes_and_recorded_results(database):
+    database.store_player_stats('Alice', [hero('1', 100, 60), hero('2', 10, 1, role='Vanguard')], time.time())
+    database.store_player_stats('Bob', [hero('3', 50, 20, role='Strategist')], time.time())
+    match_id = database.store_match(None, ['Alice'], ['Bob', 'Carol'], None, None)
+    database.record_match_result(match_id, True)
+
+    summary = MatchupAnalytics(database).summarize_lobby(['Alice'], ['Bob', 'Carol'])
+    assert summary['friendly'] == {'players_known': 1, 'avg_main_win_rate': 0.6, 'role_coverage': {'Duelist': 1}}
+    assert summary['enemy']['role_coverage'] == {'Strategist': 1}
+    assert [opponent['player'] for opponent in summary['recurring_opponents']] == ['Bob', 'Carol']
+    assert summary['recurring_opponents'][0]['friendly_win_rate'] == 1.0
+
+def test_new_results_reload_opponent_history(database):
+    analytics = MatchupAnalytics(database)
+    assert analytics.summarize_lobby([], ['Bob'])['recurring_opponents'] == []
+    match_id = database.store_match(None, ['Alice'], ['Bob'], None, None)
+    database.record_match_result(match_id, False)
+    assert analytics.summarize_lobby([], ['Bob'])['recurring_opponents'][0]['enemy_win_rate'] == 1.0
+
+def test_recent_form_counts_games_since_the_window_started(database):
+    now = time.time()
+    database.store_player_stats('Alice', [hero('1', 100, 50)], now - 10 * 86400)
+    database.store_player_stats('Alice', [hero('1', 104, 53)], now - 3 * 86400)
+    database.store_player_stats('Alice', [hero('1', 110, 59)], now)
+
+    form = MatchupAnalytics(database, {'recent_form': {'window_days': 7}}).recent_form(['Alice'], now=now)
+    assert form[0]['games'] == 10 and form[0]['win_rate'] == 0.9
+    assert form[0]['heroes'] == [{'hero': 'Hero 1', 'games': 10, 'win_rate': 0.9}]
+
+def test_cleanup_removes_old_matches(database, tmp_path):
+    image = tmp_path / 'old.png'
+    image.write_bytes(b'png')
+    now = time.time()
+    with sqlite3.connect(database.db_path) as conn:
+        conn.execute("INSERT INTO matches (timestamp, friendly_team, enemy_team, image_path) "
+                     "VALUES (datetime('now', '-40 days'), '[]', '[]', ?)", (str(image),))
+    database.store_match(None, ['Alice'], ['Bob'], None, None)
+
+    database.cleanup_old_records(days=30)
+
+    assert rows(database, 'SELECT COUNT(*) FROM matches') == [(1,)]
+    assert not image.exists()
+
+def test_cleanup_reloads_the_arrays(database):
+    analytics = MatchupAnalytics(database)
+    match_id = database.store_match(None, ['Alice'], ['Bob'], None, None)
+    database.record_match_result(match_id, True)
+    assert analytics.summarize_lobby([], ['Bob'])['recurring_opponents'][0]['games'] == 1
+
+    with sqlite3.connect(database.db_path) as conn:
+        conn.execute("UPDATE matches SET timestamp = datetime('now', '-40 days')")
+    database.cleanup_old_records(days=30)
+    assert analytics.summarize_lobby([], ['Bob'])['recurring_opponents'] == []
+
+def test_recaptured_lobby_updates_its_match(database):
+    analytics = MatchupAnalytics(database)
+    match_id = database.store_match(None, ['Alice'], ['Bob'], None, None)
+    database.record_match_result(match_id, True)
+    analytics.summarize_lobby([], ['Bob'])
+
+    assert database.update_match_teams(match_id, ['Alice'], ['Bea'])
+    assert rows(database, 'SELECT COUNT(*) FROM matches') == [(1,)]
+    assert analytics.summarize_lobby([], ['Bob'])['recurring_opponents'] == []
+    assert analytics.summarize_lobby([], ['Bea'])['recurring_opponents'][0]['games'] == 1
+
+def test_cleanup_keeps_each_heros_newest_snapshot(database):
+    now = time.time()
+    database.store_player_stats('Alice', [hero('1', 10, 5)], now - 40 * 86400)
+    database.store_player_stats('Alice', [hero('1', 20, 9)], now - 35 * 86400)
+    database.store_player_stats('Alice', [hero('1', 30, 15)], now)
+    database.store_player_stats('Bob', [hero('2', 10, 5)], now - 40 * 86400)
+    database.store_player_stats('Bob', [hero('2', 12, 6)], now - 31 * 86400)
+
+    database.cleanup_old_records(days=30)
+
+    # Bob's newest snapshot is kept even though it's older than the cutoff
+    assert rows(database, 'SELECT player, matches FROM hero_snapshots ORDER BY player') == [('Alice', 30.0), ('Bob', 12.0)]
+
+def test_concurrent_captures_and_lookups_keep_arrays_consistent(database):
+    for i in range(50):
+        database.store_player_stats(f"p{i}", [hero('1', 10, 5)], time.time())
+    analytics = MatchupAnalytics(database)
+    analytics.refresh()
+    errors = []
+
+    def look_up(offset):
+        try:
+            for i in range(300):
+                analytics.update_player(f"new{offset}_{i}", [hero('1', 10, i % 10)])
+        except Exception as e:
+            errors.append(e)
+
+    def summarize():
+        try:
+            for i in range(100):
+                lobby = [f"new0_{i}", f"new1_{i}", 'p1']
+                analytics.summarize_lobby(lobby, lobby)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=look_up, args=(n,)) for n in range(2)] + [threading.Thread(target=summarize)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert len(analytics.main_win_rate) == len(analytics.player_index) == 650
@@ -0,0 +1,168 @@
+import json
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from cache_daemon import MAX_SLOT_INTERVAL, MAX_SLOT_WAIT, CacheDaemon, SharedCacheClient, shared_token
+
+TOKEN = 's3cret'
+
+def make_daemon(**shared_cache):
+    return CacheDaemon({'shared_cache': shared_cache})
+
+def make_client(socket_path, **shared_cache):
+    return SharedCacheClient({'shared_cache': dict({'socket_path': socket_path, 'token': TOKEN}, **shared_cache)})
+
+def result(player):
+    hero = {'id': '1', 'name': 'Hela', 'role': 'Duelist', 'matches': 10.0, 'wins': 6.0, 'kda': 3.0}
+    return {'player': player, 'heroes': [hero], 'fetched_at': time.time()}
+
+def converse(socket_path, *lines):
+    """Send raw lines on a new connection and return the daemon's replies until it closes."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(5)
+        sock.connect(socket_path)
+        sock.sendall(b''.join(line + b'\n' for line in lines))
+        sock.shutdown(socket.SHUT_WR)
+        with sock.makefile('rb') as reader:
+            return [json.loads(line) for line in reader]
+
+@pytest.fixture
+def socket_path(tmp_path):
+    path = str(tmp_path / 'cache.sock')
+    daemon = make_daemon(socket_path=path, token=TOKEN)
+    threading.Thread(target=daemon.serve_forever, daemon=True).start()
+    deadline = time.monotonic() + 5
+    while not os.path.exists(path) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    yield path
+    daemon.shutdown()
+
+def test_first_caller_gets_the_lease_and_others_join_its_put():
+    daemon = make_daemon()
+    assert daemon.lease('alice', 60, timeout=1) == {'lease': True}
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        waiters = [executor.submit(daemon.lease, 'alice', 60, 5) for _ in range(2)]
+        time.sleep(0.05)
+        assert not any(waiter.done() for waiter in waiters)
+        daemon.put('alice', {'player': 'alice'})
+        assert [waiter.result() for waiter in waiters] == [{'value': {'player': 'alice'}}] * 2
+
+    stats = daemon.dispatch({'op': 'stats'})
+    assert (stats['leased'], stats['joined'], stats['leases']) == (1, 2, 0)
+
+def test_released_lease_passes_to_a_waiter():
+    daemon = make_daemon()
+    daemon.lease('alice', 60, timeout=1)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        waiter = executor.submit(daemon.lease, 'alice', 60, 5)
+        time.sleep(0.05)
+        daemon.release('alice')
+        assert waiter.result() == {'lease': True}
+
+def test_waiting_times_out_and_expired_leases_are_taken_over():
+    daemon = make_daemon(lease_ttl=0.1)
+    daemon.lease('alice', 60, timeout=1)
+    assert daemon.lease('alice', 60, timeout=0.02) == {}
+    time.sleep(0.1)
+    # The holder never reported back, so the lease is handed out again
+    assert daemon.lease('alice', 60, timeout=0.02) == {'lease': True}
+
+def test_values_older_than_max_age_are_fetched_again():
+    daemon = make_daemon()
+    daemon.put('alice', 'old', stored_at=time.time() - 120)
+    assert daemon.get('alice') == 'old'
+    assert daemon.get('alice', max_age=60) is None
+    assert daemon.lease('alice', 60, timeout=1) == {'lease': True}
+
+def test_oldest_entries_are_evicted_past_max_entries():
+    daemon = make_daemon(max_entries=2)
+    daemon.put('a', 1)
+    daemon.put('b', 2)
+    daemon.get('a')
+    daemon.put('c', 3)
+    assert (daemon.get('a'), daemon.get('b'), daemon.get('c')) == (1, None, 3)
+
+def test_slots_keep_all_instances_to_one_pace():
+    daemon = make_daemon()
+    waits = [daemon.reserve_slot(0.5) for _ in range(3)]
+    assert waits[0] == pytest.approx(0, abs=0.01)
+    assert waits[1] == pytest.approx(0.5, abs=0.01)
+    assert waits[2] == pytest.approx(1.0, abs=0.01)
+
+def test_slot_intervals_and_waits_are_clamped():
+    daemon = make_daemon()
+    daemon.reserve_slot(100000)
+    assert daemon.reserve_slot(0.1) == pytest.approx(MAX_SLOT_INTERVAL, abs=0.01)
+    for _ in range(10):
+        daemon.reserve_slot(MAX_SLOT_INTERVAL)
+    assert daemon.reserve_slot(0.1) <= MAX_SLOT_WAIT
+
+def test_leases_are_renewed_while_the_holder_fetches():
+    daemon = make_daemon(lease_ttl=0.1)
+    daemon.lease('alice', 60, timeout=1)
+    for _ in range(3):
+        time.sleep(0.05)
+        assert daemon.renew('alice')
+    assert daemon.lease('alice', 60, timeout=0.02) == {}
+    daemon.release('alice')
+    assert not daemon.renew('alice')
+
+def test_puts_must_be_lookup_results():
+    daemon = make_daemon()
+    assert daemon.dispatch({'op': 'put', 'key': 'alice', 'value': result('alice')}) == {'ok': True}
+    for value in ['junk', result('bob'), dict(result('alice'), heroes=[{'id': 1}]), dict(result('alice'), fetched_at='now')]:
+        with pytest.raises(ValueError):
+            daemon.dispatch({'op': 'put', 'key': 'alice', 'value': value})
+    assert daemon.dispatch({'op': 'get', 'key': ['alice']}) == {'error': 'key must be a string'}
+
+def test_client_talks_to_the_daemon_over_its_socket(socket_path):
+    first = make_client(socket_path)
+    second = make_client(socket_path, renew_interval=0.02)
+    alice = result('alice')
+
+    assert first.lease('alice', 60) == (None, True)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        joined = executor.submit(second.lease, 'alice', 60)
+        time.sleep(0.05)
+        first.put('alice', alice, time.time())
+        assert joined.result(5) == (alice, False)
+    assert second.get('alice') == alice
+    assert first.reserve_slot(0.1) == pytest.approx(0, abs=0.05)
+
+    assert second.lease('bob', 60) == (None, True)
+    with second.keep_lease('bob'):
+        time.sleep(0.1)
+        assert first.request({'op': 'stats'})['leases'] == 1
+
+def test_connections_need_the_token(socket_path):
+    assert converse(socket_path, b'{"op": "stats"}', b'{"op": "stats"}') == [{'error': 'Missing or invalid token'}]
+    assert converse(socket_path, b'{"op": "auth", "token": "wrong"}', b'{"op": "stats"}') == [
+        {'error': 'Missing or invalid token'}
+    ]
+    assert make_client(socket_path, token='wrong').get('alice') is None
+
+def test_a_malformed_line_closes_the_connection(socket_path):
+    auth = json.dumps({'op': 'auth', 'token': TOKEN}).encode()
+    replies = converse(socket_path, auth, b'not json', b'{"op": "stats"}')
+    assert replies == [{'ok': True}, {'error': 'Expected one JSON object per line'}]
+    assert converse(socket_path, auth, b'[1, 2]', b'{"op": "stats"}')[1:] == [{'error': 'Expected one JSON object per line'}]
+
+def test_token_file_is_created_once(tmp_path):
+    config = {'shared_cache': {'token_file': str(tmp_path / 'token')}}
+    assert shared_token(config) is None
+    token = shared_token(config, create=True)
+    assert token and shared_token(config) == token == shared_token(config, create=True)
+    assert os.stat(tmp_path / 'token').st_mode & 0o777 == 0o600
+
+def test_client_falls_back_to_local_behaviour_without_a_daemon(tmp_path):
+    client = SharedCacheClient({'shared_cache': {'socket_path': str(tmp_path / 'missing.sock')}})
+    assert client.lease('alice', 60) == (None, False)
+    assert client.get('alice') is None
+    assert client.reserve_slot(0.5) is None
+    assert client.unavailable_until > time.monotonic()
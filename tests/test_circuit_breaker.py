@@ -0,0 +1,126 @@
+import time
+
+import httpx
+import pytest
+
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from flaresolverr_pool import FlareSolverrUnavailableError
+from hero_stats import HeroStats
+from tracker_lookup import TrackerLookup
+
+def make_breaker(reset_timeout=0.05, failure_threshold=2):
+    config = {'circuit_breakers': {'test': {'failure_threshold': failure_threshold, 'reset_timeout': reset_timeout}}}
+    return CircuitBreaker('test', config)
+
+def open_breaker(breaker):
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+
+def test_opens_after_consecutive_failures_and_fails_fast():
+    breaker = make_breaker(reset_timeout=60)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == 'closed'
+
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    with pytest.raises(CircuitOpenError) as error:
+        breaker.check()
+    assert error.value.name == 'test' and error.value.retry_in > 0
+    assert breaker.metrics()['rejected'] == 1
+
+def test_half_open_lets_a_single_probe_through():
+    breaker = make_breaker()
+    open_breaker(breaker)
+    time.sleep(0.06)
+
+    assert breaker.check() is True
+    assert breaker.state == 'half_open'
+    assert not breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state == 'closed'
+    assert breaker.check() is False
+
+def test_failed_probe_reopens_the_circuit():
+    breaker = make_breaker()
+    open_breaker(breaker)
+    time.sleep(0.06)
+
+    assert breaker.check()
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    assert not breaker.allow()
+
+def test_released_probe_can_be_claimed_again():
+    breaker = make_breaker(reset_timeout=0.05)
+    open_breaker(breaker)
+    time.sleep(0.06)
+
+    assert breaker.check()
+    breaker.release_probe()
+    assert breaker.state == 'half_open'
+    assert breaker.check()
+
+@pytest.fixture
+def lookup(stub_flaresolverr):
+    lookup = TrackerLookup({
+        'flaresolverr': {'url': stub_flaresolverr.url, 'min_request_delay': 1, 'retry_delay': 1,
+                         'retry_attempts': 1, 'throttle': {'max_rate': 1000}},
+        'circuit_breakers': {
+            'flaresolverr': {'failure_threshold': 1, 'reset_timeout': 0.05},
+            'tracker': {'failure_threshold': 1, 'reset_timeout': 60},
+        },
+        'renderer': {'live_table': False},
+    })
+    yield lookup
+    lookup.close()
+
+def test_refused_check_gives_back_probes_already_claimed(lookup):
+    lookup.flaresolverr_breaker.record_failure()
+    lookup.tracker_breaker.record_failure()
+    time.sleep(0.06)
+
+    with pytest.raises(CircuitOpenError) as error:
+        lookup.flaresolverr_request('https://example.com/')
+    assert error.value.name == 'tracker'
+    # The FlareSolverr probe was not left claimed by the refused call
+    assert lookup.flaresolverr_breaker.check()
+
+def test_probe_without_an_outcome_is_released(lookup):
+    lookup.tracker_breaker.reset_timeout = 0.05
+    lookup.tracker_breaker.record_failure()
+    time.sleep(0.06)
+    lookup.direct_client.harvest({
+        'userAgent': 'Mozilla/5.0 Firefox/120.0',
+        'cookies': [{'name': 'cf_clearance', 'value': 'abc', 'domain': '.tracker.gg', 'expires': time.time() + 3600}],
+    })
+    lookup.direct_client.client = httpx.Client(
+        transport=httpx.MockTransport(lambda request: httpx.Response(403, text='<html>Just a moment...</html>'))
+    )
+
+    # A rejected clearance is not a tracker.gg failure
+    assert lookup.direct_request('https://api.tracker.gg/x') is None
+    assert lookup.tracker_breaker.state == 'half_open'
+    assert lookup.tracker_breaker.check()
+
+def test_unreachable_flaresolverr_is_reported_as_unavailable(lookup):
+    for endpoint in lookup.flaresolverr_pool.endpoints:
+        endpoint.ejected_until = time.time() + 60
+
+    with pytest.raises(FlareSolverrUnavailableError) as error:
+        lookup.flaresolverr_request('https://example.com/')
+    assert not isinstance(error.value, CircuitOpenError)
+    assert error.value.retry_in > 0
+
+def test_stale_stats_are_served_while_flaresolverr_is_unavailable(lookup):
+    hero = {'id': '1024', 'name': 'Hela', 'role': 'Duelist', 'matches': 40.0, 'wins': 22.0, 'kda': 3.1}
+    lookup.cache.put(HeroStats.from_heroes('Someone', [hero], time.time() - lookup.cache_ttl - 1))
+    for endpoint in lookup.flaresolverr_pool.endpoints:
+        endpoint.ejected_until = time.time() + 60
+
+    result, cached = lookup.fetch_player('Someone')
+    assert cached and result['stale']
+    assert result['heroes'] == [hero]
+    assert lookup.fetch_player('Nobody') == (None, False)
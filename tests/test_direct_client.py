@@ -0,0 +1,102 @@
+import time
+
+import httpx
+import pytest
+
+from tracker_lookup import TrackerLookup
+
+SOLUTION = {
+    'userAgent': 'Mozilla/5.0 Firefox/120.0',
+    'cookies': [{'name': 'cf_clearance', 'value': 'abc', 'domain': '.tracker.gg', 'expires': time.time() + 3600}],
+}
+
+@pytest.fixture
+def lookup(stub_flaresolverr):
+    lookup = TrackerLookup({
+        'flaresolverr': {'url': stub_flaresolverr.url, 'min_request_delay': 1, 'retry_delay': 1,
+                         'retry_attempts': 1, 'throttle': {'max_rate': 1000}},
+        'renderer': {'live_table': False},
+    })
+    lookup.direct_client.harvest(SOLUTION)
+    yield lookup
+    lookup.close()
+
+def respond_with(lookup, handler):
+    lookup.direct_client.client = httpx.Client(transport=httpx.MockTransport(handler))
+
+def test_harvested_clearance_is_sent_with_direct_requests(lookup):
+    seen = []
+
+    def handler(request):
+        seen.append(request.headers)
+        return httpx.Response(200, text='{"data": []}')
+
+    respond_with(lookup, handler)
+    data = lookup.api_request('https://api.tracker.gg/x')
+    assert data['solution']['response'] == '{"data": []}'
+    assert seen[0]['Cookie'] == 'cf_clearance=abc'
+    assert seen[0]['User-Agent'] == SOLUTION['userAgent']
+    assert 'sec-ch-ua' not in seen[0]
+    assert lookup.throttle.successes == 1
+
+def test_not_found_is_a_miss_without_flaresolverr(lookup, stub_flaresolverr):
+    respond_with(lookup, lambda request: httpx.Response(404, text='{"errors": [{"code": "NotFound"}]}'))
+    data = lookup.api_request('https://api.tracker.gg/x')
+    assert data['solution']['status'] == 404
+    assert stub_flaresolverr.commands == []
+    assert lookup.search_player('Nobody', 'Nobody') is False
+    assert lookup.throttle.backoffs == {}
+    assert lookup.tracker_breaker.failures == 0
+
+def test_other_client_errors_fall_back_to_flaresolverr(lookup, stub_flaresolverr):
+    respond_with(lookup, lambda request: httpx.Response(400, text='{"errors": [{"code": "BadRequest"}]}'))
+    data = lookup.api_request('https://api.tracker.gg/x')
+    assert data['solution']['response'] == '{"data": {}}'
+    assert [c['cmd'] for c in stub_flaresolverr.commands][-1] == 'request.get'
+    assert lookup.throttle.backoffs == {}
+
+def test_server_errors_back_off_and_fall_back(lookup, stub_flaresolverr):
+    respond_with(lookup, lambda request: httpx.Response(503, text='Service Unavailable'))
+    assert lookup.direct_request('https://api.tracker.gg/x') is None
+    assert lookup.throttle.backoffs == {'http_503': 1}
+    assert lookup.tracker_breaker.failures == 1
+    assert lookup.api_request('https://api.tracker.gg/x') is not None
+
+@pytest.mark.parametrize('error, reason', [
+    (httpx.ReadTimeout('timed out'), 'timeout'),
+    (httpx.ConnectError('refused'), 'connect_error'),
+])
+def test_transport_failures_back_off(lookup, error, reason):
+    def handler(request):
+        raise error
+
+    respond_with(lookup, handler)
+    assert lookup.direct_request('https://api.tracker.gg/x') is None
+    assert lookup.throttle.backoffs == {reason: 1}
+
+def test_rejected_clearance_is_dropped_without_backing_off(lookup):
+    respond_with(lookup, lambda request: httpx.Response(403, text='<html>Just a moment...</html>'))
+    assert lookup.direct_request('https://api.tracker.gg/x') is None
+    assert not lookup.direct_client.has_clearance()
+    assert lookup.throttle.backoffs == {}
+    assert lookup.tracker_breaker.failures == 0
+
+def test_rejected_clearance_is_not_harvested_again(lookup):
+    lookup.direct_client.invalidate()
+    lookup.direct_client.harvest(SOLUTION)
+    assert not lookup.direct_client.has_clearance()
+
+    renewed = dict(SOLUTION, cookies=[dict(SOLUTION['cookies'][0], value='def')])
+    lookup.direct_client.harvest(renewed)
+    assert lookup.direct_client.has_clearance()
+
+def test_rate_limiting_backs_off_but_keeps_the_clearance(lookup):
+    respond_with(lookup, lambda request: httpx.Response(429, text='{"errors": []}'))
+    assert lookup.direct_request('https://api.tracker.gg/x') is None
+    assert lookup.direct_client.has_clearance()
+    assert lookup.throttle.backoffs == {'http_429': 1}
+
+def test_user_agent_alone_is_not_clearance(lookup):
+    lookup.direct_client.invalidate()
+    lookup.direct_client.harvest({'userAgent': SOLUTION['userAgent'], 'cookies': []})
+    assert not lookup.direct_client.has_clearance()
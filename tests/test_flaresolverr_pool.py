@@ -0,0 +1,143 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import time
+
+import requests
+
+from flaresolverr_pool import FlareSolverrPool
+from tracker_lookup import TrackerLookup
+
+def make_pool(urls, **flaresolverr):
+    return FlareSolverrPool({'flaresolverr': dict({'endpoints': [{'url': url} for url in urls]}, **flaresolverr)})
+
+def test_each_in_flight_request_gets_its_own_session(stub_flaresolverr):
+    pool = make_pool([stub_flaresolverr.url], endpoint_concurrency=3)
+    endpoint = pool.endpoints[0]
+
+    held = []
+    for _ in range(3):
+        assert pool.acquire(timeout=1) is endpoint
+        held.append(pool.checkout_session(endpoint))
+    assert len(set(held)) == 3
+
+    for session_id in held:
+        pool.release(endpoint, True, session_id)
+    # Released sessions are reused rather than new ones created
+    assert pool.acquire(timeout=1) is endpoint
+    assert pool.checkout_session(endpoint) in held
+    assert len(stub_flaresolverr.sessions) == 3
+
+def test_expired_sessions_are_validated_and_replaced(stub_flaresolverr):
+    pool = make_pool([stub_flaresolverr.url])
+    endpoint = pool.acquire(timeout=1)
+    session_id = pool.checkout_session(endpoint)
+    pool.release(endpoint, True, session_id)
+
+    endpoint.session_checks[session_id] = 0
+    stub_flaresolverr.sessions.clear()
+    replacement = pool.checkout_session(endpoint)
+    assert replacement and replacement != session_id
+    assert [c['cmd'] for c in stub_flaresolverr.commands] == ['sessions.create', 'sessions.list', 'sessions.create']
+
+def test_concurrent_requests_never_share_a_browser_session(stub_flaresolverr):
+    pool = make_pool([stub_flaresolverr.url], endpoint_concurrency=4)
+
+    def request(_):
+        endpoint = pool.acquire(timeout=5)
+        session_id = pool.checkout_session(endpoint)
+        try:
+            requests.post(endpoint.url, json={'cmd': 'request.get', 'url': 'https://example.com', 'session': session_id})
+        finally:
+            pool.release(endpoint, True, session_id)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(request, range(24)))
+    assert stub_flaresolverr.overlaps == 1
+    assert len(stub_flaresolverr.sessions) <= 4
+
+def test_failing_endpoint_is_ejected_and_loses_its_sessions(stub_flaresolverr):
+    pool = make_pool([stub_flaresolverr.url, 'http://127.0.0.1:9/v1'], eject_after_failures=2)
+    good, bad = pool.endpoints
+    bad.idle_sessions.append('old')
+
+    for _ in range(2):
+        bad.in_flight += 1
+        pool.release(bad, False)
+    assert bad.ejected_until and bad.idle_sessions == []
+    assert all(pool.acquire(timeout=1) is good for _ in range(2))
+    assert pool.has_available()
+
+def test_ejected_endpoint_destroys_its_idle_sessions(stub_flaresolverr):
+    pool = make_pool([stub_flaresolverr.url], endpoint_concurrency=2, eject_after_failures=1)
+    endpoint = pool.endpoints[0]
+    held = [pool.checkout_session(endpoint) for _ in range(2)]
+    endpoint.in_flight = 2
+    pool.release(endpoint, True, held[0])
+    pool.release(endpoint, False, held[1])
+
+    deadline = time.monotonic() + 5
+    while stub_flaresolverr.sessions and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert stub_flaresolverr.sessions == []
+    assert [c['session'] for c in stub_flaresolverr.commands if c['cmd'] == 'sessions.destroy'] == held
+
+def test_failure_unpins_keys_and_all_failing_needs_every_endpoint(stub_flaresolverr):
+    pool = make_pool([stub_flaresolverr.url, 'http://127.0.0.1:9/v1'], eject_after_failures=3)
+    good, bad = pool.endpoints
+    good.in_flight += 1
+    assert pool.acquire('player', timeout=1) is bad
+    pool.release(good, True)
+
+    pool.release(bad, False)
+    assert 'player' not in pool.affinity
+    assert not pool.all_failing()
+
+    good.in_flight += 1
+    pool.release(good, False)
+    assert pool.all_failing()
+
+def test_one_dead_instance_neither_fails_requests_nor_trips_the_breaker(stub_flaresolverr):
+    lookup = TrackerLookup({
+        'flaresolverr': {
+            'endpoints': [{'url': stub_flaresolverr.url}, {'url': 'http://127.0.0.1:9/v1'}],
+            'min_request_delay': 1, 'retry_delay': 1, 'throttle': {'max_rate': 1000},
+        },
+        'renderer': {'live_table': False},
+    })
+    try:
+        # Every instance's pages can be in flight at once
+        assert lookup.throttle.max_concurrency >= lookup.flaresolverr_pool.capacity
+        assert lookup.throttle.concurrency == 2
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(
+                lambda i: lookup.flaresolverr_request(f"https://example.com/{i}", affinity_key=f"player{i}"),
+                range(12)
+            ))
+        assert all(results)
+        assert lookup.flaresolverr_breaker.state == 'closed'
+        assert lookup.flaresolverr_pool.endpoints[1].ejected_until
+    finally:
+        lookup.close()
+
+def test_throttle_slot_is_not_held_while_waiting_for_an_instance(stub_flaresolverr):
+    lookup = TrackerLookup({
+        'flaresolverr': {'url': stub_flaresolverr.url, 'endpoint_concurrency': 1, 'max_timeout': 200,
+                         'retry_attempts': 1, 'min_request_delay': 1, 'throttle': {'max_rate': 1000}},
+        'renderer': {'live_table': False},
+    })
+    try:
+        endpoint = lookup.flaresolverr_pool.acquire(timeout=1)
+        assert lookup.flaresolverr_request('https://example.com/') is None
+        assert lookup.throttle.in_flight == 0
+        lookup.flaresolverr_pool.release(endpoint, True)
+    finally:
+        lookup.close()
+
+def test_retry_avoids_the_endpoint_that_just_failed(stub_flaresolverr):
+    pool = make_pool([stub_flaresolverr.url, 'http://127.0.0.1:9/v1'])
+    good, bad = pool.endpoints
+    assert pool.acquire(timeout=1, avoid=good) is bad
+    assert pool.acquire(timeout=1, avoid=bad) is good
+    good.ejected_until = float('inf')
+    # With nothing else available the avoided endpoint is still used
+    assert pool.acquire(timeout=1, avoid=bad) is bad
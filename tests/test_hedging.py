@@ -0,0 +1,92 @@
+import asyncio
+import threading
+
+import pytest
+
+from hedging import BackgroundLoop, HedgePolicy, LatencyTracker, run_hedged
+
+@pytest.fixture
+def loop():
+    loop = BackgroundLoop()
+    yield loop
+    loop.close()
+
+def make_policy(**config):
+    return HedgePolicy(dict({'enabled': True, 'initial_delay': 0.05, 'min_samples': 100}, **config))
+
+def sleeper(*delays):
+    """Return a make_request whose successive calls take the given times."""
+    calls = []
+
+    async def make_request():
+        index = len(calls)
+        calls.append(index)
+        await asyncio.sleep(delays[index])
+        return index
+
+    make_request.calls = calls
+    return make_request
+
+def test_latency_percentile():
+    tracker = LatencyTracker()
+    assert tracker.percentile(90) is None
+    for i in range(1, 11):
+        tracker.record(i / 10)
+    assert tracker.percentile(50) == 0.6
+    assert tracker.percentile(90) == 1.0
+
+def test_fast_primary_is_not_hedged(loop):
+    policy = make_policy()
+    make_request = sleeper(0.01)
+    assert loop.run(run_hedged(make_request, policy)) == 0
+    assert make_request.calls == [0]
+    assert policy.stats()['hedge_rate'] == 0.0
+    assert len(policy.latencies) == 1
+
+def test_hedge_wins_and_the_primary_latency_is_still_recorded(loop):
+    policy = make_policy()
+    make_request = sleeper(0.3, 0.01)
+    assert loop.run(run_hedged(make_request, policy)) == 1
+    assert policy.stats()['hedge_rate'] == 1.0
+    # The primary keeps running on the loop and reports its own latency
+    assert len(policy.latencies) == 0
+    loop.run(asyncio.sleep(0.35))
+    assert policy.latencies.percentile(50) >= 0.3
+
+def test_hedge_rate_is_capped(loop):
+    policy = make_policy(max_hedge_rate=0.5)
+    for _ in range(4):
+        loop.run(run_hedged(sleeper(0.1, 0.01), policy))
+    assert policy.stats()['hedge_rate'] == 0.5
+
+def test_each_request_marks_its_own_hedge_slot():
+    policy = make_policy(max_hedge_rate=1.0)
+    first = policy.start_request()
+    second = policy.start_request()
+    assert policy.try_hedge(first)
+    assert [slot[0] for slot in policy.recent] == [True, False]
+    assert second == [False]
+
+def test_failed_primary_falls_back_to_the_hedge(loop):
+    policy = make_policy()
+
+    async def flaky():
+        if not policy.recent[-1][0]:
+            await asyncio.sleep(0.1)
+            raise RuntimeError("primary failed")
+        return 'hedge'
+
+    assert loop.run(run_hedged(flaky, policy)) == 'hedge'
+
+def test_background_loop_is_reused_across_threads(loop):
+    loops = []
+
+    async def current():
+        return asyncio.get_running_loop()
+
+    threads = [threading.Thread(target=lambda: loops.append(loop.run(current()))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(set(map(id, loops))) == 1
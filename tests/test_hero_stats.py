@@ -0,0 +1,115 @@
+import gc
+import json
+import weakref
+
+import pytest
+
+import tracker_lookup
+from hero_stats import HEROES, HeroStats, HeroStatsCache
+from tracker_lookup import TrackerLookup
+
+HELA = {'id': '1024', 'name': 'Hela', 'role': 'Duelist', 'matches': 40.0, 'wins': 22.0, 'kda': 3.1}
+LUNA = {'id': '1031', 'name': 'Luna Snow', 'role': 'Strategist', 'matches': 12.0, 'wins': 5.0, 'kda': 4.5}
+
+def test_records_round_trip_to_result_dicts():
+    result = {'player': 'Alice', 'heroes': [HELA, LUNA], 'fetched_at': 1000.0}
+    record = HeroStats.from_result(result)
+    assert record.to_result() == result
+    assert len(record.stats) == 6 and len(record.heroes) == 2
+
+def test_hero_strings_are_shared_between_records():
+    first = HeroStats.from_heroes('Alice', [HELA], 0)
+    second = HeroStats.from_heroes('Bob', [dict(HELA, name=''.join(['He', 'la']))], 0)
+    assert first.heroes[0] == second.heroes[0]
+    assert first.to_result()['heroes'][0]['name'] is second.to_result()['heroes'][0]['name']
+    assert HEROES.get(first.heroes[0]) == ('1024', 'Hela', 'Duelist')
+
+def record(player, heroes=(HELA,)):
+    return HeroStats.from_heroes(player, list(heroes), 0)
+
+def test_cache_evicts_least_recently_used_past_its_byte_limit():
+    size = record('a').nbytes() + 120
+    cache = HeroStatsCache(max_bytes=size * 2)
+    cache.put(record('a'))
+    cache.put(record('b'))
+    cache.get('a')
+    cache.put(record('c'))
+
+    assert cache.get('b') is None
+    assert cache.get('a') and cache.get('c')
+    metrics = cache.metrics()
+    assert (metrics['entries'], metrics['evictions']) == (2, 1)
+    assert metrics['bytes'] <= metrics['max_bytes']
+
+def test_replacing_an_entry_updates_its_size():
+    cache = HeroStatsCache(max_bytes=10 ** 6)
+    cache.put(record('a'))
+    small = cache.nbytes
+    cache.put(record('a', [HELA, LUNA]))
+    assert len(cache) == 1
+    assert cache.nbytes == record('a', [HELA, LUNA]).nbytes() + 120 > small
+
+def test_newest_entry_is_kept_even_when_over_the_limit():
+    cache = HeroStatsCache(max_bytes=1)
+    cache.put(record('a'))
+    cache.put(record('b'))
+    assert len(cache) == 1 and cache.get('b')
+
+def profile(*heroes):
+    segments = [{
+        'type': 'hero',
+        'metadata': {'name': hero['name'], 'roleName': hero['role']},
+        'attributes': {'heroId': hero['id']},
+        'stats': {
+            'matchesPlayed': {'value': hero['matches']},
+            'matchesWon': {'value': hero['wins']},
+            'kdaRatio': {'value': hero['kda']},
+        },
+    } for hero in heroes]
+    segments.append({'type': 'overview', 'stats': {}})
+    return json.dumps({'data': {'segments': segments}})
+
+@pytest.fixture
+def lookup(stub_flaresolverr):
+    stub_flaresolverr.respond = lambda url: profile(LUNA, HELA) if '/profile/' in url else '{"data": [{"id": 1}]}'
+    lookup = TrackerLookup({
+        'flaresolverr': {'url': stub_flaresolverr.url, 'min_request_delay': 1, 'retry_attempts': 1,
+                         'throttle': {'max_rate': 1000}},
+        'renderer': {'live_table': False},
+    })
+    yield lookup
+    lookup.close()
+
+def test_lookup_caches_a_compact_record_sorted_by_matches(lookup):
+    result = lookup.lookup_player('Alice')
+    assert result['heroes'] == [HELA, LUNA]
+    cached = lookup.cache.get('Alice')
+    assert isinstance(cached, HeroStats)
+    assert cached.to_result() == result
+
+def test_parsed_responses_are_freed_before_the_record_is_cached(lookup, monkeypatch):
+    parsed = []
+    alive_at_put = []
+    real_loads = json.loads
+
+    class Parsed(dict):
+        pass
+
+    def tracking_loads(text, *args, **kwargs):
+        data = real_loads(text, *args, **kwargs)
+        # Only the tracker.gg payloads, not FlareSolverr's own responses
+        if isinstance(data, dict) and 'data' in data:
+            data = Parsed(data)
+            parsed.append(weakref.ref(data))
+        return data
+
+    def put(record, real_put=lookup.cache.put):
+        gc.collect()
+        alive_at_put.extend(ref for ref in parsed if ref() is not None)
+        real_put(record)
+
+    monkeypatch.setattr(tracker_lookup.json, 'loads', tracking_loads)
+    monkeypatch.setattr(lookup.cache, 'put', put)
+    assert lookup.lookup_player('Alice')
+    assert len(parsed) == 2
+    assert alive_at_put == []
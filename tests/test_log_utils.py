@@ -0,0 +1,96 @@
+import logging
+import threading
+
+import pytest
+
+import log_utils
+from log_utils import LazyJSON, LazyText, RateLimitFilter, start_async_logging, stop_async_logging
+
+class RecordingHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+        self.threads = []
+
+    def emit(self, record):
+        self.messages.append(self.format(record))
+        self.threads.append(threading.current_thread())
+
+@pytest.fixture
+def async_logging():
+    logging.disable(logging.NOTSET)
+    root = logging.getLogger()
+    saved_handlers, saved_level = root.handlers[:], root.level
+    handler = RecordingHandler()
+    listener = start_async_logging([handler], logging.DEBUG, debug_rate=3, debug_period=60)
+    yield handler, listener
+    stop_async_logging(listener)
+    root.handlers, root.level = saved_handlers, saved_level
+
+def make_record(message, level=logging.DEBUG):
+    return logging.LogRecord('test', level, __file__, 1, message, None, None)
+
+def test_lazy_arguments_are_formatted_on_the_listener_thread(async_logging):
+    handler, listener = async_logging
+    formatted_on = []
+
+    def build():
+        formatted_on.append(threading.current_thread())
+        return 'expensive'
+
+    # pytest's own capture handler would format the record on this thread
+    root = logging.getLogger()
+    root.handlers = [h for h in root.handlers if isinstance(h, log_utils.DeferredQueueHandler)]
+    logging.getLogger('test').debug("value: %s %s", LazyText(build), LazyJSON({'a': 1}))
+    stop_async_logging(listener)
+    assert handler.messages == ['value: expensive {"a": 1}']
+    assert formatted_on[0] is not threading.current_thread()
+
+def test_stop_is_safe_to_call_twice(async_logging):
+    _, listener = async_logging
+    stop_async_logging(listener)
+    assert listener not in log_utils._running_listeners
+    stop_async_logging(listener)
+
+def test_restarting_stops_the_previous_listener(async_logging):
+    first_handler, first = async_logging
+    logging.getLogger('test').warning("before")
+    second_handler = RecordingHandler()
+    second = start_async_logging([second_handler], logging.DEBUG)
+    logging.getLogger('test').warning("after")
+    stop_async_logging(second)
+
+    assert first not in log_utils._running_listeners
+    assert first_handler.messages == ['before']
+    assert second_handler.messages == ['after']
+
+def test_repeated_debug_messages_are_rate_limited(async_logging):
+    handler, listener = async_logging
+    logger = logging.getLogger('test')
+    for i in range(10):
+        logger.debug("tick %d", i)
+        logger.warning("important %d", i)
+    stop_async_logging(listener)
+    assert [m for m in handler.messages if m.startswith('tick')] == ['tick 0', 'tick 1', 'tick 2']
+    assert len([m for m in handler.messages if m.startswith('important')]) == 10
+
+def test_rate_limit_window_resets_after_the_period(monkeypatch):
+    clock = [0.0]
+    monkeypatch.setattr(log_utils.time, 'monotonic', lambda: clock[0])
+    limiter = RateLimitFilter(rate=1, period=1.0)
+    assert limiter.filter(make_record('a'))
+    assert not limiter.filter(make_record('a'))
+    assert limiter.filter(make_record('b'))
+    clock[0] = 1.5
+    assert limiter.filter(make_record('a'))
+    assert limiter.suppressed == 1
+
+def test_expired_rate_limit_windows_are_dropped(monkeypatch):
+    clock = [0.0]
+    monkeypatch.setattr(log_utils.time, 'monotonic', lambda: clock[0])
+    limiter = RateLimitFilter(rate=1, period=1.0)
+    for i in range(100):
+        limiter.filter(make_record(f"one-off {i}"))
+    clock[0] = 1.5
+    limiter.filter(make_record('a'))
+    assert list(limiter.windows) == [('test', 'a')]
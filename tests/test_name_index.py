@@ -0,0 +1,52 @@
+from name_index import NameIndex, bounded_levenshtein, normalize_name, trigrams
+
+def make_index(*names, **config):
+    index = NameIndex({'name_resolution': config})
+    index.add_many(names)
+    return index
+
+def test_confusable_characters_share_a_key():
+    assert normalize_name('IlI0O5') == normalize_name('lll0o5') == 'llloos'
+
+def test_trigrams_are_padded():
+    assert trigrams('abc') == {'  a', ' ab', 'abc', 'bc '}
+
+def test_bounded_levenshtein_stops_past_the_limit():
+    assert bounded_levenshtein('kitten', 'sitting', 3) == 3
+    assert bounded_levenshtein('kitten', 'sitting', 1) == 2
+    assert bounded_levenshtein('a', 'abcdef', 2) == 3
+
+def test_misreads_snap_to_known_names():
+    index = make_index('ShadowBlade', 'NightOwl42', 'Zerocool')
+    assert index.resolve('Shad0wBIade') == 'ShadowBlade'
+    assert index.resolve('NightOw142') == 'NightOwl42'
+    assert index.resolve('NighOwl42') == 'NightOwl42'
+    assert index.resolve('CompletelyNew') == 'CompletelyNew'
+
+def test_dropped_suffix_snaps_only_to_a_unique_extension():
+    assert make_index('Vortexian_2024').resolve('Vortexian_') == 'Vortexian_2024'
+    assert make_index('Vortexian_2024', 'Vortexian_1999').resolve('Vortexian_') == 'Vortexian_'
+
+def test_short_reads_do_not_snap_to_long_extensions():
+    assert make_index('Vortexian_2024').resolve('Vort') == 'Vort'
+
+def test_seen_misreads_defer_to_confirmed_names_with_the_same_key():
+    index = make_index('Shad0wBIade')
+    index.add('ShadowBlade', weight=10)
+    assert index.resolve('Shad0wBIade') == 'ShadowBlade'
+    assert index.resolve('ShadowBlade') == 'ShadowBlade'
+
+def test_ties_are_broken_by_weight_or_left_alone():
+    index = make_index('Player1x', 'Player2x')
+    assert index.resolve('Player3x') == 'Player3x'
+    index.add('Player2x', weight=10)
+    assert index.resolve('Player3x') == 'Player2x'
+
+def test_short_names_and_disabled_index_are_left_alone():
+    assert make_index('abcd').resolve('abc') == 'abc'
+    assert make_index('ShadowBlade', enabled=False).resolve('Shad0wBIade') == 'Shad0wBIade'
+
+def test_re_adding_a_name_only_raises_its_weight():
+    index = make_index('ShadowBlade')
+    index.add('ShadowBlade', weight=5)
+    assert len(index) == 1 and index.weights == [6]
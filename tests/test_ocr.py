@@ -0,0 +1,149 @@
+import json
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+pytest.importorskip('win32gui')
+pytest.importorskip('openai')
+Image = pytest.importorskip('PIL.Image')
+
+from hero_stats import HeroStats
+from ocr import OCRProcessor
+from tracker_lookup import TrackerLookup
+
+HEROES = [{'id': '1', 'name': 'Hela', 'role': 'Duelist', 'matches': 10.0, 'wins': 6.0, 'kda': 3.0}]
+
+class StubVisionClient:
+    """Stands in for OpenAI, answering each chat completion with the next queued reply."""
+
+    def __init__(self):
+        self.replies = []
+        self.requests = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **request):
+        self.requests.append(request)
+        content = json.dumps(self.replies.pop(0))
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+@pytest.fixture
+def make_processor(monkeypatch, tmp_path):
+    monkeypatch.setenv('OPENAI_API_KEY', 'test')
+    created = []
+
+    def make(**config):
+        config = dict({
+            'renderer': {'live_table': False},
+            'lookup_friendly_team': True,
+            'temp_folder': str(tmp_path),
+        }, **config)
+        lookup = TrackerLookup(config)
+        processor = OCRProcessor(config, screen_capture=object(), tracker_lookup=lookup)
+        processor.client = StubVisionClient()
+        created.append(lookup)
+        return processor
+
+    yield make
+    for lookup in created:
+        lookup.close()
+
+@pytest.fixture
+def capture(tmp_path):
+    path = tmp_path / 'capture.png'
+    Image.new('RGB', (320, 180), 'gray').save(path)
+    return str(path)
+
+def cache(processor, *players):
+    for player in players:
+        processor.tracker_lookup.cache.put(HeroStats.from_heroes(player, HEROES, time.time()))
+
+@pytest.mark.parametrize('result, won', [('victory', True), ('DEFEAT', False), (None, None), ('unknown', None)])
+def test_end_of_match_outcome_is_read_with_the_usernames(make_processor, capture, result, won):
+    processor = make_processor()
+    processor.client.replies.append({'friendly_team': ['Alice'], 'enemy_team': ['Bob'], 'result': result})
+    cache(processor, 'Alice', 'Bob')
+
+    friendly, enemy, results, outcome, same_lobby = processor.process_uploaded_image(capture)
+    assert (friendly, enemy, outcome, same_lobby) == (['Alice'], ['Bob'], won, False)
+    assert set(results) == {'Alice', 'Bob'}
+
+def test_hedged_requests_share_one_async_client_and_loop(make_processor, monkeypatch):
+    import ocr
+
+    clients = []
+
+    class StubAsyncOpenAI:
+        def __init__(self, **options):
+            clients.append(self)
+            self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+            self.closed = False
+
+        async def create(self, **request):
+            return 'response'
+
+        async def close(self):
+            self.closed = True
+
+    monkeypatch.setattr(ocr, 'AsyncOpenAI', StubAsyncOpenAI)
+    processor = make_processor(openai_settings={'hedging': {'enabled': True}})
+    assert [processor.create_completion(model='m') for _ in range(3)] == ['response'] * 3
+    assert len(clients) == 1
+    loop = processor.hedge_loop.loop
+    processor.create_completion(model='m')
+    assert processor.hedge_loop.loop is loop
+
+    processor.close()
+    assert clients[0].closed and processor.hedge_loop.loop is None
+
+def scoreboard_capture(tmp_path, name, processor, painted=()):
+    """Save a capture with the given (team, row) scoreboard rows painted white."""
+    pixels = np.full((180, 320, 3), 100, dtype=np.uint8)
+    for team, row in painted:
+        (left, right), bounds = processor.scoreboard.row_bounds(pixels.shape, team)
+        top, bottom = bounds[row]
+        pixels[top:bottom, left:right] = 250
+    path = tmp_path / name
+    Image.fromarray(pixels).save(path)
+    return str(path)
+
+def test_repeat_capture_rereads_only_changed_rows(make_processor, tmp_path):
+    processor = make_processor(scoreboard={'incremental': True, 'rows_per_team': 2})
+    cache(processor, 'Alice', 'Amy', 'Bob', 'Ben', 'Bea')
+    processor.client.replies.append({'friendly_team': ['Alice', 'Amy'], 'enemy_team': ['Bob', 'Ben']})
+    first = scoreboard_capture(tmp_path, 'first.png', processor)
+    assert processor.process_uploaded_image(first)[:2] == (['Alice', 'Amy'], ['Bob', 'Ben'])
+
+    processor.client.replies.append({'names': ['Bea']})
+    second = scoreboard_capture(tmp_path, 'second.png', processor, painted=[('enemy', 1)])
+    friendly, enemy, results, won, same_lobby = processor.process_uploaded_image(second)
+
+    assert (friendly, enemy, won, same_lobby) == (['Alice', 'Amy'], ['Bob', 'Bea'], None, True)
+    assert set(results) == {'Alice', 'Amy', 'Bob', 'Bea'}
+    assert len(processor.client.requests) == 2
+    assert '1 game scoreboard rows' in processor.client.requests[1]['messages'][0]['content']
+
+def test_expired_or_stale_results_are_not_reused(make_processor, tmp_path):
+    processor = make_processor(scoreboard={'incremental': True, 'rows_per_team': 2})
+    cache(processor, 'Alice', 'Amy', 'Bob', 'Ben')
+    processor.client.replies.append({'friendly_team': ['Alice', 'Amy'], 'enemy_team': ['Bob', 'Ben']})
+    capture = scoreboard_capture(tmp_path, 'capture.png', processor)
+    processor.process_uploaded_image(capture)
+
+    results = processor.scoreboard.results
+    results['Amy'] = dict(results['Amy'], fetched_at=time.time() - processor.tracker_lookup.cache_ttl - 1)
+    results['Bob'] = dict(results['Bob'], stale=True)
+    pixels = np.asarray(Image.open(capture).convert('RGB'))
+    row_names, reuse = processor.extract_changed_rows(pixels, {'friendly': [], 'enemy': []})
+
+    assert row_names == {'friendly': ['Alice', 'Amy'], 'enemy': ['Bob', 'Ben']}
+    assert set(reuse) == {'Alice', 'Ben'}
+    assert len(processor.client.requests) == 1
+
+def test_row_names_must_line_up_with_the_rows(make_processor):
+    processor = make_processor()
+    rows = np.zeros((40, 100, 3), dtype=np.uint8)
+    processor.client.replies.extend([{'names': ['a', '']}, {'names': ['a']}])
+    assert processor.extract_row_names(rows, 2) == ['a', '']
+    assert processor.extract_row_names(rows, 2) is None
@@ -0,0 +1,42 @@
+import threading
+
+import profiling
+from profiling import NULL_STAGE, CaptureProfiler, profiled
+
+@profiled('worker_stage')
+def worker_work():
+    return sum(i * i for i in range(20000))
+
+@profiled('main_stage')
+def main_work():
+    thread = threading.Thread(target=worker_work)
+    thread.start()
+    thread.join()
+    return [bytearray(1024) for _ in range(50)]
+
+def test_capture_profiles_stages_on_every_thread(tmp_path):
+    profiler = CaptureProfiler({'profiling': {'enabled': True}}, str(tmp_path))
+    with profiler.capture() as profile:
+        held = main_work()
+
+    assert profiling._active is None
+    assert profile.stages['main_stage'].calls == 1
+    assert profile.stages['worker_stage'].calls == 1
+    assert profile.stages['main_stage'].peak_bytes >= 50 * 1024
+
+    text, stats = profile.report(50, 5)
+    assert 'worker_work' in text and 'main_work' in text
+    assert stats is not None
+    assert len(list(tmp_path.glob('profile_*.txt'))) == 1
+    assert len(list(tmp_path.glob('profile_*.prof'))) == 1
+    del held
+
+def test_only_due_captures_are_profiled(tmp_path):
+    profiler = CaptureProfiler({'profiling': {'every': 2}}, str(tmp_path))
+    assert profiler.capture() is NULL_STAGE
+    with profiler.capture() as profile:
+        main_work()
+    assert profile.number == 2
+    assert profiler.capture() is NULL_STAGE
+    # Outside a capture, profiled functions run without bookkeeping
+    assert worker_work() == sum(i * i for i in range(20000))
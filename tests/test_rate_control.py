@@ -0,0 +1,73 @@
+import time
+
+from rate_control import AdaptiveThrottle, is_challenge_page
+
+def make_throttle(**throttle):
+    return AdaptiveThrottle({
+        'flaresolverr': {'min_request_delay': 1000, 'max_request_delay': 4000, 'retry_delay': 1000,
+                         'throttle': throttle},
+    })
+
+def test_clean_responses_raise_rate_and_concurrency_up_to_the_limits():
+    throttle = make_throttle(max_rate=1.5, rate_increase=0.2, max_concurrency=3)
+    assert throttle.rate == 1.0
+    for _ in range(50):
+        throttle.record_success()
+    assert throttle.rate == 1.5
+    assert int(throttle.concurrency) == 3
+
+def test_backoff_cuts_rate_and_concurrency_but_not_below_the_minimum():
+    throttle = make_throttle(max_concurrency=4, decrease_factor=0.5)
+    throttle.concurrency = 4.0
+    throttle.record_backoff('http_429')
+    assert throttle.rate == 0.5
+    assert throttle.concurrency == 2.0
+    for _ in range(10):
+        throttle.record_backoff('challenge')
+    assert throttle.rate == 0.25
+    assert throttle.concurrency == 1
+    assert throttle.metrics()['backoffs'] == {'http_429': 1, 'challenge': 10}
+
+def test_backoff_pushes_back_the_next_request_slot():
+    throttle = make_throttle()
+    throttle.record_backoff('timeout')
+    assert throttle.next_slot - time.monotonic() > 1.5
+
+def test_acquire_paces_requests_at_the_current_rate():
+    throttle = make_throttle(max_rate=20)
+    throttle.rate = 20
+    start = time.monotonic()
+    for _ in range(4):
+        throttle.acquire()
+        throttle.release()
+    assert time.monotonic() - start >= 0.14
+
+def test_acquire_uses_the_shared_budget_when_set():
+    class Budget:
+        def __init__(self):
+            self.intervals = []
+
+        def reserve_slot(self, interval):
+            self.intervals.append(interval)
+            return 0.0
+
+    throttle = make_throttle()
+    throttle.shared_budget = Budget()
+    throttle.acquire()
+    throttle.release()
+    throttle.acquire()
+    throttle.release()
+    assert throttle.shared_budget.intervals == [1.0, 1.0]
+    assert throttle.next_slot == 0.0
+
+def test_retry_delay_is_full_jitter_up_to_the_capped_backoff():
+    throttle = make_throttle(max_retry_delay=5000)
+    first = [throttle.retry_delay(0) for _ in range(500)]
+    late = [throttle.retry_delay(10) for _ in range(500)]
+    assert 0 <= min(first) < 0.1 and max(first) <= 1.0
+    assert max(late) <= 5.0 and max(late) > 4.0
+
+def test_challenge_pages_are_recognized():
+    assert is_challenge_page('<html><title>Just a moment...</title></html>')
+    assert not is_challenge_page('{"data": []}')
+    assert not is_challenge_page(None)
@@ -0,0 +1,133 @@
+import threading
+import time
+
+from scheduler import LookupScheduler
+
+def make_scheduler(run_lookup, workers=1, **config):
+    return LookupScheduler({'scheduler': config}, run_lookup, workers)
+
+class Gate:
+    """A lookup that blocks until opened and records the order players ran in."""
+
+    def __init__(self, results=None):
+        self.opened = threading.Event()
+        self.started = threading.Event()
+        self.order = []
+        self.results = results or {}
+
+    def __call__(self, player, team, lobby):
+        self.order.append(player)
+        self.started.set()
+        self.opened.wait(5)
+        result = self.results.get(player, {'player': player})
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+def test_enemies_and_uncached_players_go_first():
+    gate = Gate()
+    scheduler = make_scheduler(gate)
+    blocker = scheduler.submit_idle(['blocker'])[0]
+    assert gate.started.wait(5)
+
+    batch = scheduler.submit_lobby(1, [
+        ('cached_friend', 'friendly', True, True),
+        ('new_friend', 'friendly', False, False),
+        ('cached_enemy', 'enemy', True, True),
+        ('seen_enemy', 'enemy', False, True),
+        ('new_enemy', 'enemy', False, False),
+    ])
+    gate.opened.set()
+    results = batch.wait()
+    blocker.future.result(5)
+
+    assert gate.order[1:] == ['new_enemy', 'seen_enemy', 'cached_enemy', 'new_friend', 'cached_friend']
+    assert set(results) == {'new_enemy', 'seen_enemy', 'cached_enemy', 'new_friend', 'cached_friend'}
+
+def test_new_lobby_cancels_pending_lookups_from_the_previous_one():
+    gate = Gate()
+    scheduler = make_scheduler(gate)
+    first = scheduler.submit_lobby(1, [('a', 'enemy', False, False), ('b', 'enemy', False, False)])
+    assert gate.started.wait(5)
+
+    second = scheduler.submit_lobby(2, [('c', 'enemy', False, False)])
+    gate.opened.set()
+    second.wait()
+
+    assert first.tasks[1].future.cancelled()
+    assert gate.order == ['a', 'c']
+    assert scheduler.metrics()['cancelled'] == 1
+
+def test_deprioritize_runs_previous_lobby_after_the_new_one():
+    gate = Gate()
+    scheduler = make_scheduler(gate, previous_lobby='deprioritize')
+    first = scheduler.submit_lobby(1, [('a', 'enemy', False, False), ('b', 'enemy', False, False)])
+    assert gate.started.wait(5)
+
+    scheduler.submit_lobby(2, [('c', 'friendly', True, True)])
+    gate.opened.set()
+    first.wait()
+
+    assert gate.order == ['a', 'c', 'b']
+
+def test_wait_returns_what_finished_by_the_deadline():
+    release = threading.Event()
+
+    def run_lookup(player, team, lobby):
+        if player == 'slow':
+            release.wait(5)
+        return {'player': player}
+
+    scheduler = make_scheduler(run_lookup, workers=2)
+    batch = scheduler.submit_lobby(1, [('fast', 'enemy', False, False), ('slow', 'enemy', False, False)],
+                                   deadline_seconds=0.2)
+    results = batch.wait()
+    release.set()
+    batch.tasks[1].future.result(5)
+
+    assert set(results) == {'fast'}
+    deadline = time.monotonic() + 5
+    while scheduler.metrics()['missed_deadline'] < 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    metrics = scheduler.metrics()
+    assert metrics['made_deadline'] == 1
+    assert metrics['missed_deadline'] == 1
+
+def test_failed_lookups_are_not_counted_against_the_deadline():
+    gate = Gate({'empty': None, 'broken': RuntimeError("boom")})
+    gate.opened.set()
+    scheduler = make_scheduler(gate)
+    batch = scheduler.submit_lobby(1, [
+        ('ok', 'enemy', False, False),
+        ('empty', 'enemy', False, False),
+        ('broken', 'enemy', False, False),
+    ])
+    results = batch.wait()
+
+    assert set(results) == {'ok'}
+    deadline = time.monotonic() + 5
+    while scheduler.metrics()['failed'] < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    metrics = scheduler.metrics()
+    assert metrics['made_deadline'] == 1
+    assert metrics['missed_deadline'] == 0
+    assert metrics['failed'] == 2
+    assert batch.failed == 2
+
+def test_idle_lookups_wait_for_lobbies_and_their_own_limit():
+    gate = Gate()
+    scheduler = make_scheduler(gate, workers=2, idle_concurrency=1)
+    idle = scheduler.submit_idle(['idle1', 'idle2'])
+    assert gate.started.wait(5)
+    time.sleep(0.05)
+    # The second worker is free, but only one idle lookup may run at a time
+    assert gate.order == ['idle1']
+
+    batch = scheduler.submit_lobby(1, [('enemy', 'enemy', False, False)])
+    gate.opened.set()
+    batch.wait()
+    for task in idle:
+        task.future.result(5)
+
+    assert gate.order == ['idle1', 'enemy', 'idle2']
+    assert scheduler.metrics()['idle'] == 2
@@ -0,0 +1,81 @@
+import numpy as np
+
+from scoreboard import Scoreboard
+
+ROWS = 3
+
+def make_scoreboard(**config):
+    return Scoreboard({'scoreboard': dict({'incremental': True, 'rows_per_team': ROWS}, **config)})
+
+def blank(height=180, width=320):
+    return np.full((height, width, 3), 100, dtype=np.uint8)
+
+def paint_row(scoreboard, pixels, team, row, value=250):
+    (left, right), bounds = scoreboard.row_bounds(pixels.shape, team)
+    top, bottom = bounds[row]
+    pixels[top:bottom, left:right] = value
+    return pixels
+
+def remember(scoreboard, pixels, results=None):
+    fingerprints = scoreboard.fingerprint(pixels)
+    teams = {'friendly': ['a', 'b', 'c'], 'enemy': ['d', 'e', 'f']}
+    scoreboard.remember(pixels.shape, fingerprints, teams, results or {})
+    return fingerprints
+
+def test_rows_are_fingerprinted_onto_the_grid():
+    scoreboard = make_scoreboard(fingerprint_grid=[2, 8])
+    fingerprints = scoreboard.fingerprint(paint_row(scoreboard, blank(), 'enemy', 1))
+    assert fingerprints['friendly'].shape == (ROWS, 16)
+    assert np.allclose(fingerprints['friendly'], 100)
+    assert fingerprints['enemy'][1].min() > fingerprints['enemy'][0].max()
+
+def test_diff_reports_only_the_rows_that_changed():
+    scoreboard = make_scoreboard()
+    pixels = blank()
+    assert scoreboard.diff(pixels.shape, scoreboard.fingerprint(pixels)) is None
+
+    remember(scoreboard, pixels)
+    assert scoreboard.diff(pixels.shape, scoreboard.fingerprint(blank())) == {'friendly': [], 'enemy': []}
+
+    changed = paint_row(scoreboard, blank(), 'enemy', 2)
+    assert scoreboard.diff(changed.shape, scoreboard.fingerprint(changed)) == {'friendly': [], 'enemy': [2]}
+
+def test_small_noise_stays_under_the_threshold():
+    scoreboard = make_scoreboard()
+    remember(scoreboard, blank())
+    noisy = blank() + np.random.default_rng(1).integers(0, 3, (180, 320, 3), dtype=np.uint8)
+    assert scoreboard.diff(noisy.shape, scoreboard.fingerprint(noisy)) == {'friendly': [], 'enemy': []}
+
+def test_too_many_changes_or_a_new_resolution_read_everything():
+    scoreboard = make_scoreboard(max_changed_rows=2)
+    remember(scoreboard, blank())
+
+    pixels = blank()
+    for row in range(ROWS):
+        paint_row(scoreboard, pixels, 'friendly', row)
+    assert scoreboard.diff(pixels.shape, scoreboard.fingerprint(pixels)) is None
+
+    larger = blank(360, 640)
+    assert scoreboard.diff(larger.shape, scoreboard.fingerprint(larger)) is None
+
+def test_names_that_do_not_line_up_reset_the_state():
+    scoreboard = make_scoreboard()
+    pixels = blank()
+    remember(scoreboard, pixels, {'a': {'player': 'a'}})
+    assert scoreboard.previous_names()['enemy'] == ['d', 'e', 'f']
+    assert scoreboard.previous_results() == {'a': {'player': 'a'}}
+
+    scoreboard.remember(pixels.shape, scoreboard.fingerprint(pixels), {'friendly': ['a'], 'enemy': []}, {})
+    assert scoreboard.previous_names() is None
+    assert scoreboard.previous_results() == {}
+    assert scoreboard.diff(pixels.shape, scoreboard.fingerprint(pixels)) is None
+
+def test_composite_stacks_row_crops():
+    scoreboard = make_scoreboard()
+    pixels = paint_row(scoreboard, blank(), 'enemy', 0)
+    stacked = scoreboard.composite(pixels, [('friendly', 1), ('enemy', 0)])
+    (left, right), bounds = scoreboard.row_bounds(pixels.shape, 'friendly')
+    row_height = bounds[1][1] - bounds[1][0]
+    assert stacked.shape[1] == right - left
+    assert (stacked[:row_height] == 100).all()
+    assert (stacked[row_height:] == 250).all()
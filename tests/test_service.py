@@ -0,0 +1,149 @@
+import base64
+import http.client
+import json
+import os
+import socket
+import struct
+import time
+
+import pytest
+
+from hero_stats import HeroStats
+from service import LookupService, MAX_LOOKUP_PLAYERS, OPCODE_CLOSE, OPCODE_PING, OPCODE_PONG, OPCODE_TEXT
+from tracker_lookup import TrackerLookup
+
+HEROES = [{'id': '1', 'name': 'Hela', 'role': 'Duelist', 'matches': 10.0, 'wins': 6.0, 'kda': 3.0}]
+
+@pytest.fixture
+def make_service(tmp_path):
+    started = []
+
+    def make(**service_config):
+        config = {
+            'service': dict({'port': 0}, **service_config),
+            'renderer': {'live_table': False},
+            'temp_folder': str(tmp_path),
+        }
+        lookup = TrackerLookup(config)
+        lookup.cache.put(HeroStats.from_heroes('Alice', HEROES, time.time()))
+        service = LookupService(config, lookup, ocr_processor=None)
+        service.start()
+        service.port = service.server.server_address[1]
+        started.append(service)
+        return service
+
+    yield make
+    for service in started:
+        service.stop()
+        service.tracker_lookup.close()
+
+def request(service, method, path, headers=None, body=None):
+    connection = http.client.HTTPConnection('127.0.0.1', service.port, timeout=5)
+    connection.request(method, path, body=body, headers=headers or {})
+    response = connection.getresponse()
+    data = json.loads(response.read())
+    connection.close()
+    return response.status, data
+
+def test_local_clients_can_look_up_players(make_service):
+    service = make_service()
+    status, data = request(service, 'GET', '/lookup?player=Alice')
+    assert status == 200
+    assert data['Alice']['cached'] and data['Alice']['heroes'] == HEROES
+
+def test_cross_site_origins_are_rejected(make_service):
+    service = make_service(allowed_origins=['http://localhost:3000'])
+    assert request(service, 'GET', '/lookup?player=Alice', {'Origin': 'https://evil.example'})[0] == 403
+    assert request(service, 'GET', '/lookup?player=Alice', {'Origin': 'http://localhost:3000'})[0] == 200
+
+def test_foreign_host_headers_are_rejected(make_service):
+    service = make_service()
+    assert request(service, 'GET', '/metrics', {'Host': 'rebind.evil.example:8765'})[0] == 403
+    assert request(service, 'GET', '/health', {'Host': 'rebind.evil.example:8765'})[0] == 200
+
+def test_ipv6_loopback_host_headers_are_allowed(make_service):
+    service = make_service()
+    assert request(service, 'GET', '/metrics', {'Host': '[::1]'})[0] == 200
+    assert request(service, 'GET', '/metrics', {'Host': f"[::1]:{service.port}"})[0] == 200
+    assert request(service, 'GET', '/metrics', {'Host': '[::2]:8765'})[0] == 403
+
+def test_lookups_are_limited_to_a_lobby(make_service):
+    service = make_service()
+    query = '&'.join(['player=Alice'] * (MAX_LOOKUP_PLAYERS + 1))
+    assert request(service, 'GET', f"/lookup?{query}")[0] == 400
+    query = '&'.join(['player=Alice'] * MAX_LOOKUP_PLAYERS)
+    assert request(service, 'GET', f"/lookup?{query}")[0] == 200
+
+def test_token_is_required_when_configured(make_service):
+    service = make_service(token='s3cret')
+    assert request(service, 'GET', '/lookup?player=Alice')[0] == 401
+    assert request(service, 'GET', '/lookup?player=Alice', {'Authorization': 'Bearer wrong'})[0] == 401
+    assert request(service, 'GET', '/lookup?player=Alice', {'Authorization': 'Bearer s3cret'})[0] == 200
+    assert request(service, 'GET', '/lookup?player=Alice&token=s3cret')[0] == 200
+
+def test_screenshot_uploads_need_an_image_content_type(make_service):
+    service = make_service()
+    status, _ = request(service, 'POST', '/screenshot', {'Content-Type': 'text/plain'}, body=b'not an image')
+    assert status == 415
+    assert os.listdir(service.upload_folder) == []
+
+def test_port_in_use_raises_from_start(make_service):
+    service = make_service()
+    config = {'service': {'port': service.port}, 'renderer': {'live_table': False}, 'temp_folder': 'tmp'}
+    with pytest.raises(OSError):
+        LookupService(config, service.tracker_lookup, ocr_processor=None).start()
+
+def client_frame(opcode, payload=b''):
+    mask = os.urandom(4)
+    masked = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+    return bytes([0x80 | opcode, 0x80 | len(payload)]) + mask + masked
+
+def read_frame(sock):
+    header = sock.recv(2)
+    length = header[1] & 0x7F
+    if length == 126:
+        length = struct.unpack('!H', sock.recv(2))[0]
+    payload = b''
+    while len(payload) < length:
+        payload += sock.recv(length - len(payload))
+    return header[0] & 0x0F, payload
+
+def open_websocket(service):
+    sock = socket.create_connection(('127.0.0.1', service.port), timeout=5)
+    key = base64.b64encode(os.urandom(16)).decode()
+    sock.sendall((
+        f"GET /subscribe HTTP/1.1\r\nHost: 127.0.0.1:{service.port}\r\n"
+        f"Upgrade: websocket\r\nConnection: Upgrade\r\nSec-WebSocket-Key: {key}\r\n"
+        "Sec-WebSocket-Version: 13\r\n\r\n"
+    ).encode())
+    response = b''
+    while b'\r\n\r\n' not in response:
+        response += sock.recv(1)
+    assert response.startswith(b'HTTP/1.1 101')
+    return sock
+
+def test_websocket_answers_pings_pushes_events_and_closes(make_service):
+    service = make_service()
+    sock = open_websocket(service)
+
+    sock.sendall(client_frame(OPCODE_PING, b'hi'))
+    assert read_frame(sock) == (OPCODE_PONG, b'hi')
+
+    # The listener is registered right after the handshake
+    time.sleep(0.1)
+    service.renderer.emit('fetched', 'Alice', 'enemy', heroes=HEROES)
+    opcode, payload = read_frame(sock)
+    assert opcode == OPCODE_TEXT and json.loads(payload)['player'] == 'Alice'
+
+    sock.sendall(client_frame(OPCODE_CLOSE, struct.pack('!H', 1000)))
+    assert read_frame(sock) == (OPCODE_CLOSE, struct.pack('!H', 1000))
+    assert sock.recv(1) == b''
+    assert service.renderer.listeners == []
+    sock.close()
+
+def test_unmasked_client_frames_close_the_connection(make_service):
+    service = make_service()
+    sock = open_websocket(service)
+    sock.sendall(bytes([0x80 | OPCODE_PING, 0]))
+    assert read_frame(sock) == (OPCODE_CLOSE, struct.pack('!H', 1002))
+    sock.close()